@@ -1,6 +1,9 @@
 from ursina import *
 from ursina.shaders import basic_lighting_shader
 import math
+from contacts import ContactSystem
+from dormant import ActorStore
+import governor
 
 app = Ursina()
 
@@ -11,6 +14,8 @@ RUN_SPEED = 8
 JUMP_FORCE = 12
 AIR_CONTROL = 0.8
 CAM_DISTANCE = 6
+ACTIVE_RADIUS = 16  # Coins become entities only within this distance of Mario
+FRAME_BUDGET_MS = 1000 / 60
 
 # Game State
 stars_collected = 0
@@ -64,6 +69,14 @@ class Mario(Entity):
 
 # Setup
 player = Mario()
+contacts = ContactSystem()
+contacts.add(player)
+actors = ActorStore()  # Dormant collectibles, materialized around Mario in update()
+# The coin grid is sized to this machine's cached frame budget calibration;
+# while frames run long, coins near Mario wait a little before materializing.
+calibration = governor.load_calibration()
+coin_plan, _, _ = governor.plan_counts(calibration, {'coins': 400}, {'coins': (0.3, 0.3)}, FRAME_BUDGET_MS, max_scale=1.0)
+spawns = governor.SpawnGovernor(FRAME_BUDGET_MS)
 camera.position = (0, 6, -CAM_DISTANCE)
 camera.rotation_x = 20
 
@@ -105,7 +118,8 @@ class Star(Entity):
             collider='sphere',
             shader=basic_lighting_shader
         )
-        
+        contacts.add(self, static=True)
+
 stars = [
     Star((0, 20, 50)),
     Star((15, 10, 20)),
@@ -113,7 +127,7 @@ stars = [
 ]
 
 class Coin(Entity):
-    def __init__(self, position):
+    def __init__(self, position, actor=None):
         super().__init__(
             model='sphere',
             color=color.gold,
@@ -122,8 +136,16 @@ class Coin(Entity):
             collider='sphere',
             shader=basic_lighting_shader
         )
+        self.actor = actor
+        contacts.add(self, static=True)
+
+def despawn(entity):
+    contacts.remove(entity)
+    destroy(entity)
 
-coins = [Coin((x*2, 3, z*2)) for x in range(-10,10) for z in range(-10,10)]
+actors.register('coin', spawn=lambda p: Coin(p.position, p.index), despawn=despawn)
+side = max(2, round(math.sqrt(coin_plan['coins'])))
+coin_actors = [actors.add('coin', (x*2, 3, z*2)) for x in range(-(side//2), side - side//2) for z in range(-(side//2), side - side//2)]
 
 # UI
 health_text = Text(text=f"Health: {health}", origin=(-0.85, 0.45), scale=2)
@@ -132,6 +154,9 @@ star_text = Text(text=f"Stars: {stars_collected}", origin=(-0.85, 0.35), scale=2
 
 # Physics
 def update():
+    spawns.frame(time.dt)
+    actors.update(player.position, ACTIVE_RADIUS, max_spawns=spawns.allowance())
+    contacts.step()
     camera.position = lerp(camera.position, player.position + (0,6,-CAM_DISTANCE), 5*time.dt)
     camera.rotation_x = lerp(camera.rotation_x, 20, 5*time.dt)
     
@@ -145,14 +170,20 @@ def input(key):
         player.jump()
 
 # Collisions
-def on_collision(e1, e2):
-    global stars_collected, coins
-    if e1 == player:
-        if isinstance(e2, Star):
-            stars_collected += 1
-            destroy(e2)
-        elif isinstance(e2, Coin):
-            coins += 1
-            destroy(e2)
+# Dispatched by the contact system only when Mario actually touches something.
+@contacts.on(Mario, Star)
+def collect_star(mario, star):
+    global stars_collected
+    stars_collected += 1
+    star_text.text = f"Stars: {stars_collected}"
+    contacts.remove(star)
+    destroy(star)
+
+@contacts.on(Mario, Coin)
+def collect_coin(mario, coin):
+    global coins
+    coins += 1
+    coin_text.text = f"Coins: {coins}"
+    actors.retire(coin.actor)
 
 app.run()
@@ -0,0 +1,331 @@
+# capture.py - Record gameplay frames to a PNG sequence or a raw pipe without stalling the game loop.
+# Each captured frame is copied to RAM by Panda into one of a small ring of
+# textures. A task that runs after rendering collects the copy made
+# `buffers - 1` frames earlier, detaches its RAM image (the texture gets a
+# fresh one next time, so nothing is copied) and hands it to a thread pool
+# that flips, encodes and writes it. zlib and pipe writes release the GIL,
+# so encoding overlaps the next frames. Frames waiting for a worker count
+# against a memory cap; past it, new frames are dropped (or, with wait=True,
+# the game waits) and the drops are reported.
+
+import os
+import struct
+import subprocess
+import threading
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait as wait_for
+
+import numpy as np
+
+
+def prepare(threaded=None):
+    """Call before Ursina(): with threaded, Panda draws (and reads frames back) on its own thread.
+
+    threaded defaults to SM64_CAPTURE_THREADED; a pipelined draw needs a
+    spare core, and then triple buffering keeps the copies off the game thread.
+    """
+    from panda3d.core import loadPrcFileData
+    if threaded is None:
+        threaded = bool(os.environ.get('SM64_CAPTURE_THREADED'))
+    if threaded:
+        loadPrcFileData('capture', 'threading-model Cull/Draw')
+
+
+def parse_size(text):
+    """'3840x2160' -> (3840, 2160); empty -> None."""
+    if not text:
+        return None
+    width, height = text.lower().split('x')
+    return int(width), int(height)
+
+
+# --- Sinks ---
+
+def png_bytes(bgra, level=1):
+    """PNG file of a (height, width, 4) BGRA image stored bottom row first, as Panda reads frames back."""
+    height, width, _ = bgra.shape
+    rows = np.empty((height, width * 4 + 1), np.uint8)
+    rows[:, 0] = 0   # filter type None: cheap to encode, and zlib still finds the runs
+    rgba = rows[:, 1:].reshape(height, width, 4)
+    for channel, source in enumerate((2, 1, 0, 3)):
+        rgba[:, :, channel] = bgra[::-1, :, source]
+
+    def chunk(tag, data):
+        return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data))
+
+    header = struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0)
+    return b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header) + chunk(b'IDAT', zlib.compress(rows, level)) + chunk(b'IEND', b'')
+
+
+class PngSequence:
+    """Writes frame_000000.png, frame_000001.png, ... into `directory`; frames may finish out of order."""
+
+    ordered = False
+
+    def __init__(self, directory, level=1):
+        self.directory = directory
+        self.level = level
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, index, buffer, width, height):
+        image = np.frombuffer(buffer, np.uint8).reshape(height, width, 4)
+        with open(os.path.join(self.directory, f'frame_{index:06d}.png'), 'wb') as f:
+            f.write(png_bytes(image, self.level))
+
+    def close(self):
+        pass
+
+
+class RawPipe:
+    """Streams raw frames, in order, to the stdin of `command`.
+
+    Frames are BGRA, bottom row first, exactly as read back, e.g.
+    ffmpeg -f rawvideo -pix_fmt bgra -s 3840x2160 -r 60 -i - -vf vflip out.mp4
+    """
+
+    ordered = True
+
+    def __init__(self, command):
+        self.process = subprocess.Popen(command, shell=isinstance(command, str), stdin=subprocess.PIPE)
+
+    def write(self, index, buffer, width, height):
+        self.process.stdin.write(memoryview(buffer))
+
+    def close(self):
+        self.process.stdin.close()
+        self.process.wait()
+
+
+# --- Capture ---
+
+class FrameCapture:
+    """Reads frames back from a window or a fixed-size offscreen buffer and feeds a sink.
+
+        recorder = FrameCapture(PngSequence('frames'), size=(3840, 2160), cameras=(base.cam, camera.ui_camera))
+        recorder.start(); ...; recorder.stop()
+
+    With size, the cameras are also drawn into an offscreen buffer of that
+    size, at the cost of a second render; without it the window itself is
+    captured. Call frame() once per frame after rendering (install() does).
+    """
+
+    def __init__(self, sink, size=None, cameras=(), buffers=3, workers=2, memory_cap_mb=1024, wait=False, every=1):
+        self.sink = sink
+        self.size = size
+        self.cameras = cameras
+        self.buffers = max(buffers, 1)
+        self.workers = 1 if sink.ordered else workers
+        self.memory_cap = memory_cap_mb * 1024 * 1024
+        self.wait = wait
+        self.every = every
+        self.recording = False
+        self.output = None
+        self._lock = threading.Lock()
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self.frames = 0            # frames seen while recording
+        self.captured = 0          # frames handed to the encoders
+        self.dropped = 0           # frames skipped for the memory cap
+        self.missed = 0            # copies that never arrived (minimized window and the like)
+        self.encoded = 0
+        self.errors = 0
+        self.backlog_bytes = 0
+        self.peak_backlog_bytes = 0
+        self.encode_seconds = 0.0
+        self.started_at = None
+
+    def start(self):
+        from direct.showbase.ShowBaseGlobal import base
+        from panda3d.core import Texture
+        if self.recording:
+            return
+        self._reset_stats()
+        if self.size:
+            self.output = base.win.make_texture_buffer('capture', self.size[0], self.size[1])
+            self.output.clear_render_textures()
+            self.output.set_clear_color_active(True)
+            self.output.set_clear_color(base.win.get_clear_color())
+            for sort, camera in enumerate(self.cameras):
+                region = self.output.make_display_region()
+                region.set_sort(sort * 20)
+                region.set_camera(camera)
+                if sort:
+                    region.set_clear_depth_active(True)
+        else:
+            self.output = base.win
+        self.ring = [Texture(f'capture-{i}') for i in range(self.buffers)]
+        self.in_flight = deque()   # (texture, capture index, frame number) waiting for their copy
+        self.futures = deque()
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='capture')
+        self.frame_number = 0
+        self.started_at = time.perf_counter()
+        self.recording = True
+
+    def frame(self):
+        """Collect finished copies and ask for a copy of the next frame drawn."""
+        from panda3d.core import GraphicsOutput
+        if not self.recording:
+            return
+        self.frame_number += 1
+        # A copy requested `buffers - 1` frames ago has landed, even with a pipelined draw thread.
+        while self.in_flight and self.frame_number - self.in_flight[0][2] >= max(self.buffers - 1, 1):
+            self._collect(*self.in_flight.popleft()[:2])
+        self.output.clear_render_textures()
+        if self.frame_number % self.every:
+            return
+        self.frames += 1
+        frame_bytes = self._frame_bytes()
+        if self.wait:
+            self._wait_for_room(frame_bytes)
+        elif self.backlog_bytes + frame_bytes * (len(self.in_flight) + 1) > self.memory_cap:
+            self.dropped += 1   # dropped before the read back, so it costs nothing
+            return
+        texture = self.ring[self.captured % self.buffers]
+        self.output.add_render_texture(texture, GraphicsOutput.RTM_copy_ram)
+        self.in_flight.append((texture, self.captured, self.frame_number))
+        self.captured += 1
+
+    def _frame_bytes(self):
+        return self.output.get_fb_x_size() * self.output.get_fb_y_size() * 4
+
+    def _wait_for_room(self, frame_bytes):
+        while self.futures and self.backlog_bytes + frame_bytes > self.memory_cap:
+            wait_for([self.futures.popleft()])
+
+    def _collect(self, texture, index):
+        if not texture.has_ram_image():
+            self.missed += 1
+            return
+        image = texture.get_ram_image()
+        texture.clear_ram_image()   # the next copy allocates afresh; `image` now belongs to the encoder
+        width, height = texture.get_x_size(), texture.get_y_size()
+        with self._lock:
+            self.backlog_bytes += len(image)
+            self.peak_backlog_bytes = max(self.peak_backlog_bytes, self.backlog_bytes)
+        self.futures.append(self.executor.submit(self._encode, index, image, width, height))
+        while self.futures and self.futures[0].done():
+            self.futures.popleft()
+
+    def _encode(self, index, image, width, height):
+        start = time.perf_counter()
+        try:
+            self.sink.write(index, image, width, height)
+            ok = True
+        except Exception as error:
+            print(f"Frame capture: frame {index} failed: {error!r}")
+            ok = False
+        with self._lock:
+            self.backlog_bytes -= len(image)
+            self.encode_seconds += time.perf_counter() - start
+            self.encoded += ok
+            self.errors += not ok
+
+    def stop(self):
+        """Collect the last copies, wait for the encoders and close the sink; returns summary()."""
+        if not self.recording:
+            return self.summary()
+        while self.in_flight:
+            texture, index, frame_number = self.in_flight.popleft()
+            if frame_number == self.frame_number:
+                self.captured -= 1   # asked for after the last frame was drawn
+            else:
+                self._collect(texture, index)
+        self.output.clear_render_textures()
+        self.executor.shutdown(wait=True)
+        self.futures.clear()
+        self.sink.close()
+        if self.size:
+            from direct.showbase.ShowBaseGlobal import base
+            base.graphicsEngine.remove_window(self.output)
+        self.output = None
+        self.recording = False
+        self.stopped_at = time.perf_counter()
+        return self.summary()
+
+    def summary(self):
+        if self.started_at is None:
+            return "not recording"
+        elapsed = (time.perf_counter() if self.recording else self.stopped_at) - self.started_at
+        per_frame = self.encode_seconds / max(self.encoded, 1)
+        return (f"{self.captured} of {self.frames} frames captured ({self.dropped} dropped for the "
+                f"{self.memory_cap / 2 ** 20:.0f} MB cap, {self.missed} missed), {self.encoded} encoded at "
+                f"{self.encoded / max(elapsed, 1e-9):.1f} frames/s ({per_frame * 1000:.0f} ms each), backlog "
+                f"{self.captured - self.encoded - self.errors - self.missed} frames / {self.backlog_bytes / 2 ** 20:.0f} MB "
+                f"(peak {self.peak_backlog_bytes / 2 ** 20:.0f} MB), {self.errors} errors")
+
+
+def install(app, sink, sort=55, **kwargs):
+    """A FrameCapture whose frame() runs each frame right after igLoop (sort 50) renders."""
+    recorder = FrameCapture(sink, **kwargs)
+
+    def capture_task(task):
+        recorder.frame()
+        return task.cont
+
+    app.taskMgr.add(capture_task, 'capture-frame', sort=sort)
+    return recorder
+
+
+def from_environment(app, cameras=tuple):
+    """install() configured by SM64_CAPTURE (a PNG directory) or SM64_CAPTURE_PIPE (a command), or None.
+
+    cameras returns the cameras for an offscreen capture; it is only called
+    when a capture is configured, since headless runs have no UI camera.
+
+    SM64_CAPTURE_SIZE (e.g. 3840x2160) records an offscreen buffer of that
+    size, SM64_CAPTURE_MB caps the backlog and SM64_CAPTURE_WAIT=1 makes the
+    game wait for the encoders instead of dropping frames.
+    """
+    if os.environ.get('SM64_CAPTURE_PIPE'):
+        sink = RawPipe(os.environ['SM64_CAPTURE_PIPE'])
+    elif os.environ.get('SM64_CAPTURE'):
+        sink = PngSequence(os.environ['SM64_CAPTURE'])
+    else:
+        return None
+    return install(app, sink, size=parse_size(os.environ.get('SM64_CAPTURE_SIZE')), cameras=cameras(),
+                   memory_cap_mb=int(os.environ.get('SM64_CAPTURE_MB', 1024)),
+                   wait=bool(os.environ.get('SM64_CAPTURE_WAIT')))
+
+
+if __name__ == '__main__':
+    import argparse
+    import tempfile
+
+    parser = argparse.ArgumentParser(description='Time PNG encoding of one frame and the capture hand-off.')
+    parser.add_argument('--size', default='3840x2160')
+    parser.add_argument('--level', type=int, default=1, help='zlib level')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--frames', type=int, default=16)
+    args = parser.parse_args()
+
+    width, height = parse_size(args.size)
+    rng = np.random.default_rng(1)
+    # A gradient with noise: harder to compress than most game frames, so a pessimistic figure.
+    y, x = np.mgrid[0:height, 0:width]
+    frame = np.stack([(x * 255 // width), (y * 255 // height), (x + y) % 256, np.full_like(x, 255)], axis=-1)
+    frame = (frame + rng.integers(0, 4, frame.shape)).clip(0, 255).astype(np.uint8)
+    start = time.perf_counter()
+    data = png_bytes(frame, args.level)
+    single = time.perf_counter() - start
+    print(f"{width}x{height} frame: {frame.nbytes / 2 ** 20:.0f} MB raw, {len(data) / 2 ** 20:.1f} MB PNG "
+          f"in {single * 1000:.0f} ms on one thread")
+
+    with tempfile.TemporaryDirectory() as directory:
+        sink = PngSequence(directory, args.level)
+        pool = ThreadPoolExecutor(max_workers=args.workers)
+        buffer = frame.tobytes()
+        start = time.perf_counter()
+        handoff = 0.0
+        futures = []
+        for i in range(args.frames):
+            t = time.perf_counter()
+            futures.append(pool.submit(sink.write, i, buffer, width, height))
+            handoff += time.perf_counter() - t
+        wait_for(futures)
+        elapsed = time.perf_counter() - start
+        pool.shutdown()
+        print(f"{args.workers} encoder threads: {args.frames / elapsed:.1f} frames/s; "
+              f"hand-off {handoff / args.frames * 1e6:.0f} us per frame on the game thread")
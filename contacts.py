@@ -0,0 +1,181 @@
+# contacts.py - Contact-pair events with a (TypeA, TypeB) dispatch table.
+# Once per tick the system hashes body AABBs into a uniform grid, collects the
+# overlapping pairs whose types have a registered handler, diffs them against
+# the previous tick and dispatches enter, stay and exit callbacks. Entities no
+# longer poll intersects(player) themselves, and there are no isinstance chains.
+
+import math
+
+ENTER, STAY, EXIT = 'enter', 'stay', 'exit'
+
+
+class Body:
+    __slots__ = ('obj', 'id', 'half', 'offset', 'static', 'aabb', 'cells')
+
+    def __init__(self, obj, id, half, offset, static):
+        self.obj = obj
+        self.id = id
+        self.half = half
+        self.offset = offset
+        self.static = static
+        self.aabb = None
+        self.cells = ()
+
+
+def _entity_aabb(body):
+    obj = body.obj
+    p = obj.world_position
+    ox, oy, oz = body.offset
+    if body.half is None:
+        s = obj.world_scale
+        hx, hy, hz = abs(s[0]) / 2, abs(s[1]) / 2, abs(s[2]) / 2
+    else:
+        hx, hy, hz = body.half
+    x, y, z = p[0] + ox, p[1] + oy, p[2] + oz
+    return (x - hx, y - hy, z - hz, x + hx, y + hy, z + hz)
+
+
+def _overlap(a, b):
+    return a[0] < b[3] and b[0] < a[3] and a[1] < b[4] and b[1] < a[4] and a[2] < b[5] and b[2] < a[5]
+
+
+class ContactSystem:
+    """Broadphase plus enter/stay/exit dispatch for registered type pairs.
+
+    Register handlers declaratively:
+
+        contacts = ContactSystem()
+
+        @contacts.on(Player, Coin)
+        def pick_up(player, coin): ...
+
+    Handlers always receive arguments in the registered (TypeA, TypeB) order.
+    Bodies are axis-aligned boxes: by default the entity's world scale around
+    its world position, or explicit half extents and an offset. Static bodies
+    are hashed once; only moving ones are re-hashed each tick.
+    """
+
+    def __init__(self, cell_size=4.0):
+        self.cell_size = cell_size
+        self.handlers = {}        # (TypeA, TypeB) -> {event: handler}
+        self._resolved = {}       # (type, type) -> (handlers, swapped) or None
+        self.bodies = {}          # id(obj) -> Body
+        self._next_id = 0
+        self._static_cells = {}
+        self._contacts = {}       # (body id, body id) -> (first body, second body, handlers)
+
+    # --- Registration ---
+
+    def on(self, type_a, type_b, event=ENTER):
+        def register(handler):
+            self.handlers.setdefault((type_a, type_b), {})[event] = handler
+            self._resolved.clear()
+            return handler
+        return register
+
+    def add(self, obj, half_extents=None, offset=(0, 0, 0), static=False):
+        body = Body(obj, self._next_id, half_extents, offset, static)
+        self._next_id += 1
+        self.bodies[id(obj)] = body
+        if static:
+            body.aabb = _entity_aabb(body)
+            body.cells = self._cells_for(body.aabb)
+            for cell in body.cells:
+                self._static_cells.setdefault(cell, []).append(body)
+        return obj
+
+    def remove(self, obj):
+        body = self.bodies.pop(id(obj), None)
+        if body is None:
+            return
+        for cell in body.cells if body.static else ():
+            self._static_cells[cell].remove(body)
+        for key in [k for k in self._contacts if body.id in k]:
+            a, b, handlers = self._contacts.pop(key)
+            self._dispatch(handlers, EXIT, a, b)
+
+    # --- Dispatch ---
+
+    def _handlers_for(self, type_a, type_b):
+        key = (type_a, type_b)
+        if key not in self._resolved:
+            found = None
+            for ta in type_a.__mro__:
+                for tb in type_b.__mro__:
+                    if (ta, tb) in self.handlers:
+                        found = (self.handlers[(ta, tb)], False)
+                        break
+                    if (tb, ta) in self.handlers:
+                        found = (self.handlers[(tb, ta)], True)
+                        break
+                if found:
+                    break
+            self._resolved[key] = found
+        return self._resolved[key]
+
+    @staticmethod
+    def _dispatch(handlers, event, a, b):
+        handler = handlers.get(event)
+        if handler:
+            handler(a.obj, b.obj)
+
+    def _cells_for(self, aabb):
+        size = self.cell_size
+        return [(ix, iz)
+                for ix in range(math.floor(aabb[0] / size), math.floor(aabb[3] / size) + 1)
+                for iz in range(math.floor(aabb[2] / size), math.floor(aabb[5] / size) + 1)]
+
+    def _pair(self, a, b, found):
+        handlers, swapped = found
+        if swapped:
+            a, b = b, a
+        key = (a.id, b.id) if a.id < b.id else (b.id, a.id)
+        return key, (a, b, handlers)
+
+    def step(self):
+        """Find this tick's contacts and fire enter/stay/exit handlers."""
+        dynamic = [b for b in self.bodies.values() if not b.static and getattr(b.obj, 'enabled', True)]
+        grid = {}
+        current = {}
+        for body in dynamic:
+            body.aabb = _entity_aabb(body)
+            body.cells = self._cells_for(body.aabb)
+            for cell in body.cells:
+                grid.setdefault(cell, []).append(body)
+
+        for body in dynamic:
+            tested = set()
+            for cell in body.cells:
+                for other in self._static_cells.get(cell, ()):
+                    if other.id in tested or not getattr(other.obj, 'enabled', True):
+                        continue
+                    tested.add(other.id)
+                    found = self._handlers_for(type(body.obj), type(other.obj))
+                    if found and _overlap(body.aabb, other.aabb):
+                        key, value = self._pair(body, other, found)
+                        current[key] = value
+                for other in grid.get(cell, ()):
+                    # Each dynamic pair is considered once, from its lower id.
+                    if other.id <= body.id or other.id in tested:
+                        continue
+                    tested.add(other.id)
+                    found = self._handlers_for(type(body.obj), type(other.obj))
+                    if found and _overlap(body.aabb, other.aabb):
+                        key, value = self._pair(body, other, found)
+                        current[key] = value
+
+        previous = self._contacts
+        self._contacts = current
+        for key, (a, b, handlers) in previous.items():
+            if key not in current:
+                self._dispatch(handlers, EXIT, a, b)
+        for key, (a, b, handlers) in list(current.items()):
+            # A handler may have removed a body (a collected coin) mid-dispatch.
+            if key in self._contacts:
+                self._dispatch(handlers, STAY if key in previous else ENTER, a, b)
+
+    def touching(self, obj):
+        body = self.bodies.get(id(obj))
+        if body is None:
+            return []
+        return [(b if a is body else a).obj for a, b, _ in self._contacts.values() if body in (a, b)]
@@ -1,8 +1,12 @@
 from ursina import *
 from ursina.shaders import basic_lighting_shader
 import math
+import hdr
 
 app = Ursina()
+# Float scene target, bloom and tonemapping. SM64_HDR=low/medium/high/off picks a tier;
+# the default fits one to 15% of the frame budget. F4 times each pass, F5 cycles tiers.
+hdr_pipeline = hdr.from_environment(app, budget_ms=1000 / 60)
 
 # Constants
 GRAVITY = 1.5
@@ -105,7 +109,9 @@ class Star(Entity):
             collider='sphere',
             shader=basic_lighting_shader
         )
-        
+        if hdr_pipeline and hdr_pipeline.active:
+            hdr.emissive(self, 3.0)  # bright enough to bloom instead of clipping to flat yellow
+
 stars = [
     Star((0, 20, 50)),
     Star((15, 10, 20)),
@@ -122,6 +128,8 @@ class Coin(Entity):
             collider='sphere',
             shader=basic_lighting_shader
         )
+        if hdr_pipeline and hdr_pipeline.active:
+            hdr.emissive(self, 1.6)
 
 coins = [Coin((x*2, 3, z*2)) for x in range(-10,10) for z in range(-10,10)]
 
@@ -143,6 +151,12 @@ def update():
 def input(key):
     if key == 'space':
         player.jump()
+    if key == 'f4' and hdr_pipeline:
+        hdr_pipeline.profile()
+        print(hdr_pipeline.summary())
+    if key == 'f5' and hdr_pipeline:
+        hdr_pipeline.cycle()
+        print(hdr_pipeline.summary())
 
 # Collisions
 def on_collision(e1, e2):
@@ -0,0 +1,291 @@
+# dormant.py - Compact dormant actors that become Entities only near the player.
+# Placed objects (coins, enemies, props) live as rows in typed arrays: a kind,
+# a transform and a flags byte, about 30 bytes each instead of a full Ursina
+# Entity with its NodePath and collider. Rows inside the activation radius are
+# materialized through a per-kind spawn callback and returned to dormancy, with
+# their state written back, once the player is far enough away again.
+
+import array
+import math
+import os
+
+RETIRED = 1        # collected or destroyed: never materializes again
+USER_FLAGS = 0xFE  # remaining bits are free for game state
+
+
+class ActorKind:
+    __slots__ = ('name', 'id', 'spawn', 'despawn', 'save')
+
+    def __init__(self, name, id, spawn, despawn, save):
+        self.name = name
+        self.id = id
+        self.spawn = spawn
+        self.despawn = despawn
+        self.save = save
+
+
+class ActorProxy:
+    """A view of one stored actor; costs nothing until you ask for one."""
+    __slots__ = ('store', 'index')
+
+    def __init__(self, store, index):
+        self.store = store
+        self.index = index
+
+    @property
+    def kind(self):
+        return self.store.kinds[self.store.kind[self.index]].name
+
+    @property
+    def position(self):
+        s, i = self.store, self.index
+        return (s.x[i], s.y[i], s.z[i])
+
+    @position.setter
+    def position(self, value):
+        s, i = self.store, self.index
+        s.x[i], s.y[i], s.z[i] = value
+
+    @property
+    def rotation_y(self):
+        return self.store.rotation_y[self.index]
+
+    @rotation_y.setter
+    def rotation_y(self, value):
+        self.store.rotation_y[self.index] = value
+
+    @property
+    def scale(self):
+        return self.store.scale[self.index]
+
+    @property
+    def flags(self):
+        return self.store.flags[self.index]
+
+    @flags.setter
+    def flags(self, value):
+        self.store.flags[self.index] = value
+
+    @property
+    def retired(self):
+        return bool(self.store.flags[self.index] & RETIRED)
+
+    @property
+    def entity(self):
+        return self.store.active.get(self.index)
+
+
+class ActorStore:
+    """Struct-of-arrays storage with radius-based materialization.
+
+    Register a kind once with callbacks that turn a proxy into an Entity and
+    back:
+
+        store.register('coin', spawn=lambda p: Coin(p.position),
+                       despawn=destroy)
+        store.add('coin', (x, y, z))
+        ...
+        store.update(player.position, radius=40)   # once per frame
+
+    save(proxy, entity), if given, copies entity state back into the row
+    before the entity is despawned, so moving actors go dormant where they
+    stopped. Actors are filed in an XZ grid by their position when dormant.
+    """
+
+    def __init__(self, cell_size=16.0):
+        self.cell_size = cell_size
+        self.kinds = []
+        self._kind_ids = {}
+        self.kind = array.array('B')
+        self.x = array.array('f')
+        self.y = array.array('f')
+        self.z = array.array('f')
+        self.rotation_y = array.array('f')
+        self.scale = array.array('f')
+        self.flags = array.array('B')
+        self.cells = {}           # (cx, cz) -> array of actor indices
+        self.active = {}          # actor index -> materialized entity
+        self._scan_center = None
+
+    def __len__(self):
+        return len(self.kind)
+
+    # --- Registration ---
+
+    def register(self, name, spawn, despawn, save=None):
+        kind = ActorKind(name, len(self.kinds), spawn, despawn, save)
+        self.kinds.append(kind)
+        self._kind_ids[name] = kind.id
+        return kind
+
+    def add(self, name, position, rotation_y=0.0, scale=1.0, flags=0):
+        index = len(self.kind)
+        x, y, z = position
+        self.kind.append(self._kind_ids[name])
+        self.x.append(x)
+        self.y.append(y)
+        self.z.append(z)
+        self.rotation_y.append(rotation_y)
+        self.scale.append(scale)
+        self.flags.append(flags)
+        self.cells.setdefault(self._cell(x, z), array.array('I')).append(index)
+        self._scan_center = None
+        return index
+
+    def proxy(self, index):
+        return ActorProxy(self, index)
+
+    def _cell(self, x, z):
+        return math.floor(x / self.cell_size), math.floor(z / self.cell_size)
+
+    # --- Activation ---
+
+    def materialize(self, index):
+        entity = self.active.get(index)
+        if entity is None and not self.flags[index] & RETIRED:
+            entity = self.kinds[self.kind[index]].spawn(ActorProxy(self, index))
+            self.active[index] = entity
+        return entity
+
+    def dematerialize(self, index):
+        entity = self.active.pop(index, None)
+        if entity is None:
+            return
+        kind = self.kinds[self.kind[index]]
+        if kind.save and not self.flags[index] & RETIRED:
+            old_cell = self._cell(self.x[index], self.z[index])
+            kind.save(ActorProxy(self, index), entity)
+            new_cell = self._cell(self.x[index], self.z[index])
+            if new_cell != old_cell:
+                self.cells[old_cell].remove(index)
+                self.cells.setdefault(new_cell, array.array('I')).append(index)
+        kind.despawn(entity)
+
+    def move(self, index, position):
+        """Relocate an actor, re-filing its grid cell and moving its entity if it is active."""
+        old_cell = self._cell(self.x[index], self.z[index])
+        self.x[index], self.y[index], self.z[index] = position
+        new_cell = self._cell(self.x[index], self.z[index])
+        if new_cell != old_cell:
+            self.cells[old_cell].remove(index)
+            self.cells.setdefault(new_cell, array.array('I')).append(index)
+        entity = self.active.get(index)
+        if entity is not None:
+            entity.position = position
+        self._scan_center = None
+
+    def retire(self, index):
+        """Mark an actor as gone for good and drop its entity, if any."""
+        self.flags[index] |= RETIRED
+        self.dematerialize(index)
+
+    def restore(self, index):
+        """Bring a retired actor back (save-state loads); it materializes on the next update."""
+        if self.flags[index] & RETIRED:
+            self.flags[index] &= ~RETIRED & 0xFF
+            self._scan_center = None
+
+    def update(self, center, radius, hysteresis=8.0, max_spawns=None):
+        """Materialize actors within radius of center and release those past radius + hysteresis.
+
+        The grid is only rescanned after the center has moved hysteresis / 2,
+        so a player standing still costs one pass over the active set. With
+        max_spawns, at most that many actors materialize per call; the rest
+        wait for a later call. Returns how many materialized.
+        """
+        cx, _, cz = center
+        far = (radius + hysteresis) ** 2
+        for index in [i for i in self.active if (self.x[i] - cx) ** 2 + (self.z[i] - cz) ** 2 > far]:
+            self.dematerialize(index)
+
+        last = self._scan_center
+        if last is not None and (last[0] - cx) ** 2 + (last[1] - cz) ** 2 < (hysteresis / 2) ** 2:
+            return 0
+        self._scan_center = (cx, cz)
+        spawned = 0
+        near = radius * radius
+        size = self.cell_size
+        x, z, flags, active = self.x, self.z, self.flags, self.active
+        for ix in range(math.floor((cx - radius) / size), math.floor((cx + radius) / size) + 1):
+            for iz in range(math.floor((cz - radius) / size), math.floor((cz + radius) / size) + 1):
+                for i in self.cells.get((ix, iz), ()):
+                    if i not in active and not flags[i] & RETIRED and (x[i] - cx) ** 2 + (z[i] - cz) ** 2 <= near:
+                        if max_spawns is not None and spawned >= max_spawns:
+                            self._scan_center = None   # deferred: scan again next call
+                            return spawned
+                        self.materialize(i)
+                        spawned += 1
+        return spawned
+
+    def clear_active(self):
+        for index in list(self.active):
+            self.dematerialize(index)
+        self._scan_center = None
+
+
+# --- Memory report ---
+
+def _rss_bytes():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+
+def _measure(build):
+    import gc
+    import tracemalloc
+    gc.collect()
+    tracemalloc.start()
+    rss_before = _rss_bytes()
+    kept = build()
+    gc.collect()
+    python_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    rss = _rss_bytes() - rss_before
+    return kept, python_bytes, max(rss, python_bytes)
+
+
+def _dormant_store(count):
+    store = ActorStore()
+    store.register('coin', spawn=lambda p: None, despawn=lambda e: None)
+    for i in range(count):
+        store.add('coin', (i % 1000 * 0.2 - 100, 3.0, i // 1000 * 0.2 - 100))
+    return store
+
+
+def _entities(count):
+    from ursina import Entity
+    return [Entity(model='sphere', color=(1, .8, 0, 1), scale=0.5, collider='sphere', position=(i % 100, 3, i // 100))
+            for i in range(count)]
+
+
+def memory_report(dormant_count=100000, entity_count=2000, target=100000, with_entities=True):
+    """Bytes per actor as a dormant row versus a full Entity, projected to `target` actors."""
+    rows = []
+    _, python_bytes, total = _measure(lambda: _dormant_store(dormant_count))
+    rows.append(('dormant', dormant_count, python_bytes / dormant_count, total / dormant_count))
+    if with_entities:
+        try:
+            from ursina import Ursina
+            Ursina(window_type='none')   # measured apart from the engine's own startup
+            _, python_bytes, total = _measure(lambda: _entities(entity_count))
+            rows.append(('entity', entity_count, python_bytes / entity_count, total / entity_count))
+        except ImportError as e:
+            print(f"Skipping Entity measurement: {e}")
+    print(f"{'mode':<8} {'measured':>9} {'python B/actor':>15} {'rss B/actor':>12} {f'{target} actors':>14}")
+    for mode, count, python_per, total_per in rows:
+        print(f"{mode:<8} {count:>9} {python_per:>15.0f} {total_per:>12.0f} {total_per * target / 2 ** 20:>11.1f} MB")
+    return rows
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Compare memory per actor for dormant rows and Ursina Entities.')
+    parser.add_argument('--dormant', type=int, default=100000, help='dormant actors to measure')
+    parser.add_argument('--entities', type=int, default=2000, help='Entities to measure (needs ursina)')
+    parser.add_argument('--target', type=int, default=100000, help='actor count to project to')
+    parser.add_argument('--no-entities', action='store_true', help='only measure the dormant store')
+    args = parser.parse_args()
+    memory_report(args.dormant, args.entities, args.target, not args.no_entities)
@@ -0,0 +1,196 @@
+# flowfield.py - One shared flow field that every chasing enemy follows.
+# The level's walkable ground is rasterized once into an XZ grid: cells under
+# low platforms, on slopes too steep to climb or under water are blocked. When
+# the target (the player) enters a new cell, a breadth-first search runs out
+# from that cell over the walkable grid and each cell stores the unit vector
+# toward its neighbour closest to the target. Chasers then cost one array
+# lookup each per tick, however many there are; the search cost depends only
+# on the grid and is paid once per target cell change.
+
+import math
+
+import numpy as np
+
+# (dz, dx) neighbour offsets; orthogonal first so ties prefer straight moves.
+NEIGHBOURS = ((0, 1), (0, -1), (1, 0), (-1, 0), (1, 1), (1, -1), (-1, 1), (-1, -1))
+OPPOSITE = (1, 0, 3, 2, 7, 6, 5, 4)
+
+
+def walkable_grid(field, cell_size=2.0, boxes=(), body_height=1.0, max_step=0.9, avoid=()):
+    """Walkable cells of a terrain.Heightfield as a (rows, cols) bool array.
+
+    boxes: (x, y, z, sx, sy, sz[, ...]) obstacles, blocking the cells whose
+    ground is within body_height below the box bottom; a motion tuple in the
+    eighth slot widens the box to its whole sweep. avoid: boxes whose XZ
+    footprint is blocked wherever the ground is below their top (water).
+    Slopes rising more than max_step across one cell are blocked too.
+    """
+    cols = rows = int(math.ceil(field.size / cell_size))
+    origin = -field.size / 2
+    centers = origin + (np.arange(cols) + 0.5) * cell_size
+    xs, zs = np.meshgrid(centers, centers)
+    ground = field.heights_at(xs.ravel(), zs.ravel()).reshape(rows, cols)
+    walkable = np.ones((rows, cols), bool)
+
+    rise = np.zeros_like(ground)
+    rise[:, :-1] = np.maximum(rise[:, :-1], np.abs(np.diff(ground, axis=1)))
+    rise[:, 1:] = np.maximum(rise[:, 1:], np.abs(np.diff(ground, axis=1)))
+    rise[:-1, :] = np.maximum(rise[:-1, :], np.abs(np.diff(ground, axis=0)))
+    rise[1:, :] = np.maximum(rise[1:, :], np.abs(np.diff(ground, axis=0)))
+    walkable &= rise <= max_step
+
+    def footprint(x, z, sx, sz):
+        c0 = max(int((x - sx / 2 - origin) // cell_size), 0)
+        c1 = min(int((x + sx / 2 - origin) // cell_size) + 1, cols)
+        r0 = max(int((z - sz / 2 - origin) // cell_size), 0)
+        r1 = min(int((z + sz / 2 - origin) // cell_size) + 1, rows)
+        return slice(r0, r1), slice(c0, c1)
+
+    for box in boxes:
+        x, y, z, sx, sy, sz = box[:6]
+        motion = box[7] if len(box) > 7 else None
+        if motion:
+            dx, dy, dz = motion[:3]
+            x, y, z = x + dx / 2, y + dy / 2, z + dz / 2
+            sx, sy, sz = sx + abs(dx), sy + abs(dy), sz + abs(dz)
+        r, c = footprint(x, z, sx, sz)
+        walkable[r, c] &= ground[r, c] + body_height <= y - sy / 2
+    for x, y, z, sx, sy, sz in avoid:
+        r, c = footprint(x, z, sx, sz)
+        walkable[r, c] &= ground[r, c] >= y + sy / 2
+    return walkable
+
+
+class FlowField:
+    """Per-cell unit directions toward a target, rebuilt when the target changes cell.
+
+        flow = FlowField(walkable_grid(terrain_field, boxes=platform_boxes), origin=-100, cell_size=2)
+        flow.update(player.x, player.z)            # every frame; cheap unless the cell changed
+        directions, following = flow.sample(xs, zs)
+
+    sample() returns (n, 2) XZ directions and a mask of chasers that have a
+    route; the rest (in the target's cell, on a blocked cell or cut off from
+    the target) should steer straight at the target. `vectors` is replaced,
+    never modified, on rebuild, so a reference taken for another thread stays
+    consistent.
+    """
+
+    def __init__(self, walkable, origin, cell_size):
+        self.rows, self.cols = walkable.shape
+        self.origin = origin
+        self.cell_size = cell_size
+        # A blocked border lets flat-index neighbour offsets skip bounds checks.
+        self.width = self.cols + 2
+        padded = np.zeros((self.rows + 2, self.cols + 2), bool)
+        padded[1:-1, 1:-1] = walkable
+        self.open = padded.ravel()
+        inner = np.zeros_like(padded)
+        inner[1:-1, 1:-1] = True
+        self.inner = inner.ravel()
+        self.offsets = np.array([dz * self.width + dx for dz, dx in NEIGHBOURS])
+        # Diagonal steps must not cut the corner of a blocked cell.
+        self.allowed = np.empty((len(NEIGHBOURS), self.open.size), bool)
+        for k, (dz, dx) in enumerate(NEIGHBOURS):
+            allowed = np.roll(self.open, -self.offsets[k])
+            if dz and dx:
+                allowed &= np.roll(self.open, -dz * self.width) & np.roll(self.open, -dx)
+            self.allowed[k] = allowed & self.open
+        step = np.array([(dx, dz) for dz, dx in NEIGHBOURS], np.float32)
+        self.steps = step / np.linalg.norm(step, axis=1, keepdims=True)
+        self.target_cell = None
+        self.distance = None
+        self.vectors = np.zeros((self.rows + 2) * self.width, np.int8) - 1   # neighbour index, -1 = no route
+        self.rebuilds = 0
+
+    def cell_of(self, x, z):
+        c = np.clip(((np.asarray(x) - self.origin) // self.cell_size).astype(np.int64), 0, self.cols - 1)
+        r = np.clip(((np.asarray(z) - self.origin) // self.cell_size).astype(np.int64), 0, self.rows - 1)
+        return (r + 1) * self.width + (c + 1)
+
+    def update(self, x, z):
+        """Re-run the search if (x, z) is in a different cell than last time; returns whether it did."""
+        cell = int(self.cell_of(x, z))
+        if cell == self.target_cell:
+            return False
+        self.target_cell = cell
+        self._search(cell)
+        return True
+
+    def _seeds(self, target):
+        # A target standing on a platform or a steep spot: chase toward the nearest open cells instead.
+        if self.open[target]:
+            return np.array([target])
+        seen = np.zeros(self.open.size, bool)
+        seen[target] = True
+        frontier = np.array([target])
+        while frontier.size:
+            cells = (frontier[:, None] + self.offsets).ravel()
+            cells = np.unique(cells[self.inner[cells] & ~seen[cells]])
+            seen[cells] = True
+            if self.open[cells].any():
+                return cells[self.open[cells]]
+            frontier = cells
+        return frontier
+
+    def _search(self, target):
+        distance = np.full(self.open.size, np.iinfo(np.int32).max, np.int32)
+        frontier = self._seeds(target)
+        if frontier.size:
+            distance[frontier] = 0
+            level = 0
+            while frontier.size:
+                level += 1
+                # Expanding backwards from the target: a cell joins if it can step onto the frontier.
+                found = []
+                for k in range(len(NEIGHBOURS)):
+                    cells = frontier + self.offsets[k]
+                    cells = cells[self.allowed[OPPOSITE[k]][cells] & (distance[cells] > level)]
+                    distance[cells] = level
+                    found.append(cells)
+                frontier = np.unique(np.concatenate(found))
+        # Each reached cell points at its allowed neighbour with the smallest distance.
+        neighbour_distance = np.full((len(NEIGHBOURS), self.open.size), np.iinfo(np.int32).max, np.int32)
+        for k in range(len(NEIGHBOURS)):
+            neighbour_distance[k] = np.where(self.allowed[k], np.roll(distance, -self.offsets[k]), neighbour_distance[k])
+        best = np.argmin(neighbour_distance, axis=0).astype(np.int8)
+        routed = (neighbour_distance.min(axis=0) < distance) & (distance < np.iinfo(np.int32).max)
+        self.distance = distance
+        self.vectors = np.where(routed, best, -1).astype(np.int8)
+        self.rebuilds += 1
+
+    def sample(self, xs, zs, vectors=None):
+        vectors = self.vectors if vectors is None else vectors
+        index = vectors[self.cell_of(xs, zs)]
+        following = index >= 0
+        return np.where(following[:, None], self.steps[index], 0.0), following
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    import terrain
+
+    parser = argparse.ArgumentParser(description='Time flow-field rebuilds and chaser sampling.')
+    parser.add_argument('--chasers', type=int, default=500)
+    parser.add_argument('--cell', type=float, default=2.0)
+    args = parser.parse_args()
+
+    field = terrain.Heightfield.generate(1, size=200, samples=257)
+    start = time.perf_counter()
+    grid = walkable_grid(field, args.cell, avoid=[(50, -5, 50, 50, 2, 50)])
+    print(f"{grid.shape[0]}x{grid.shape[1]} grid, {grid.mean():.0%} walkable, "
+          f"rasterized in {(time.perf_counter() - start) * 1000:.1f} ms")
+    flow = FlowField(grid, -100, args.cell)
+    rng = np.random.default_rng(1)
+    xs, zs = rng.uniform(-95, 95, args.chasers), rng.uniform(-95, 95, args.chasers)
+    search = sample = 0.0
+    for i in range(50):
+        start = time.perf_counter()
+        flow.update(math.cos(i / 8) * 60, math.sin(i / 8) * 60)
+        search += time.perf_counter() - start
+        start = time.perf_counter()
+        directions, following = flow.sample(xs, zs)
+        sample += time.perf_counter() - start
+    print(f"search {search / flow.rebuilds * 1000:.2f} ms per target cell change, "
+          f"sampling {args.chasers} chasers {sample / 50 * 1000:.3f} ms, {following.mean():.0%} routed")
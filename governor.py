@@ -0,0 +1,221 @@
+# governor.py - Fit entity counts and effect quality to the host, then shed spawns when frames run long.
+# At startup a short benchmark, run headless in a child process because
+# Ursina allows one app per process, times frames with growing numbers of
+# static and updating entities and fits a line through them: a base frame
+# cost plus microseconds per drawn and per updated entity. The result is
+# cached per machine. plan_counts() scales a game's level counts so the
+# estimated frame fits a share of the frame budget and picks a quality tier
+# from how much it had to scale. At run time SpawnGovernor watches frame
+# times and holds optional spawns back while frames run over budget.
+
+import hashlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+CALIBRATION_VERSION = 1
+
+# Used when the benchmark cannot run (no display, no GPU, timed out): a modest machine.
+FALLBACK = {'base_ms': 4.0, 'draw_us': 25.0, 'update_us': 15.0, 'window_type': 'fallback'}
+
+QUALITY = {
+    'low': {'shadows': False, 'shadow_map': 512, 'particles': 1500},
+    'medium': {'shadows': True, 'shadow_map': 1024, 'particles': 4000},
+    'high': {'shadows': True, 'shadow_map': 2048, 'particles': 12000},
+}
+
+
+def machine_key():
+    """Stable ID for this machine and Python/Panda3D build; calibrations do not travel between them."""
+    try:
+        from panda3d.core import PandaSystem
+        panda = PandaSystem.get_version_string()
+    except ImportError:
+        panda = None
+    parts = (platform.node(), platform.machine(), platform.processor(), os.cpu_count(), sys.version_info[:2], panda)
+    return hashlib.sha1(repr(parts).encode()).hexdigest()[:16]
+
+
+# --- Benchmark ---
+
+def _fit(counts, frame_ms):
+    """Least-squares (intercept, slope) of frame_ms over counts."""
+    mean_n, mean_t = statistics.fmean(counts), statistics.fmean(frame_ms)
+    spread = sum((n - mean_n) ** 2 for n in counts)
+    slope = sum((n - mean_n) * (t - mean_t) for n, t in zip(counts, frame_ms)) / spread
+    return mean_t - slope * mean_n, slope
+
+
+def benchmark(window_type='offscreen', counts=(0, 250, 500), frames=30, warmup=5):
+    """Time frames of `counts` static and then updating cubes in a fresh Ursina app; returns a calibration dict.
+
+    Must run in a process of its own: it creates (and never closes) the app.
+    """
+    from panda3d.core import ClockObject
+    from ursina import Entity, Ursina, destroy
+    from ursina import time as ursina_time
+
+    app = Ursina(window_type=window_type, vsync=False, development_mode=False, size=(640, 360))
+    ClockObject.get_global_clock().set_mode(ClockObject.M_normal)   # never sleep to a frame cap
+
+    class Spinner(Entity):
+        def update(self):
+            self.rotation_y += 90 * ursina_time.dt
+            self.y += (0.5 - (self.rotation_y % 360 > 180)) * ursina_time.dt
+
+    results = {}
+    for kind, make in (('static', Entity), ('updating', Spinner)):
+        medians = []
+        for n in counts:
+            entities = [make(model='cube', collider='box', scale=0.5,
+                             position=(i % 20 - 10, i // 20 % 12 - 6, 5 + i // 240 * 2)) for i in range(n)]
+            times = []
+            for frame in range(warmup + frames):
+                start = time.perf_counter()
+                app.step()
+                if frame >= warmup:
+                    times.append((time.perf_counter() - start) * 1000)
+            medians.append(statistics.median(times))
+            for e in entities:
+                destroy(e)
+        results[kind] = _fit(counts, medians)
+    base_ms, draw_ms = results['static']
+    _, updating_ms = results['updating']
+    return {
+        'base_ms': max(base_ms, 0.0),
+        'draw_us': max(draw_ms * 1000, 0.1),
+        'update_us': max((updating_ms - draw_ms) * 1000, 0.0),
+        'window_type': window_type,
+    }
+
+
+def load_calibration(cache_dir=os.path.join('.cache', 'governor'), refresh=False, timeout=60):
+    """This machine's calibration, from the cache or measured now in a child process.
+
+    If the benchmark fails, FALLBACK is cached instead, marked fallback=True;
+    refresh=True (SM64_CALIBRATE=1 in the games) measures again.
+    """
+    path = os.path.join(cache_dir, f'calibration-{machine_key()}.json')
+    if not refresh:
+        try:
+            with open(path) as f:
+                calibration = json.load(f)
+            if calibration.get('version') == CALIBRATION_VERSION:
+                return calibration
+        except (OSError, ValueError):
+            pass
+    calibration = None
+    for window_type in ('offscreen', 'none'):   # 'none' still measures update and cull cost without a GPU
+        try:
+            done = subprocess.run([sys.executable, os.path.abspath(__file__), '--json', '--window-type', window_type],
+                                  capture_output=True, text=True, timeout=timeout)
+            calibration = json.loads(done.stdout.strip().splitlines()[-1]) if done.returncode == 0 else None
+        except (OSError, subprocess.TimeoutExpired, ValueError, IndexError):
+            calibration = None
+        if calibration:
+            break
+    if not calibration:
+        # Cached like a measurement, so a machine where the benchmark cannot run only waits for it once.
+        print("Frame budget calibration failed; planning for a modest machine until it is measured again.")
+        calibration = dict(FALLBACK, fallback=True)
+    calibration.update(version=CALIBRATION_VERSION, measured_at=time.time())
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(calibration, f, indent=1)
+    os.replace(tmp_path, path)
+    return calibration
+
+
+# --- Planning ---
+
+def estimate_ms(calibration, counts, costs):
+    """Estimated frame time for `counts` of items costing (drawn, updated) entities each."""
+    total = calibration['base_ms']
+    for name, count in counts.items():
+        drawn, updated = costs.get(name, (1, 0))
+        total += count * (drawn * calibration['draw_us'] + updated * calibration['update_us']) / 1000
+    return total
+
+
+def plan_counts(calibration, counts, costs, budget_ms, share=0.6, min_scale=0.25, max_scale=3.0, scale=None):
+    """Scale `counts` so the estimate fits share * budget_ms; returns (counts, scale, quality name).
+
+    costs maps each count to (drawn, updated) entities per item; an item that
+    is usually dormant or far away costs a fraction of an entity. A given
+    `scale` is used as is, e.g. to reproduce a layout vetted at full size.
+    """
+    if scale is None:
+        fixed = estimate_ms(calibration, {}, costs)
+        variable = estimate_ms(calibration, counts, costs) - fixed
+        scale = (budget_ms * share - fixed) / variable if variable > 0 else max_scale
+        scale = min(max(scale, min_scale), max_scale)
+    planned = {name: max(1, round(count * scale)) for name, count in counts.items()}
+    quality = 'low' if scale < 0.6 else 'medium' if scale < 1.5 else 'high'
+    return planned, scale, quality
+
+
+# --- Run time ---
+
+class SpawnGovernor:
+    """Hands out a per-frame spawn allowance that drops to zero while frames run over budget.
+
+        spawns = SpawnGovernor(budget_ms=1000 / 60)
+        def update():
+            spawns.frame(time.dt)
+            actors.update(player.position, radius, max_spawns=spawns.allowance())
+
+    Frame times are smoothed, so one slow frame does not stall spawning; the
+    allowance comes back once the average is under `resume` of the budget.
+    """
+
+    def __init__(self, budget_ms, per_frame=8, smoothing=0.1, resume=0.9):
+        self.budget_ms = budget_ms
+        self.per_frame = per_frame
+        self.smoothing = smoothing
+        self.resume = resume
+        self.average_ms = budget_ms * resume
+        self.throttled = False
+        self.frames = 0
+        self.throttled_frames = 0
+
+    def frame(self, dt):
+        self.average_ms += (dt * 1000 - self.average_ms) * self.smoothing
+        if self.throttled:
+            self.throttled = self.average_ms > self.budget_ms * self.resume
+        else:
+            self.throttled = self.average_ms > self.budget_ms
+        self.frames += 1
+        self.throttled_frames += self.throttled
+
+    def allowance(self):
+        return 0 if self.throttled else self.per_frame
+
+    def summary(self):
+        return (f"average frame {self.average_ms:.1f} ms of {self.budget_ms:.1f} ms budget, optional spawns held "
+                f"{self.throttled_frames / max(self.frames, 1):.0%} of frames")
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Measure per-entity frame cost on this machine.')
+    parser.add_argument('--window-type', default='offscreen', choices=('offscreen', 'none'))
+    parser.add_argument('--json', action='store_true', help='print only the calibration as JSON (used by load_calibration)')
+    args = parser.parse_args()
+
+    if args.json:
+        result = benchmark(args.window_type)
+        sys.stdout.flush()
+        print(json.dumps(result))
+        os._exit(0)   # skip Panda3D's teardown of the never-run app
+    calibration = load_calibration(refresh=True)
+    print(f"{calibration['window_type']}: base {calibration['base_ms']:.2f} ms, "
+          f"{calibration['draw_us']:.1f} us per drawn entity, {calibration['update_us']:.1f} us per updated entity")
+    for fps in (30, 60, 144):
+        counts, scale, quality = plan_counts(calibration, {'entities': 1000}, {'entities': (1, 1)}, 1000 / fps)
+        print(f"{fps:>3} FPS: {counts['entities']} updating entities fit ({scale:.2f}x of 1000), {quality} quality")
@@ -0,0 +1,336 @@
+# gym_env.py - Gym-style environments over the headless sim.py rules, for bots and training.
+# GameEnv wraps one sim.World with reset(seed) / step(action) returning
+# NumPy observations and rewards; no window, no renderer, fixed 30 Hz ticks,
+# so a seed and an action sequence always replay the same episode.
+# VectorEnv runs many of them split across worker processes that read
+# actions from and write observations into one shared-memory block, so a
+# step costs one short pipe message per worker rather than pickled arrays.
+
+import math
+import multiprocessing
+import os
+import random
+from collections import OrderedDict
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import level_gen
+import sim
+
+TURN_RATE = 180.0          # degrees per second at turn = 1
+MAX_STEPS = 30 * 150       # 150 simulated seconds
+REWARDS = {'star': 1.0, 'coin': 0.02, 'stomp': 0.1, 'hurt': -0.5, 'step': -0.0005}
+
+# Observation layout: the player, then the nearest untaken stars and coins and
+# live Goombas as (dx, dy, dz, present) relative to the player, nearest first.
+NEAREST = (('stars', 3), ('coins', 4), ('goombas', 2))
+PLAYER_FEATURES = 10
+OBSERVATION_SIZE = PLAYER_FEATURES + 4 * sum(k for _, k in NEAREST)
+ACTION_SIZE = 4            # move_x (strafe), move_z (forward), turn, jump; all in [-1, 1], jump when > 0
+WORLD_SCALE = 100.0        # positions and offsets are divided by this
+
+
+class GameEnv:
+    """One player in one level, stepped at sim.TICK_RATE.
+
+        env = GameEnv()
+        obs, info = env.reset(seed=42)
+        obs, reward, terminated, truncated, info = env.step(np.array([0, 1, 0.2, 0], np.float32))
+
+    An episode ends (terminated) when every star is collected or health runs
+    out, and is cut off (truncated) after max_steps. Levels are generated
+    from the seed with `params`; the last few are kept in memory, so
+    resetting to the same seeds does not regenerate them.
+    """
+
+    def __init__(self, params=None, max_steps=MAX_STEPS, rewards=REWARDS, level_cache=8):
+        self.params = params or level_gen.LevelParams()
+        self.max_steps = max_steps
+        self.rewards = dict(REWARDS, **rewards)
+        self.level_cache = level_cache
+        self._levels = OrderedDict()
+        self.world = None
+        self.player = None
+        self.seed = None
+        self.steps = 0
+        self.episode_return = 0.0
+        self.observation = np.zeros(OBSERVATION_SIZE, np.float32)
+
+    def _level(self, seed):
+        spec = self._levels.pop(seed, None)
+        if spec is None:
+            spec = level_gen.generate_level(seed, self.params)
+        self._levels[seed] = spec
+        while len(self._levels) > self.level_cache:
+            self._levels.popitem(last=False)
+        return spec
+
+    def reset(self, seed=None):
+        self.seed = random.randrange(2 ** 31) if seed is None else seed
+        spec = self._level(self.seed)
+        self.world = sim.World(spec)
+        self.player = self.world.add_player(0)
+        self.steps = 0
+        self.episode_return = 0.0
+        self.total_stars = len(spec.stars)
+        self.positions = {
+            'stars': np.array([s[:3] for s in spec.stars], np.float64).reshape(-1, 3),
+            'coins': np.array([c[:3] for c in spec.coins], np.float64).reshape(-1, 3),
+            'goombas': np.array([(g.x, g.y, g.z) for g in self.world.goombas], np.float64).reshape(-1, 3),
+        }
+        self.live = {name: np.ones(len(array), bool) for name, array in self.positions.items()}
+        return self._observe(), {'seed': self.seed}
+
+    def step(self, action):
+        move_x, move_z, turn, jump = (min(max(float(a), -1.0), 1.0) for a in action)
+        p = self.player
+        yaw = (p.yaw + turn * TURN_RATE * sim.DT) % 360
+        events = self.world.step({0: (move_x, move_z, yaw, jump > 0)})
+        reward = self.rewards['step']
+        for kind, _, index in events:
+            reward += self.rewards[kind]
+            if kind == 'star':
+                self.live['stars'][index] = False
+            elif kind == 'coin':
+                self.live['coins'][index] = False
+            elif kind == 'stomp':
+                self.live['goombas'][index] = False
+        self.steps += 1
+        self.episode_return += reward
+        terminated = p.stars >= self.total_stars or p.health <= 0
+        truncated = not terminated and self.steps >= self.max_steps
+        info = {}
+        if terminated or truncated:
+            info = {'seed': self.seed, 'return': self.episode_return, 'length': self.steps,
+                    'stars': p.stars, 'coins': p.coins, 'health': p.health}
+        return self._observe(), reward, terminated, truncated, info
+
+    def _observe(self):
+        p = self.player
+        obs = self.observation
+        yaw = math.radians(p.yaw)
+        obs[:PLAYER_FEATURES] = (p.x / WORLD_SCALE, p.y / WORLD_SCALE, p.z / WORLD_SCALE, p.vy / 20.0,
+                                 math.sin(yaw), math.cos(yaw), p.grounded, p.health / 8.0,
+                                 p.stars / max(self.total_stars, 1), self.steps / self.max_steps)
+        goombas = self.positions['goombas']
+        for i, g in enumerate(self.world.goombas):
+            goombas[i] = g.x, g.y, g.z
+        here = np.array((p.x, p.y, p.z))
+        start = PLAYER_FEATURES
+        for name, k in NEAREST:
+            slots = obs[start:start + 4 * k].reshape(k, 4)
+            slots[:] = 0
+            live = np.flatnonzero(self.live[name])
+            if len(live):
+                offsets = self.positions[name][live] - here
+                d2 = np.einsum('ij,ij->i', offsets, offsets)
+                nearest = np.argsort(d2)[:k] if len(live) <= 4 * k else np.argpartition(d2, k - 1)[:k]
+                nearest = nearest[np.argsort(d2[nearest])]
+                slots[:len(nearest), :3] = offsets[nearest] / WORLD_SCALE
+                slots[:len(nearest), 3] = 1
+            start += 4 * k
+        return obs.copy()
+
+
+# --- Vectorized ---
+
+def _layout(num_envs):
+    """(name, dtype, shape, offset) of each array in the shared block, and its total size."""
+    fields = [('actions', np.float32, (num_envs, ACTION_SIZE)), ('observations', np.float32, (num_envs, OBSERVATION_SIZE)),
+              ('rewards', np.float32, (num_envs,)), ('terminated', np.bool_, (num_envs,)),
+              ('truncated', np.bool_, (num_envs,))]
+    layout, offset = [], 0
+    for name, dtype, shape in fields:
+        layout.append((name, dtype, shape, offset))
+        offset += -(-int(np.prod(shape)) * np.dtype(dtype).itemsize // 64) * 64   # keep arrays 64-byte aligned
+    return layout, offset
+
+
+def _views(buffer, layout):
+    return {name: np.ndarray(shape, dtype, buffer=buffer, offset=offset) for name, dtype, shape, offset in layout}
+
+
+class _EnvSlice:
+    """Envs lo..hi of a VectorEnv and their episode seeds; runs in a worker or in process."""
+
+    def __init__(self, lo, hi, env_kwargs):
+        self.lo, self.hi = lo, hi
+        self.envs = [GameEnv(**env_kwargs) for _ in range(lo, hi)]
+        self.episodes = [0] * (hi - lo)
+
+    def reset(self, arrays, seed, num_envs):
+        self.seed, self.num_envs = seed, num_envs
+        self.episodes = [0] * (self.hi - self.lo)
+        for k, env in enumerate(self.envs):
+            arrays['observations'][self.lo + k] = env.reset(seed + self.lo + k)[0]
+
+    def step(self, arrays):
+        """Step every env; one that finishes is reset to its next seed. Returns [(env index, info)] of finished episodes."""
+        finished = []
+        actions, observations = arrays['actions'], arrays['observations']
+        rewards, terminated, truncated = arrays['rewards'], arrays['terminated'], arrays['truncated']
+        for k, env in enumerate(self.envs):
+            i = self.lo + k
+            obs, rewards[i], terminated[i], truncated[i], info = env.step(actions[i])
+            if info:
+                finished.append((i, info))
+                # Episode e of env i plays seed + i + e * num_envs, whichever process runs it.
+                self.episodes[k] += 1
+                obs, _ = env.reset(self.seed + i + self.episodes[k] * self.num_envs)
+            observations[i] = obs
+        return finished
+
+
+def _worker(shm_name, num_envs, lo, hi, env_kwargs, pipe):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    layout, _ = _layout(num_envs)
+    arrays = _views(shm.buf, layout)
+    envs = _EnvSlice(lo, hi, env_kwargs)
+    try:
+        while True:
+            command, argument = pipe.recv()
+            if command == 'step':
+                pipe.send(envs.step(arrays))
+            elif command == 'reset':
+                envs.reset(arrays, argument, num_envs)
+                pipe.send(None)
+            else:
+                break
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        del arrays   # views into the block must go before it is closed
+        shm.close()
+
+
+class VectorEnv:
+    """num_envs GameEnvs stepped together; workers=0 runs them all in this process.
+
+        with VectorEnv(64) as envs:
+            obs = envs.reset(seed=1)                        # (64, OBSERVATION_SIZE)
+            obs, rewards, terminated, truncated, infos = envs.step(actions)   # actions (64, ACTION_SIZE)
+
+    Finished episodes reset on the spot: the returned observation is the
+    first of the next episode and infos lists (env index, episode info) for
+    each one that ended. Env i plays seed + i, then seed + i + num_envs, and
+    so on, so results do not depend on the number of workers. Returned
+    arrays are views of shared memory, overwritten by the next step.
+    """
+
+    def __init__(self, num_envs, workers=None, **env_kwargs):
+        self.num_envs = num_envs
+        workers = min(os.cpu_count() or 1, num_envs) if workers is None else min(workers, num_envs)
+        layout, size = _layout(num_envs)
+        self.shm = shared_memory.SharedMemory(create=True, size=size) if workers else None
+        self.arrays = _views(self.shm.buf, layout) if workers else {
+            name: np.zeros(shape, dtype) for name, dtype, shape, _ in layout}
+        self.pipes, self.processes, self.local = [], [], None
+        if not workers:
+            self.local = _EnvSlice(0, num_envs, env_kwargs)
+            return
+        bounds = np.linspace(0, num_envs, workers + 1).round().astype(int)
+        context = multiprocessing.get_context()
+        for lo, hi in zip(bounds[:-1], bounds[1:]):
+            parent, child = context.Pipe()
+            process = context.Process(target=_worker, args=(self.shm.name, num_envs, int(lo), int(hi), env_kwargs, child),
+                                      daemon=True)
+            process.start()
+            child.close()
+            self.pipes.append(parent)
+            self.processes.append(process)
+
+    def reset(self, seed=None):
+        seed = random.randrange(2 ** 31) if seed is None else seed
+        if self.local:
+            self.local.reset(self.arrays, seed, self.num_envs)
+        else:
+            for pipe in self.pipes:
+                pipe.send(('reset', seed))
+            for pipe in self.pipes:
+                pipe.recv()
+        return self.arrays['observations']
+
+    def step(self, actions):
+        self.arrays['actions'][:] = actions
+        if self.local:
+            infos = self.local.step(self.arrays)
+        else:
+            for pipe in self.pipes:
+                pipe.send(('step', None))
+            infos = [item for pipe in self.pipes for item in pipe.recv()]
+        a = self.arrays
+        return a['observations'], a['rewards'], a['terminated'], a['truncated'], infos
+
+    def close(self):
+        for pipe in self.pipes:
+            try:
+                pipe.send(('close', None))
+            except (BrokenPipeError, OSError):
+                pass
+        for process in self.processes:
+            process.join(timeout=5)
+        self.pipes, self.processes = [], []
+        if self.shm:
+            self.arrays = {}
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+if __name__ == '__main__':
+    import argparse
+    import hashlib
+    import time
+
+    parser = argparse.ArgumentParser(description='Measure env steps per second and check that runs replay exactly.')
+    parser.add_argument('--envs', type=int, default=64)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--steps', type=int, default=2000, help='vector steps per run')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    def random_actions(rng, n):
+        actions = rng.uniform(-1, 1, (n, ACTION_SIZE)).astype(np.float32)
+        actions[:, 1] = np.abs(actions[:, 1])   # mostly forward, so the player gets somewhere
+        return actions
+
+    env = GameEnv()
+    env.reset(args.seed)
+    rng = np.random.default_rng(args.seed)
+    actions = random_actions(rng, args.steps)
+    start = time.perf_counter()
+    for action in actions:
+        if any(env.step(action)[2:4]):
+            env.reset(args.seed)
+    single = args.steps / (time.perf_counter() - start)
+    print(f"GameEnv: {single:,.0f} steps/s on one core")
+
+    def run(workers):
+        rng = np.random.default_rng(args.seed)
+        digest = hashlib.sha1()
+        episodes = []
+        with VectorEnv(args.envs, workers=workers) as envs:
+            digest.update(envs.reset(args.seed).tobytes())
+            start = time.perf_counter()
+            for _ in range(args.steps):
+                obs, rewards, terminated, truncated, infos = envs.step(random_actions(rng, args.envs))
+                digest.update(obs.tobytes())
+                digest.update(rewards.tobytes())
+                episodes.extend(infos)
+            elapsed = time.perf_counter() - start
+        return args.envs * args.steps / elapsed, digest.hexdigest()[:12], episodes
+
+    local_rate, local_digest, episodes = run(0)
+    print(f"VectorEnv x{args.envs}, in process: {local_rate:,.0f} steps/s, {len(episodes)} episodes, run {local_digest}")
+    if args.workers:
+        rate, digest, _ = run(args.workers)
+        print(f"VectorEnv x{args.envs}, {args.workers} workers: {rate:,.0f} steps/s "
+              f"({rate / args.workers:,.0f} per worker), run {digest} "
+              f"({'matches' if digest == local_digest else 'DIFFERS from'} the in-process run)")
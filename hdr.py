@@ -0,0 +1,485 @@
+# hdr.py - Floating-point scene target, half- or quarter-resolution bloom and a tonemapping pass.
+# The 3D camera renders into a float buffer, so colors brighter than white
+# (see emissive()) keep their energy instead of clipping. A bright pass keeps
+# what is above a soft threshold while it downsamples; a chain of smaller
+# buffers halves it a few more times, the smallest one gets a separable
+# Gaussian blur, and an upsample chain adds each level back on its way up.
+# One final pass adds the bloom to the scene, applies exposure and an ACES
+# or Reinhard curve and writes the window; the UI draws on top untouched.
+# Each pass is its own buffer, so profile() can time it by switching it off,
+# and fit() steps the quality down until the chain fits its share of the
+# frame budget. With pstats-gpu-timing set, PStats shows the passes live
+# under their buffer names.
+
+import os
+import statistics
+import time
+
+# Scene and bloom buffer formats, bloom resolution (1 / bloom_div) and chain length per tier.
+QUALITY = {
+    'low': {'bits': (11, 11, 10, 0), 'bloom_div': 4, 'levels': 3},
+    'medium': {'bits': (16, 16, 16, 16), 'bloom_div': 2, 'levels': 4},
+    'high': {'bits': (16, 16, 16, 16), 'bloom_div': 2, 'levels': 5},
+}
+TIERS = ('high', 'medium', 'low')   # the order fit() steps down in
+
+# Share of the frame budget the post-processing chain may take.
+BUDGET_SHARE = 0.15
+
+TONEMAPS = {
+    # Narkowicz's fit of the ACES filmic curve
+    'aces': 'clamp((c * (2.51 * c + 0.03)) / (c * (2.43 * c + 0.59) + 0.14), 0.0, 1.0)',
+    # Extended Reinhard: `white` (grade.z) maps to 1
+    'reinhard': 'c * (1.0 + c / (grade.z * grade.z)) / (1.0 + c)',
+}
+
+# --- Shaders ---
+
+VERTEX = '''#version 130
+uniform mat4 p3d_ModelViewProjectionMatrix;
+in vec4 p3d_Vertex;
+in vec2 p3d_MultiTexCoord0;
+out vec2 uv;
+void main() {
+    gl_Position = p3d_ModelViewProjectionMatrix * p3d_Vertex;
+    uv = p3d_MultiTexCoord0;
+}
+'''
+
+# Scene colors are authored for the display; bloom and tonemapping work on linear light.
+DECODE = '''
+vec3 decode(vec3 c) { return pow(max(c, vec3(0.0)), vec3(2.2)); }
+'''
+
+BRIGHT = '''#version 130
+uniform sampler2D source;
+uniform vec4 curve;   // threshold, threshold - knee, 2 * knee, 0.25 / knee
+in vec2 uv;
+out vec4 o_color;
+''' + DECODE + '''
+vec3 prefilter(vec3 c) {
+    float brightness = max(c.r, max(c.g, c.b));
+    float soft = clamp(brightness - curve.y, 0.0, curve.z);
+    soft = soft * soft * curve.w;
+    return c * max(soft, brightness - curve.x) / max(brightness, 1e-4);
+}
+void main() {
+    vec2 texel = 1.0 / vec2(textureSize(source, 0));
+    vec3 sum = vec3(0.0);
+    float weights = 0.0;
+    // Four bilinear taps average a 4x4 block; each is weighted down by its brightness (Karis) so a single hot pixel cannot flicker the whole bloom.
+    for (int i = 0; i < 4; i++) {
+        vec2 offset = vec2(float(i & 1) * 2.0 - 1.0, float(i >> 1) * 2.0 - 1.0) * texel;
+        vec3 c = prefilter(decode(texture(source, uv + offset).rgb));
+        float w = 1.0 / (1.0 + max(c.r, max(c.g, c.b)));
+        sum += c * w;
+        weights += w;
+    }
+    o_color = vec4(sum / weights, 1.0);
+}
+'''
+
+DOWN = '''#version 130
+uniform sampler2D source;
+in vec2 uv;
+out vec4 o_color;
+void main() {
+    vec2 texel = 1.0 / vec2(textureSize(source, 0));
+    vec3 sum = texture(source, uv).rgb * 4.0;
+    sum += texture(source, uv + vec2(-texel.x, -texel.y)).rgb;
+    sum += texture(source, uv + vec2(texel.x, -texel.y)).rgb;
+    sum += texture(source, uv + vec2(-texel.x, texel.y)).rgb;
+    sum += texture(source, uv + vec2(texel.x, texel.y)).rgb;
+    o_color = vec4(sum / 8.0, 1.0);
+}
+'''
+
+# 9-tap Gaussian in 5 bilinear fetches along `direction`; run once across and once down.
+BLUR = '''#version 130
+uniform sampler2D source;
+uniform vec2 direction;
+in vec2 uv;
+out vec4 o_color;
+void main() {
+    vec2 step = direction / vec2(textureSize(source, 0));
+    vec3 sum = texture(source, uv).rgb * 0.2270270270;
+    sum += (texture(source, uv + step * 1.3846153846).rgb + texture(source, uv - step * 1.3846153846).rgb) * 0.3162162162;
+    sum += (texture(source, uv + step * 3.2307692308).rgb + texture(source, uv - step * 3.2307692308).rgb) * 0.0702702703;
+    o_color = vec4(sum, 1.0);
+}
+'''
+
+# A 3x3 tent over the smaller level plus this level's downsample.
+UP = '''#version 130
+uniform sampler2D lower;
+uniform sampler2D current;
+in vec2 uv;
+out vec4 o_color;
+void main() {
+    vec2 texel = 1.0 / vec2(textureSize(lower, 0));
+    vec3 sum = texture(lower, uv).rgb * 4.0;
+    sum += (texture(lower, uv + vec2(texel.x, 0.0)).rgb + texture(lower, uv - vec2(texel.x, 0.0)).rgb
+            + texture(lower, uv + vec2(0.0, texel.y)).rgb + texture(lower, uv - vec2(0.0, texel.y)).rgb) * 2.0;
+    sum += texture(lower, uv + texel).rgb + texture(lower, uv - texel).rgb
+           + texture(lower, uv + vec2(texel.x, -texel.y)).rgb + texture(lower, uv + vec2(-texel.x, texel.y)).rgb;
+    o_color = vec4(texture(current, uv).rgb + sum / 16.0, 1.0);
+}
+'''
+
+TONEMAP = '''#version 130
+uniform sampler2D scene;
+uniform sampler2D bloom;
+uniform vec3 grade;   // exposure, bloom strength / levels, white point
+in vec2 uv;
+out vec4 o_color;
+''' + DECODE + '''
+void main() {
+    vec3 c = decode(texture(scene, uv).rgb);
+    if (grade.y > 0.0) {
+        c += texture(bloom, uv).rgb * grade.y;
+    }
+    c *= grade.x;
+    c = %s;
+    o_color = vec4(pow(c, vec3(1.0 / 2.2)), 1.0);
+}
+'''
+
+# Unlit, like Ursina's default look, but with nothing clamping a color scale above 1.
+EMISSIVE_VERTEX = '''#version 130
+uniform mat4 p3d_ModelViewProjectionMatrix;
+in vec4 p3d_Vertex;
+in vec4 p3d_Color;
+in vec2 p3d_MultiTexCoord0;
+out vec2 uv;
+out vec4 vertex_color;
+void main() {
+    gl_Position = p3d_ModelViewProjectionMatrix * p3d_Vertex;
+    uv = p3d_MultiTexCoord0;
+    vertex_color = p3d_Color;
+}
+'''
+
+EMISSIVE = '''#version 130
+uniform sampler2D p3d_Texture0;
+uniform vec4 p3d_ColorScale;
+in vec2 uv;
+in vec4 vertex_color;
+out vec4 o_color;
+void main() {
+    o_color = texture(p3d_Texture0, uv) * p3d_ColorScale * vertex_color;
+}
+'''
+
+COPY = '''#version 130
+uniform sampler2D scene;
+in vec2 uv;
+out vec4 o_color;
+void main() {
+    o_color = vec4(texture(scene, uv).rgb, 1.0);
+}
+'''
+
+
+def _shader(fragment):
+    from panda3d.core import Shader
+    return Shader.make(Shader.SL_GLSL, VERTEX, fragment)
+
+
+def _texture(name):
+    from panda3d.core import SamplerState, Texture
+    texture = Texture(name)
+    texture.set_wrap_u(SamplerState.WM_clamp)
+    texture.set_wrap_v(SamplerState.WM_clamp)
+    texture.set_minfilter(SamplerState.FT_linear)
+    texture.set_magfilter(SamplerState.FT_linear)
+    return texture
+
+
+def emissive(entity, intensity):
+    """Scale an entity's color past white so it blooms; entities without a shader get an unlit one that does not clamp it."""
+    from panda3d.core import Shader, Vec4
+    if entity.shader is None:
+        entity.shader = Shader.make(Shader.SL_GLSL, EMISSIVE_VERTEX, EMISSIVE)
+    c = entity.color
+    entity.color = Vec4(c[0] * intensity, c[1] * intensity, c[2] * intensity, c[3])
+
+
+class HdrPipeline:
+    """Renders the main camera through a float target, bloom and tonemapping.
+
+        hdr = HdrPipeline(app).start()
+        hdr.fit(budget_ms=1000 / 60)   # drop quality until the chain fits BUDGET_SHARE of a frame
+        print(hdr.summary())
+
+    quality is a QUALITY tier or 'off'; tonemap is 'aces' or 'reinhard'.
+    Scene colors are read as display-encoded and written back the same way,
+    so at exposure 1 an LDR scene keeps roughly its look.
+    """
+
+    def __init__(self, app, quality='medium', tonemap='aces', exposure=1.0, bloom_strength=0.6,
+                 threshold=1.0, knee=0.5, white=4.0):
+        self.app = app
+        self.quality = quality
+        self.tonemap = tonemap
+        self.exposure = exposure
+        self.bloom_strength = bloom_strength
+        self.threshold = threshold
+        self.knee = knee
+        self.white = white
+        self.filters = None
+        self.passes = []       # (name, buffer) in render order, the final pass last with buffer None
+        self.quad = None       # the window's full-screen quad, drawing the tonemap pass
+        self.tonemap_shader = None
+        self.timings = {}      # pass name -> ms, from the last profile()
+        self.scene_ms = None
+        self.cost = None       # ms per frame of every pass after the scene, from profile() or measure()
+
+    def start(self):
+        """Build the chain for self.quality; returns self, or None without a window to draw into."""
+        if self.app.win is None:
+            return None
+        self.stop()
+        if self.quality == 'off':
+            return self
+        from direct.filter.FilterManager import FilterManager
+        from panda3d.core import FrameBufferProperties
+
+        tier = QUALITY[self.quality]
+        props = FrameBufferProperties()
+        props.set_float_color(True)
+        props.set_rgba_bits(*tier['bits'])
+        self.filters = FilterManager(self.app.win, self.app.cam)
+        scene = _texture('hdr-scene')
+        self.quad = self.filters.renderSceneInto(colortex=scene, fbprops=props, clamping=False)
+        if not self.active:
+            # No float render targets here: fall back to the plain LDR path.
+            print("HDR: float render targets unavailable; rendering without HDR.")
+            self.stop()
+            self.quality = 'off'
+            return self
+        self.passes = [('scene', self.filters.buffers[-1])]
+
+        def stage(name, div, fragment, **inputs):
+            texture = _texture(f'hdr-{name}')
+            quad = self.filters.renderQuadInto(f'hdr-{name}', div=div, colortex=texture, fbprops=props)
+            quad.set_shader(_shader(fragment))
+            for key, value in inputs.items():
+                quad.set_shader_input(key, value)
+            self.passes.append((name, self.filters.buffers[-1]))
+            return texture
+
+        div = tier['bloom_div']
+        knee = max(self.threshold * self.knee, 1e-4)
+        downs = [stage('bright', div, BRIGHT, source=scene,
+                       curve=(self.threshold, self.threshold - knee, 2 * knee, 0.25 / knee))]
+        for level in range(1, tier['levels']):
+            downs.append(stage(f'down{level}', div << level, DOWN, source=downs[-1]))
+        bottom = div << (tier['levels'] - 1)
+        blurred = stage('blur-x', bottom, BLUR, source=downs[-1], direction=(1, 0))
+        up = stage('blur-y', bottom, BLUR, source=blurred, direction=(0, 1))
+        for level in range(tier['levels'] - 2, -1, -1):
+            up = stage(f'up{level}', div << level, UP, lower=up, current=downs[level])
+
+        self.tonemap_shader = _shader(TONEMAP % TONEMAPS[self.tonemap])
+        self.quad.set_shader(self.tonemap_shader)
+        self.quad.set_shader_input('scene', scene)
+        self.quad.set_shader_input('bloom', up)
+        self.quad.set_shader_input('grade', (self.exposure, self.bloom_strength / tier['levels'], self.white))
+        self.passes.append(('tonemap', None))
+        return self
+
+    @property
+    def active(self):
+        """True while the scene goes through the chain (a tier other than 'off', with float targets)."""
+        return self.quad is not None
+
+    def stop(self):
+        """Tear the chain down and give the camera back to the window."""
+        if self.filters is not None:
+            self.filters.cleanup()
+        self.filters = None
+        self.quad = None
+        self.passes = []
+
+    def set_quality(self, quality):
+        self.quality = quality
+        self.timings = {}
+        self.cost = None
+        return self.start()
+
+    def set_exposure(self, exposure):
+        self.exposure = exposure
+        if self.active:
+            self.quad.set_shader_input('grade', (exposure, self.bloom_strength / QUALITY[self.quality]['levels'],
+                                                 self.white))
+
+    # --- Timing ---
+
+    def _render_ms(self):
+        """Time to render and finish one frame, with the vsync wait kept outside the timed span."""
+        engine = self.app.graphicsEngine
+        engine.flip_frame()
+        start = time.perf_counter()
+        engine.render_frame()
+        engine.sync_frame()
+        return (time.perf_counter() - start) * 1000
+
+    def _saving_ms(self, switch_off, switch_on, frames):
+        """Median of frame time with a pass minus frame time without it, over alternating frame pairs."""
+        differences = []
+        for _ in range(frames):
+            with_pass = self._render_ms()
+            switch_off()
+            differences.append(with_pass - self._render_ms())
+            switch_on()
+        return statistics.median(differences)
+
+    def _switches(self, names):
+        """(off, on) callables switching the named passes; the tonemap pass falls back to a plain copy."""
+        copy = _shader(COPY)
+        buffers = [buffer for name, buffer in self.passes if name in names and buffer is not None]
+
+        def off():
+            for buffer in buffers:
+                buffer.set_active(False)
+            if 'tonemap' in names:
+                self.quad.set_shader(copy)
+
+        def on():
+            for buffer in buffers:
+                buffer.set_active(True)
+            if 'tonemap' in names:
+                self.quad.set_shader(self.tonemap_shader)
+        return off, on
+
+    def _timed(self, groups, frames):
+        """{group name: ms saved by switching that group of passes off}, rendered with glFinish after each frame."""
+        from panda3d.core import ConfigVariableBool
+        finish = ConfigVariableBool('gl-finish')
+        was_finishing = finish.get_value()
+        finish.set_value(True)
+        try:
+            for _ in range(3):
+                self._render_ms()   # settle any pending shader compiles
+            # Noise can make a cheap pass come out slightly negative.
+            return {name: max(self._saving_ms(*self._switches(passes), frames), 0.0) for name, passes in groups}
+        finally:
+            finish.set_value(was_finishing)
+
+    def profile(self, frames=15):
+        """Time each pass by rendering frames with and without it; returns {pass: ms}.
+
+        Renders 2 * frames frames per pass on the spot; alternating the pairs
+        keeps clock and load drift out of the differences. A pass switched
+        off leaves its last output in place, so the screen barely changes
+        while this runs.
+        """
+        if not self.active:
+            self.timings = {}
+            return self.timings
+        timings = self._timed([(name, (name,)) for name, _ in self.passes], frames)
+        self.scene_ms = timings.pop('scene')
+        self.timings = timings
+        self.cost = sum(timings.values())
+        return timings
+
+    def measure(self, frames=15):
+        """Time the post-processing chain as a whole, in 2 * frames frames; returns ms per frame."""
+        if not self.active:
+            return None
+        names = [name for name, _ in self.passes if name != 'scene']
+        self.cost = self._timed([('chain', names)], frames)['chain']
+        return self.cost
+
+    def cost_ms(self):
+        """Measured cost of the post-processing passes, or None before profile() or measure()."""
+        return self.cost
+
+    def fit(self, budget_ms, share=BUDGET_SHARE, frames=15):
+        """Step down from the current tier until the chain fits share * budget_ms; 'off' if none does."""
+        tiers = TIERS[TIERS.index(self.quality):] if self.quality in TIERS else ()
+        for quality in tiers:
+            self.set_quality(quality)
+            if not self.active:   # no float targets; start() already fell back
+                return self.quality
+            if self.measure(frames) <= budget_ms * share:
+                return quality
+        self.set_quality('off')
+        return 'off'
+
+    def cycle(self):
+        """Switch to the next tier up, wrapping from high to off."""
+        order = ('off',) + TIERS[::-1]
+        return self.set_quality(order[(order.index(self.quality) + 1) % len(order)])
+
+    def summary(self):
+        if not self.active:
+            return f"HDR off ({self.quality})"
+        tier = QUALITY[self.quality]
+        text = (f"HDR {self.quality}, {self.tonemap}: bloom at 1/{tier['bloom_div']} resolution over "
+                f"{tier['levels']} levels")
+        if self.timings:
+            passes = ', '.join(f"{name} {ms:.2f}" for name, ms in self.timings.items())
+            text += f"; {self.cost:.2f} ms per frame ({passes} ms), scene {self.scene_ms:.2f} ms"
+        elif self.cost is not None:
+            text += f"; {self.cost:.2f} ms per frame"
+        return text
+
+
+def from_environment(app, budget_ms=1000 / 60, warmup=30, **kwargs):
+    """An HdrPipeline set up by SM64_HDR, SM64_TONEMAP and SM64_EXPOSURE, or None without a window.
+
+    SM64_HDR is a QUALITY tier, 'off' or 'auto' (the default): auto starts
+    at the top tier and, once `warmup` frames have run, steps down with
+    fit() until the chain fits BUDGET_SHARE of budget_ms.
+    """
+    quality = os.environ.get('SM64_HDR', 'auto')
+    kwargs.setdefault('tonemap', os.environ.get('SM64_TONEMAP', 'aces'))
+    if os.environ.get('SM64_EXPOSURE'):
+        kwargs.setdefault('exposure', float(os.environ['SM64_EXPOSURE']))
+    pipeline = HdrPipeline(app, quality=TIERS[0] if quality == 'auto' else quality, **kwargs).start()
+    if pipeline is None or quality != 'auto':
+        return pipeline
+
+    def fit_task(task):
+        if task.frame < warmup:
+            return task.cont
+        fitted = pipeline.fit(budget_ms)
+        print(f"HDR fitted to {budget_ms * BUDGET_SHARE:.1f} ms: {pipeline.summary()}" if fitted != 'off' else
+              f"HDR does not fit {budget_ms * BUDGET_SHARE:.1f} ms of the frame here; rendering without it.")
+        return task.done
+
+    app.taskMgr.add(fit_task, 'hdr-fit')
+    return pipeline
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Time every HDR pass at each quality tier in an offscreen window.')
+    parser.add_argument('--size', default='1920x1080')
+    parser.add_argument('--frames', type=int, default=15)
+    parser.add_argument('--tonemap', default='aces', choices=sorted(TONEMAPS))
+    args = parser.parse_args()
+
+    from ursina import Entity, Ursina, camera, color
+
+    width, height = (int(n) for n in args.size.lower().split('x'))
+    app = Ursina(window_type='offscreen', vsync=False, development_mode=False, size=(width, height))
+    camera.position = (0, 4, -20)
+    camera.rotation_x = 10
+    Entity(model='plane', color=color.green, scale=60)
+    for i in range(12):
+        ball = Entity(model='sphere', color=color.gold if i % 2 else color.yellow, x=i * 2.5 - 14, y=1.5)
+        emissive(ball, 3)
+    pipeline = HdrPipeline(app, tonemap=args.tonemap)
+    for quality in TIERS:
+        pipeline.set_quality(quality)
+        pipeline.profile(args.frames)
+        print(pipeline.summary())
+        print(f"  measured as one chain: {pipeline.measure(args.frames):.2f} ms per frame")
+    pipeline.set_quality('off')
+    from panda3d.core import ConfigVariableBool
+    ConfigVariableBool('gl-finish').set_value(True)
+    plain = statistics.median(pipeline._render_ms() for _ in range(args.frames))
+    print(f"without HDR: {plain:.2f} ms per frame")
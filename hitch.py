@@ -0,0 +1,153 @@
+# hitch.py - Frame-hitch detector correlated with GC, allocations and game events.
+# An FPS counter averages a 120 ms stall away. The monitor instead times every
+# frame and, whenever one runs over the threshold, records what happened inside
+# it: garbage collections reported through gc.callbacks, the tracemalloc delta,
+# and notes the game leaves for spawns, disables, explosions and HUD rebuilds.
+# Records go into a fixed-size ring and are written out as JSON lines.
+
+import atexit
+import gc
+import json
+import time
+import tracemalloc
+from collections import deque
+
+# Raised gen0 threshold: a level's worth of short-lived Vec3s no longer forces
+# a collection every few hundred allocations.
+FROZEN_THRESHOLDS = (20000, 50, 100)
+
+
+class HitchMonitor:
+    """Call frame() once per rendered frame and note() whenever something notable happens.
+
+        hitches = HitchMonitor(threshold=1 / 30, log_path='hitches.jsonl')
+        hitches.start()
+        ...
+        hitches.note('spawn', 'Goomba')
+        ...
+        def update():
+            hitches.frame()
+
+    Only frames longer than `threshold` seconds are kept, at most `capacity`
+    of them; the log is rewritten from the ring on dump() and at exit.
+    """
+
+    def __init__(self, threshold=1 / 30, capacity=256, log_path='hitches.jsonl', trace_allocations=False):
+        self.threshold = threshold
+        self.log_path = log_path
+        self.trace_allocations = trace_allocations
+        self.hitches = deque(maxlen=capacity)
+        self.frame_number = 0
+        self.frames_over = 0
+        self.worst = 0.0
+        self._last = None
+        self._gc = {}             # generation -> [passes, seconds, objects collected]
+        self._gc_start = None
+        self._notes = {}
+        self._traced = 0
+        self.running = False
+
+    def start(self):
+        if self.running:
+            return self
+        self.running = True
+        gc.callbacks.append(self._on_gc)
+        if self.trace_allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self._traced = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0
+        self._last = None   # the first frame() starts the clock, so level loading is not a hitch
+        if self.log_path:
+            atexit.register(self.dump)
+        return self
+
+    def stop(self):
+        if not self.running:
+            return
+        self.running = False
+        gc.callbacks.remove(self._on_gc)
+        if self.trace_allocations:
+            tracemalloc.stop()
+
+    # --- Event sources ---
+
+    def _on_gc(self, phase, info):
+        if phase == 'start':
+            self._gc_start = time.perf_counter()
+        elif self._gc_start is not None:
+            entry = self._gc.get(info['generation'])
+            if entry is None:
+                entry = self._gc[info['generation']] = [0, 0.0, 0]
+            entry[0] += 1
+            entry[1] += time.perf_counter() - self._gc_start
+            entry[2] += info['collected']
+            self._gc_start = None
+
+    def note(self, kind, detail=None):
+        """Count an event in the current frame; detail strings are kept for hitch frames."""
+        if not self.running:
+            return
+        entry = self._notes.get(kind)
+        if entry is None:
+            entry = self._notes[kind] = [0, []]
+        entry[0] += 1
+        if detail is not None and len(entry[1]) < 8:
+            entry[1].append(detail)
+
+    # --- Per-frame bookkeeping ---
+
+    def frame(self):
+        """Close the frame that just ran; records it if it took longer than the threshold."""
+        if not self.running:
+            return None
+        now = time.perf_counter()
+        if self._last is None:
+            self._last = now
+            return None
+        elapsed = now - self._last
+        self._last = now
+        self.frame_number += 1
+        traced = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0
+        record = None
+        if elapsed > self.threshold:
+            self.frames_over += 1
+            self.worst = max(self.worst, elapsed)
+            record = {
+                'frame': self.frame_number,
+                'ms': round(elapsed * 1000, 2),
+                'gc': {f'gen{g}': {'passes': n, 'ms': round(d * 1000, 2), 'collected': c}
+                       for g, (n, d, c) in sorted(self._gc.items())},
+                'gc_ms': round(sum(d for _, d, _ in self._gc.values()) * 1000, 2),
+                'events': {kind: {'count': n, 'detail': detail} if detail else {'count': n}
+                           for kind, (n, detail) in self._notes.items()},
+            }
+            if tracemalloc.is_tracing():
+                record['alloc_delta'] = traced - self._traced
+            self.hitches.append(record)
+        self._traced = traced
+        self._gc = {}
+        self._notes = {}
+        return record
+
+    def dump(self, path=None):
+        path = path or self.log_path
+        if not path:
+            return
+        with open(path, 'w') as f:
+            for record in self.hitches:
+                f.write(json.dumps(record) + '\n')
+
+    def summary(self):
+        return (f"{self.frames_over}/{self.frame_number} frames over {self.threshold * 1000:.1f} ms, "
+                f"worst {self.worst * 1000:.1f} ms")
+
+
+def freeze_after_load(thresholds=FROZEN_THRESHOLDS):
+    """Move everything allocated so far into the permanent generation.
+
+    Call once the level is built: the platforms, entities and level data then
+    live outside the collector, so gen-2 passes stop rescanning them.
+    """
+    gc.collect()
+    gc.freeze()
+    gc.set_threshold(*thresholds)
+    return gc.get_freeze_count()
@@ -0,0 +1,202 @@
+# level_gen.py - Entity-free level generation for the pcport4k layout.
+# Produces plain tuples describing platforms, coins, stars and enemies so the
+# same seed can be built into Ursina entities by the game or analyzed in bulk
+# by tools like seed_farm.py without ever opening a window.
+
+import hashlib
+import os
+import pickle
+import random
+
+import placement
+import reachability
+
+
+# Axis-aligned boxes are (x, y, z, scale_x, scale_y, scale_z), centered like Ursina cubes.
+PLATFORM_KINDS = ('whomp', 'battlefield')
+
+
+class LevelParams:
+    """Knobs for one generated level, defaulting to pcport4k's values."""
+
+    def __init__(self, num_platforms=70, num_coins=150, total_stars=7, num_goombas=10, num_bobombs=5,
+                 jump_height=2.5, gravity=0.7, speed=12, spawn=(0, 10, 0), ground_size=200, extent=80,
+                 whomp_sizes=((5, 15), (1, 3), (5, 15)), battlefield_sizes=((3, 10), (0.5, 2), (3, 10))):
+        self.num_platforms = num_platforms
+        self.num_coins = num_coins
+        self.total_stars = total_stars
+        self.num_goombas = num_goombas
+        self.num_bobombs = num_bobombs
+        self.jump_height = jump_height
+        self.gravity = gravity
+        self.speed = speed
+        self.spawn = tuple(spawn)
+        self.ground_size = ground_size
+        self.extent = extent
+        # (low, high) ranges for platform scale x, y and z in each zone.
+        self.whomp_sizes = tuple(tuple(r) for r in whomp_sizes)
+        self.battlefield_sizes = tuple(tuple(r) for r in battlefield_sizes)
+
+    def as_dict(self):
+        return dict(vars(self))
+
+
+class LevelSpec:
+    """Everything needed to build a level, as plain data.
+
+    platforms: (x, y, z, sx, sy, sz, kind, motion) where motion is None or
+               (dx, dy, dz, duration) for a looping animate_position.
+    coins, stars, goombas, bobombs: (x, y, z, platform_index) with -1 meaning
+               the item sits on the open ground.
+    graph: the reachability.ReachabilityGraph the stars were placed from; it
+           is stored with the level so runtime never recomputes it.
+    shortfall: {zone name: platforms that did not fit}, empty when all did;
+               callers report it with placement.warn_shortfall().
+    """
+
+    def __init__(self, seed, params, platforms, coins, stars, goombas, bobombs, graph=None, shortfall=None):
+        self.seed = seed
+        self.params = params
+        self.platforms = platforms
+        self.coins = coins
+        self.stars = stars
+        self.goombas = goombas
+        self.bobombs = bobombs
+        self.graph = graph
+        self.shortfall = shortfall or {}
+
+    @property
+    def reachable(self):
+        return self.graph.reachable
+
+    def boxes(self):
+        return [p[:6] for p in self.platforms]
+
+
+def _rng(seed, stream):
+    # One independent stream per category, so adding coins never moves a platform.
+    return random.Random(f'{seed}:{stream}')
+
+
+def _whomp_motion(rng):
+    # Some Whomp's Fortress platforms slide sideways or bob up and down.
+    if rng.random() < 0.2:
+        if rng.random() < 0.5:
+            return (rng.uniform(-5, 5), 0, 0, rng.uniform(3, 6))
+        return (0, rng.uniform(-3, 3), 0, rng.uniform(3, 6))
+    return None
+
+
+def default_zones(params):
+    """A dense Whomp's Fortress block in the west third, sparse Battlefield elsewhere."""
+    extent = params.extent
+    split = -extent / 3
+    return [
+        placement.Zone('whomp', (-extent, -extent, split, extent), params.num_platforms // 2,
+                       (1, 30), *params.whomp_sizes, min_gap=1.0, motion=_whomp_motion, max_motion=5),
+        placement.Zone('battlefield', (split, -extent, extent, extent), params.num_platforms // 2,
+                       (1, 25), *params.battlefield_sizes, min_gap=3.0),
+    ]
+
+
+def _generate_platforms(seed, params):
+    return placement.place_platforms(default_zones(params), f'{seed}:platforms')
+
+
+def _place_on_platforms(rng, platforms, count, height, inset, candidates=None, fallback=None):
+    """Drop `count` items on random platform tops, `height` above the surface."""
+    pool = list(range(len(platforms))) if candidates is None else list(candidates)
+    items = []
+    for _ in range(count):
+        if pool:
+            i = rng.choice(pool)
+            x, y, z, sx, sy, sz = platforms[i][:6]
+            items.append((
+                x + rng.uniform(-sx / inset, sx / inset),
+                y + sy / 2 + height,
+                z + rng.uniform(-sz / inset, sz / inset),
+                i
+            ))
+        else:
+            items.append(fallback(rng) + (-1,))
+    return items
+
+
+# --- Stars ---
+
+STARS_PER_PLATFORM = 1
+STAR_SPACING = 6.0
+
+
+def _ground_spot_free(platforms, x, z):
+    # Nothing may hang over a ground star, or the player could not stand next to it.
+    probe = (x, 1.5, z, 3, 3, 3)
+    return not any(boxes_overlap(probe, p[:6]) for p in platforms)
+
+
+def _place_stars(rng, platforms, count, reachable):
+    """Stars on reachable platform tops, at most STARS_PER_PLATFORM each, then on open ground."""
+    slots = [i for i in reachable for _ in range(STARS_PER_PLATFORM)]
+    rng.shuffle(slots)
+    stars = []
+    for i in slots[:count]:
+        x, y, z, sx, sy, sz = platforms[i][:6]
+        stars.append((x + rng.uniform(-sx / 2, sx / 2), y + sy / 2 + 1.5, z + rng.uniform(-sz / 2, sz / 2), i))
+    while len(stars) < count:
+        # Ground is always reachable; spread the rest out so they are separate goals.
+        for _ in range(50):
+            x, z = rng.uniform(-30, 30), rng.uniform(-30, 30)
+            if (_ground_spot_free(platforms, x, z)
+                    and all((x - s[0]) ** 2 + (z - s[2]) ** 2 >= STAR_SPACING ** 2 for s in stars)):
+                break
+        stars.append((x, 1.5, z, -1))
+    return stars
+
+
+def generate_level(seed, params=None):
+    """Build the LevelSpec for `seed`. Deterministic across runs and processes."""
+    params = params or LevelParams()
+    platforms, shortfall = _generate_platforms(seed, params)
+    graph = reachability.build_graph([p[:6] for p in platforms], params)
+    coins = _place_on_platforms(
+        _rng(seed, 'coins'), platforms, params.num_coins, 0.5, 2.1,
+        fallback=lambda r: (r.uniform(-78, 78), 0.5, r.uniform(-78, 78)))
+    # Stars only go where the player can actually jump to.
+    stars = _place_stars(_rng(seed, 'stars'), platforms, params.total_stars, graph.reachable_indices().tolist())
+    goombas = _place_on_platforms(
+        _rng(seed, 'goombas'), platforms, params.num_goombas, 0.51, 2.1,
+        fallback=lambda r: (r.uniform(-30, 30), 1, r.uniform(-30, 30)))
+    bobombs = _place_on_platforms(
+        _rng(seed, 'bobombs'), platforms, params.num_bobombs, 0.36, 2.1,
+        fallback=lambda r: (r.uniform(-30, 30), 0.7, r.uniform(-30, 30)))
+    return LevelSpec(seed, params, platforms, coins, stars, goombas, bobombs, graph, shortfall)
+
+
+CACHE_VERSION = 4
+
+
+def load_level(seed, params=None, cache_dir=os.path.join('.cache', 'levels')):
+    """generate_level() backed by an on-disk cache keyed by seed and params."""
+    params = params or LevelParams()
+    key = hashlib.sha1(repr((CACHE_VERSION, seed, sorted(params.as_dict().items()))).encode()).hexdigest()[:16]
+    path = os.path.join(cache_dir, f'{seed}-{key}.pkl')
+    try:
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        pass
+    spec = generate_level(seed, params)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(spec, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+    return spec
+
+
+# --- Geometry ---
+
+def boxes_overlap(a, b):
+    return (abs(a[0] - b[0]) * 2 < a[3] + b[3]
+            and abs(a[1] - b[1]) * 2 < a[4] + b[4]
+            and abs(a[2] - b[2]) * 2 < a[5] + b[5])
@@ -0,0 +1,213 @@
+# lifecycle.py - Entity census per class, growth alerts and budgeted scene compaction.
+# disable() hides an entity but leaves it in scene.entities, where Ursina's
+# main loop and every `for e in scene.entities` scan keep visiting it. The
+# tracker counts live, disabled and destroyed entities per class every few
+# seconds, warns when a class keeps growing census after census, and flags
+# destroyed entities that something still holds on to. Entities the game
+# knows are gone for good are handed to retire() or expire() and destroyed a
+# few per frame, so a burst of pickups never turns into one long frame.
+
+import heapq
+import itertools
+import weakref
+from collections import deque
+
+
+class Lifecycle:
+    """Tracks what is in the scene and destroys retired entities on a budget.
+
+        lifecycle = Lifecycle(lambda: scene.entities, destroy)
+        lifecycle.retire(goomba)          # disabled now, destroyed shortly after
+        lifecycle.expire(text, 10)        # destroyed 10 seconds from now
+        def update():
+            lifecycle.step(time.dt)
+
+    retire() is for entities that will never come back; anything a save state
+    or rewind can re-enable must only be disabled. An entity re-enabled
+    before its grace period runs out is left alone.
+    """
+
+    def __init__(self, entities, destroy, budget=8, census_interval=5.0, growth_censuses=6, growth_min=50,
+                 on_alert=None):
+        self.entities = entities
+        self.destroy = destroy
+        self.budget = budget
+        self.census_interval = census_interval
+        self.growth_min = growth_min
+        self.on_alert = on_alert
+        self.clock = 0.0
+        self._queue = []              # (deadline, seq, entity, only_if_disabled)
+        self._seq = itertools.count()
+        self._next_census = census_interval
+        self._tracked = {}            # id -> (weakref, class name) of entities seen in the scene
+        self._gone = {}               # id -> (weakref, class name) of entities that left it
+        self.counts = {}              # class name -> [live, disabled]
+        self.destroyed = {}           # class name -> entities that have left the scene
+        self.zombies = {}             # class name -> destroyed entities still referenced after a census
+        self.history = deque(maxlen=growth_censuses + 1)
+        self.alerts = []
+        self._alerted = set()
+        self.compacted = 0
+
+    # --- Compaction ---
+
+    def retire(self, entity, grace=0.0):
+        """Disable `entity` now and destroy it after `grace` seconds unless it is re-enabled."""
+        entity.disable()
+        heapq.heappush(self._queue, (self.clock + grace, next(self._seq), entity, True))
+
+    def expire(self, entity, delay):
+        """Destroy `entity` after `delay` seconds, enabled or not."""
+        heapq.heappush(self._queue, (self.clock + delay, next(self._seq), entity, False))
+
+    def pending(self):
+        return len(self._queue)
+
+    def step(self, dt):
+        """Advance the clock, destroy up to `budget` due entities and take a census when one is due."""
+        self.clock += dt
+        destroyed = 0
+        while self._queue and self._queue[0][0] <= self.clock and destroyed < self.budget:
+            _, _, entity, only_if_disabled = heapq.heappop(self._queue)
+            if entity.is_empty() or (only_if_disabled and entity.enabled):
+                continue   # already destroyed elsewhere, or brought back
+            self.destroy(entity)
+            destroyed += 1
+        self.compacted += destroyed
+        if self.clock >= self._next_census:
+            self._next_census = self.clock + self.census_interval
+            self.census()
+        return destroyed
+
+    # --- Census ---
+
+    def census(self):
+        counts = {}
+        present = set()
+        for entity in self.entities():
+            name = type(entity).__name__
+            key = id(entity)
+            present.add(key)
+            known = self._tracked.get(key)
+            if known is None or known[0]() is not entity:
+                if known is not None:
+                    self._left(key, known)
+                self._tracked[key] = (weakref.ref(entity), name)
+            count = counts.setdefault(name, [0, 0])
+            count[0 if entity.enabled else 1] += 1
+        for key in [k for k in self._tracked if k not in present]:
+            self._left(key, self._tracked.pop(key))
+
+        # Destroyed entities still alive a census later are held by a list, closure or timer somewhere.
+        zombies = {}
+        for key, (ref, name) in list(self._gone.items()):
+            if ref() is None:
+                del self._gone[key]
+            else:
+                zombies[name] = zombies.get(name, 0) + 1
+        self.zombies = zombies
+        self.counts = counts
+        self.history.append({name: live + disabled for name, (live, disabled) in counts.items()})
+        self._check_growth()
+        return counts
+
+    def _left(self, key, known):
+        ref, name = known
+        self.destroyed[name] = self.destroyed.get(name, 0) + 1
+        if ref() is not None:
+            self._gone[key] = known
+
+    def _check_growth(self):
+        if len(self.history) < self.history.maxlen:
+            return
+        first, last = self.history[0], self.history[-1]
+        for name, total in last.items():
+            series = [h.get(name, 0) for h in self.history]
+            growing = all(b > a for a, b in zip(series, series[1:])) and total - first.get(name, 0) >= self.growth_min
+            if growing and name not in self._alerted:
+                self._alerted.add(name)
+                self._alert(f"{name} grew from {series[0]} to {total} over "
+                            f"{(len(series) - 1) * self.census_interval:.0f} s without shrinking")
+            elif not growing and total <= first.get(name, 0):
+                self._alerted.discard(name)
+        for name, count in self.zombies.items():
+            if count >= self.growth_min and (name, 'zombie') not in self._alerted:
+                self._alerted.add((name, 'zombie'))
+                self._alert(f"{count} destroyed {name} entities are still referenced")
+
+    def _alert(self, message):
+        self.alerts.append(message)
+        print(f"Entity leak warning: {message}")
+        if self.on_alert:
+            self.on_alert(message)
+
+    # --- Reporting ---
+
+    def report(self):
+        names = sorted(set(self.counts) | set(self.destroyed), key=lambda n: -sum(self.counts.get(n, (0, 0))))
+        lines = [f"{'class':<24}{'live':>8}{'disabled':>10}{'destroyed':>11}{'zombies':>9}"]
+        for name in names:
+            live, disabled = self.counts.get(name, (0, 0))
+            lines.append(f"{name:<24}{live:>8}{disabled:>10}{self.destroyed.get(name, 0):>11}{self.zombies.get(name, 0):>9}")
+        return '\n'.join(lines)
+
+    def summary(self):
+        live = sum(c[0] for c in self.counts.values())
+        disabled = sum(c[1] for c in self.counts.values())
+        return (f"{live} live, {disabled} disabled, {sum(self.destroyed.values())} destroyed "
+                f"({self.compacted} compacted, {self.pending()} pending), {sum(self.zombies.values())} zombies, "
+                f"{len(self.alerts)} alerts")
+
+
+if __name__ == '__main__':
+    import argparse
+    import random
+    import tracemalloc
+
+    parser = argparse.ArgumentParser(description='Soak test: spawn and retire pickups, with and without compaction.')
+    parser.add_argument('--minutes', type=float, default=30, help='simulated minutes at 60 FPS')
+    parser.add_argument('--spawn-rate', type=float, default=4, help='pickups spawned per second')
+    args = parser.parse_args()
+
+    class Pickup:
+        """Stands in for an Ursina Entity: enabled flag, disable() and is_empty()."""
+
+        def __init__(self, scene):
+            self.scene = scene
+            self.enabled = True
+            self.payload = bytearray(2048)
+            scene.append(self)
+
+        def disable(self):
+            self.enabled = False
+
+        def is_empty(self):
+            return self not in self.scene
+
+    def soak(compact):
+        scene = []
+        lifecycle = Lifecycle(lambda: scene, scene.remove)
+        rng = random.Random(1)
+        tracemalloc.start()
+        samples = []
+        live = []
+        frames = int(args.minutes * 60 * 60)
+        for frame in range(frames):
+            if rng.random() < args.spawn_rate / 60:
+                live.append(Pickup(scene))
+            if live and rng.random() < args.spawn_rate * 1.25 / 60:   # the player keeps up with spawns
+                picked = live.pop(rng.randrange(len(live)))
+                if compact:
+                    lifecycle.retire(picked, grace=1.0)
+                else:
+                    picked.disable()
+            lifecycle.step(1 / 60)
+            if frame % (60 * 60) == 0:
+                samples.append((len(scene), tracemalloc.get_traced_memory()[0]))
+        tracemalloc.stop()
+        return lifecycle, samples
+
+    for compact in (False, True):
+        lifecycle, samples = soak(compact)
+        print(f"{'retire + compaction' if compact else 'disable only':>20}: scene {samples[1][0]} -> {samples[-1][0]} "
+              f"entities, memory {samples[1][1] / 1024:.0f} -> {samples[-1][1] / 1024:.0f} KiB; {lifecycle.summary()}")
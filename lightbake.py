@@ -0,0 +1,219 @@
+# lightbake.py - Sun light, platform shadows and ambient occlusion baked into vertex colours.
+# Neither the sun nor the static platforms ever move, so their lighting is
+# computed once on the CPU: every face of every static box (and the ground)
+# is split into roughly cell-sized squares and each vertex casts one ray
+# toward the sun and a fixed set of short hemisphere rays, all tested against
+# the boxes with a vectorized slab test. The result multiplies the entity
+# colour under an unlit shader, so static geometry costs no lighting or
+# shadow-map work at run time; bakes are cached next to the level specs.
+
+import hashlib
+import math
+import os
+import pickle
+import time
+
+import numpy as np
+
+SUN = (1, -1, -1)                 # direction the light travels, as in sun.look_at(SUN)
+SUNLIGHT = (0.85, 0.8, 0.7)
+AMBIENT = (0.42, 0.46, 0.55)      # bluish sky light, scaled by occlusion
+SHADOW_CASTER_MASK = 0b0001       # camera mask Ursina gives a DirectionalLight's shadow camera
+BAKE_VERSION = 1
+
+FACES = ((0, 1), (0, -1), (1, 1), (1, -1), (2, 1), (2, -1))   # (axis, sign) of each unit-cube face
+
+
+def face_grid(axis, sign, size, cell, max_cells=32):
+    """One face of the unit cube split into about cell-sized squares: (vertices, normal, triangles)."""
+    u, v = [a for a in range(3) if a != axis]
+    nu = min(max(math.ceil(size[u] / cell), 1), max_cells)
+    nv = min(max(math.ceil(size[v] / cell), 1), max_cells)
+    gu, gv = np.meshgrid(np.linspace(-0.5, 0.5, nu + 1, dtype=np.float32), np.linspace(-0.5, 0.5, nv + 1, dtype=np.float32))
+    vertices = np.empty((gu.size, 3), np.float32)
+    vertices[:, u], vertices[:, v], vertices[:, axis] = gu.ravel(), gv.ravel(), sign * 0.5
+    i = np.arange(gu.size, dtype=np.uint32).reshape(nv + 1, nu + 1)
+    a, b, c, d = i[:-1, :-1], i[:-1, 1:], i[1:, 1:], i[1:, :-1]
+    triangles = np.stack((a, b, c, a, c, d), axis=-1).reshape(-1, 3)
+    normal = np.zeros(3, np.float32)
+    normal[axis] = sign
+    # Ursina's space is left-handed, so a front face's right-handed cross product points inward.
+    p = vertices[triangles[0]]
+    if np.dot(np.cross(p[1] - p[0], p[2] - p[0]), normal) > 0:
+        triangles = triangles[:, ::-1]
+    return vertices, normal, np.ascontiguousarray(triangles)
+
+
+def hemisphere(count):
+    """`count` cosine-weighted directions around +y on a Fibonacci spiral, the same every bake."""
+    k = np.arange(count) + 0.5
+    r = np.sqrt(k / count)
+    phi = k * math.pi * (3 - math.sqrt(5))
+    return np.stack((r * np.cos(phi), np.sqrt(1 - r * r), r * np.sin(phi)), axis=1)
+
+
+def ray_hits(origins, direction, lo, hi, max_t):
+    """(n,) bool: whether each ray origin + t * direction, 0 <= t <= max_t, hits any box in lo/hi."""
+    if not len(lo):
+        return np.zeros(len(origins), bool)
+    direction = np.where(np.abs(direction) < 1e-9, 1e-9, direction)
+    inv = 1.0 / direction
+    t1 = (lo[None] - origins[:, None]) * inv
+    t2 = (hi[None] - origins[:, None]) * inv
+    near = np.minimum(t1, t2).max(axis=2)
+    far = np.maximum(t1, t2).min(axis=2)
+    return ((far >= np.maximum(near, 0)) & (near <= np.reshape(max_t, (-1, 1)))).any(axis=1)
+
+
+def _near(lo, hi, points, reach):
+    """Boxes overlapping the bounds of `points` grown by `reach` (a vector per side)."""
+    low = points.min(axis=0) + np.minimum(reach, 0)
+    high = points.max(axis=0) + np.maximum(reach, 0)
+    keep = np.all(lo <= high, axis=1) & np.all(hi >= low, axis=1)
+    return lo[keep], hi[keep]
+
+
+def light_points(points, normal, lo, hi, sun=SUN, ground_y=0.0, ao_rays=12, ao_distance=3.0):
+    """(n, 3) baked light for points sharing one face normal."""
+    to_sun = -np.asarray(sun, np.float64)
+    to_sun /= np.linalg.norm(to_sun)
+    origins = points + normal * 1e-3
+    facing = max(float(np.dot(normal, to_sun)), 0.0)
+    lit = np.zeros(len(points))
+    if facing > 0:
+        # Rays only need to run until they clear the tallest box.
+        top = hi[:, 1].max() if len(lo) else ground_y
+        max_t = np.maximum(top - origins[:, 1], 0) / max(to_sun[1], 1e-6)
+        near_lo, near_hi = _near(lo, hi, origins, to_sun * max_t.max())
+        lit = facing * ~ray_hits(origins, to_sun, near_lo, near_hi, max_t)
+
+    # Ambient occlusion: the share of short hemisphere rays that escape.
+    tangent = np.cross(normal, (1, 0, 0) if abs(normal[0]) < 0.9 else (0, 1, 0))
+    tangent /= np.linalg.norm(tangent)
+    bitangent = np.cross(normal, tangent)
+    near_lo, near_hi = _near(lo, hi, origins, np.full(3, ao_distance))
+    escaped = np.zeros(len(points))
+    directions = hemisphere(ao_rays)
+    for x, y, z in directions:
+        direction = x * tangent + y * normal + z * bitangent
+        blocked = ray_hits(origins, direction, near_lo, near_hi, ao_distance)
+        if direction[1] < 0:
+            blocked |= (origins[:, 1] - ground_y) <= -direction[1] * ao_distance
+        escaped += ~blocked
+    ao = escaped / len(directions)
+    return ao[:, None] * AMBIENT + lit[:, None] * SUNLIGHT
+
+
+class LevelLighting:
+    """Baked vertex colours for the static boxes and the ground of one level.
+
+    platforms maps each (x, y, z, sx, sy, sz) box to unit-cube (vertices,
+    triangles, colors), to be drawn with the box's position and scale like
+    Ursina's 'cube'; ground is (vertices, uvs, triangles, colors) in world
+    units on y = 0.
+    """
+
+    def __init__(self, settings):
+        self.settings = settings
+        self.platforms = {}
+        self.ground = None
+        self.bake_time = 0.0
+
+    def matches(self, boxes):
+        """Whether this bake was made for exactly these boxes."""
+        return set(self.platforms) == {tuple(float(v) for v in box[:6]) for box in boxes}
+
+    def vertex_count(self):
+        return sum(len(p[0]) for p in self.platforms.values()) + (len(self.ground[0]) if self.ground else 0)
+
+    def platform_mesh(self, box):
+        from ursina import Mesh
+        vertices, triangles, colors = self.platforms[tuple(float(v) for v in box[:6])]
+        return Mesh(vertices=vertices.ravel(), triangles=triangles.ravel(), colors=colors.ravel())
+
+    def ground_mesh(self):
+        from ursina import Mesh
+        vertices, uvs, triangles, colors = self.ground
+        return Mesh(vertices=vertices.ravel(), triangles=triangles.ravel(), uvs=uvs.ravel(), colors=colors.ravel())
+
+
+def _colors(light):
+    return np.concatenate([np.clip(light, 0, 1), np.ones((len(light), 1))], axis=1).astype(np.float32)
+
+
+def bake(boxes, ground_size=200.0, cell=1.0, ground_cell=1.0, sun=SUN, ao_rays=12, ao_distance=3.0):
+    """LevelLighting for static (x, y, z, sx, sy, sz) boxes standing on a ground square at y = 0."""
+    start = time.perf_counter()
+    settings = dict(ground_size=ground_size, cell=cell, ground_cell=ground_cell, sun=tuple(sun),
+                    ao_rays=ao_rays, ao_distance=ao_distance)
+    lighting = LevelLighting(settings)
+    boxes = [tuple(float(v) for v in box[:6]) for box in boxes]
+    array = np.array(boxes, np.float64).reshape(-1, 6)
+    lo, hi = array[:, :3] - array[:, 3:] / 2, array[:, :3] + array[:, 3:] / 2
+
+    for box in boxes:
+        center, size = np.array(box[:3]), np.array(box[3:])
+        vertices, triangles, colors = [], [], []
+        base = 0
+        for axis, sign in FACES:
+            local, normal, faces = face_grid(axis, sign, size, cell)
+            light = light_points(local * size + center, normal, lo, hi, sun, 0.0, ao_rays, ao_distance)
+            vertices.append(local)
+            triangles.append(faces + base)
+            colors.append(_colors(light))
+            base += len(local)
+        lighting.platforms[box] = (np.concatenate(vertices), np.concatenate(triangles), np.concatenate(colors))
+
+    cells = int(math.ceil(ground_size / ground_cell))
+    local, normal, triangles = face_grid(1, 1, (ground_size, 0, ground_size), ground_cell, max_cells=cells)
+    vertices = local * (ground_size, 0, ground_size)
+    light = np.empty((len(vertices), 3))
+    # Rows of the grid in bands, so each band only tests the boxes near it.
+    band = (cells + 1) * 16
+    for i in range(0, len(vertices), band):
+        light[i:i + band] = light_points(vertices[i:i + band], normal, lo, hi, sun, 0.0, ao_rays, ao_distance)
+    uvs = local[:, (0, 2)] + 0.5
+    lighting.ground = (vertices.astype(np.float32), uvs.astype(np.float32), triangles, _colors(light))
+    lighting.bake_time = time.perf_counter() - start
+    return lighting
+
+
+def load_bake(boxes, cache_dir=os.path.join('.cache', 'levels'), **settings):
+    """bake() backed by an on-disk cache keyed by the boxes and settings, beside level_gen's level cache."""
+    boxes = [tuple(float(v) for v in box[:6]) for box in boxes]
+    key = hashlib.sha1(repr((BAKE_VERSION, sorted(boxes), sorted(settings.items()))).encode()).hexdigest()[:16]
+    path = os.path.join(cache_dir, f'light-{key}.pkl')
+    try:
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        pass
+    lighting = bake(boxes, **settings)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(lighting, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+    return lighting
+
+
+if __name__ == '__main__':
+    import argparse
+
+    import level_gen
+
+    parser = argparse.ArgumentParser(description='Time a light bake of a generated level.')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--cell', type=float, default=1.0)
+    parser.add_argument('--ao-rays', type=int, default=12)
+    args = parser.parse_args()
+
+    spec = level_gen.generate_level(args.seed, level_gen.LevelParams())
+    static = [p[:6] for p in spec.platforms if not p[7]]
+    lighting = bake(static, cell=args.cell, ground_cell=args.cell, ao_rays=args.ao_rays)
+    colors = np.concatenate([p[2] for p in lighting.platforms.values()] + [lighting.ground[3]])
+    print(f"{len(static)} static boxes, {lighting.vertex_count()} vertices baked in {lighting.bake_time * 1000:.0f} ms; "
+          f"mean light {colors[:, :3].mean():.2f}, {np.mean(colors[:, 0] < 0.5):.0%} of vertices in shade")
+    start = time.perf_counter()
+    pickle.loads(pickle.dumps(lighting, protocol=pickle.HIGHEST_PROTOCOL))
+    print(f"cache round trip {(time.perf_counter() - start) * 1000:.1f} ms")
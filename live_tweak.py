@@ -0,0 +1,180 @@
+# live_tweak.py - Rebuild only what a level parameter change actually touched.
+# Every generated item has a stable ID: platforms are (zone, n-th placed in
+# that zone) and coins, stars and enemies are their index in their category,
+# which level_gen keeps stable because each category draws from its own RNG
+# stream. Diffing two LevelSpecs by those IDs gives the few items to add,
+# remove or move; a LiveLevel applies the diff through per-category handlers,
+# so untouched entities stay as they are and removed ones keep their state
+# (collected, defeated) in case a later tweak brings them back.
+
+import json
+import os
+import time
+
+import level_gen
+
+CATEGORIES = ('platforms', 'coins', 'stars', 'goombas', 'bobombs')
+
+
+def keyed(spec):
+    """{category: {stable_id: record}} for a LevelSpec."""
+    platforms, seen = {}, {}
+    for record in spec.platforms:
+        kind = record[6]
+        platforms[(kind, seen.get(kind, 0))] = record
+        seen[kind] = seen.get(kind, 0) + 1
+    items = {'platforms': platforms}
+    for category in CATEGORIES[1:]:
+        items[category] = dict(enumerate(getattr(spec, category)))
+    return items
+
+
+class LevelDiff:
+    """Per-category {id: record} of added, removed and moved items; moved holds the new record."""
+
+    def __init__(self):
+        self.added = {c: {} for c in CATEGORIES}
+        self.removed = {c: {} for c in CATEGORIES}
+        self.moved = {c: {} for c in CATEGORIES}
+        self.unchanged = {c: 0 for c in CATEGORIES}
+
+    def __bool__(self):
+        return any(self.added[c] or self.removed[c] or self.moved[c] for c in CATEGORIES)
+
+    def summary(self):
+        parts = []
+        for c in CATEGORIES:
+            a, r, m = len(self.added[c]), len(self.removed[c]), len(self.moved[c])
+            if a or r or m:
+                parts.append(f"{c} +{a} -{r} ~{m}")
+        return ', '.join(parts) or 'no changes'
+
+
+def diff_levels(old, new):
+    diff = LevelDiff()
+    old_items, new_items = keyed(old), keyed(new)
+    for c in CATEGORIES:
+        before, after = old_items[c], new_items[c]
+        for key, record in after.items():
+            if key not in before:
+                diff.added[c][key] = record
+            elif before[key] != record:
+                diff.moved[c][key] = record
+            else:
+                diff.unchanged[c] += 1
+        for key, record in before.items():
+            if key not in after:
+                diff.removed[c][key] = record
+    return diff
+
+
+class ConfigWatcher:
+    """Polls a JSON file of LevelParams overrides and returns them when it changes.
+
+    poll() is cheap enough for every frame: the file is only stat'ed every
+    `interval` seconds and only parsed when its mtime moves. A file that fails
+    to parse is reported once and otherwise ignored until it is saved again.
+    """
+
+    def __init__(self, path, interval=0.5, clock=time.perf_counter):
+        self.path = path
+        self.interval = interval
+        self.clock = clock
+        self._next_check = 0.0
+        self._mtime = self._stat()
+        self.error = None
+
+    def _stat(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def poll(self):
+        now = self.clock()
+        if now < self._next_check:
+            return None
+        self._next_check = now + self.interval
+        mtime = self._stat()
+        if mtime is None or mtime == self._mtime:
+            return None
+        self._mtime = mtime
+        try:
+            with open(self.path) as f:
+                overrides = json.load(f)
+            if not isinstance(overrides, dict):
+                raise ValueError('expected a JSON object of LevelParams fields')
+        except (OSError, ValueError) as e:
+            self.error = f"{self.path}: {e}"
+            print(f"Ignoring level tweak: {self.error}")
+            return None
+        self.error = None
+        return overrides
+
+
+def tweaked_params(params, overrides):
+    """A copy of `params` with `overrides` applied; unknown names raise ValueError."""
+    values = params.as_dict()
+    unknown = set(overrides) - set(values)
+    if unknown:
+        raise ValueError(f"unknown level parameters: {', '.join(sorted(unknown))}")
+    values.update(overrides)
+    return level_gen.LevelParams(**values)
+
+
+class LiveLevel:
+    """One game object per stable ID, kept in step with a LevelSpec.
+
+        live = LiveLevel(level)
+        live.register('coins', create=spawn, destroy=remove, move=relocate, save=lambda obj: obj.collected)
+        live.build()
+        ...
+        diff = live.apply(level_gen.generate_level(seed, new_params))
+
+    create(key, record, state) returns the object; state is whatever save()
+    returned when an object with that ID was last removed, or None. Without a
+    move handler a moved item is saved, destroyed and created again.
+    """
+
+    def __init__(self, spec):
+        self.spec = spec
+        self.handlers = {}
+        self.objects = {c: {} for c in CATEGORIES}
+        self.retained = {c: {} for c in CATEGORIES}
+
+    def register(self, category, create, destroy, move=None, save=None):
+        self.handlers[category] = (create, destroy, move, save)
+
+    def build(self):
+        for category, items in keyed(self.spec).items():
+            if category in self.handlers:
+                create = self.handlers[category][0]
+                for key, record in items.items():
+                    self.objects[category][key] = create(key, record, self.retained[category].pop(key, None))
+
+    def ordered(self, category):
+        """Objects in spec order, for code that indexes them like the spec's lists."""
+        objects = self.objects[category]
+        return [objects[key] for key in keyed(self.spec)[category] if key in objects]
+
+    def apply(self, spec):
+        diff = diff_levels(self.spec, spec)
+        for category, (create, destroy, move, save) in self.handlers.items():
+            objects, retained = self.objects[category], self.retained[category]
+            for key in diff.removed[category]:
+                obj = objects.pop(key)
+                if save:
+                    retained[key] = save(obj)
+                destroy(obj)
+            for key, record in diff.moved[category].items():
+                if move:
+                    move(objects[key], record)
+                else:
+                    obj = objects.pop(key)
+                    state = save(obj) if save else None
+                    destroy(obj)
+                    objects[key] = create(key, record, state)
+            for key, record in diff.added[category].items():
+                objects[key] = create(key, record, retained.pop(key, None))
+        self.spec = spec
+        return diff
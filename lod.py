@@ -0,0 +1,212 @@
+# lod.py - Per-instance level of detail for meshes.py shapes, picked by screen size.
+# Each model is a small node with every detail level of its shape plus a
+# billboard impostor as children, all but one stashed so the renderer never
+# visits them. Once every few frames one NumPy pass turns the distance of
+# every instance into its on-screen size and picks a level, with hysteresis
+# so an instance hovering at a threshold does not flicker between two;
+# Python then only touches the instances whose level actually changed.
+
+import math
+
+import numpy as np
+
+import meshes
+
+# On-screen height in pixels below which an instance drops to the next level; the last one hands over to the impostor.
+THRESHOLDS = (140, 60, 24)
+
+
+class LodSet:
+    """Detail levels for many instances of a few shapes.
+
+        lods = LodSet(shapes)
+        coin = Entity(model=lods.model('coin'), ...)
+        lods.add(coin)
+        def update():
+            lods.update(camera.world_position, camera.fov, window.size[1])
+
+    Instances are tracked by their model node, not the entity. Call
+    remove() wherever an entity is destroyed: until then its model, and the
+    detached entity node above it, stay in the arrays. As a fallback a pass
+    drops an instance whose model no longer hangs under the scene it was
+    added to, but it only looks at moving instances and ones about to change
+    level. Only instances added with moving=True have their position read
+    again on each pass.
+    """
+
+    def __init__(self, shapes, thresholds=THRESHOLDS, hysteresis=0.15, every=3, impostor_pixels=64):
+        self.shapes = shapes
+        self.thresholds = np.asarray(thresholds, np.float64)
+        self.hysteresis = hysteresis
+        self.every = every
+        self.impostor_pixels = impostor_pixels
+        self.kinds = {}                # shape name -> kind index
+        self.child_of_level = []       # kind index -> (levels + 1,) child index
+        self.roots = []
+        self.levels = []               # per instance, its level nodes, impostor last
+        self.tops = []                 # per instance, the scene root it was added under
+        self.positions = np.zeros((0, 3))
+        self.radius = np.zeros(0)
+        self.kind = np.zeros(0, np.int32)
+        self.level = np.zeros(0, np.int32)
+        self.child = np.zeros(0, np.int32)
+        self.moving = np.zeros(0, bool)
+        self._frame = 0
+        self.switches = 0
+
+    def model(self, name):
+        """A model node holding every level of `name` and its impostor, showing full detail."""
+        from panda3d.core import NodePath
+        root = NodePath(f'{name}-lod')
+        chain = meshes.LOD_CHAINS.get(name, [{}])
+        # Copies rather than instances: stashing a node shared by thousands of parents walks all of them.
+        levels = [self.shapes.template(name, **params).copy_to(root) for params in chain]
+        levels.append(self.shapes.impostor(name, self.impostor_pixels).copy_to(root))
+        for level in levels[1:]:
+            level.stash()
+        root.set_python_tag('lod_shape', name)
+        root.set_python_tag('lod_levels', levels)   # taken back by add(), so no node keeps a cycle alive
+        if name not in self.kinds:
+            # Shapes with fewer meshes than thresholds keep their lowest mesh until the impostor takes over.
+            mapping = [min(level, len(chain) - 1) for level in range(len(self.thresholds))] + [len(chain)]
+            self.kinds[name] = len(self.child_of_level)
+            self.child_of_level.append(mapping)
+        return root
+
+    def add(self, entity, moving=False):
+        """Track the instance whose model came from model(); it starts at full detail."""
+        root = entity.model
+        slot = len(self.roots)
+        root.set_python_tag('lod_slot', slot)
+        self.roots.append(root)
+        self.tops.append(root.get_top())
+        self.levels.append(root.get_python_tag('lod_levels'))
+        root.clear_python_tag('lod_levels')
+        scale = root.get_scale(root.get_top())
+        self.positions = np.append(self.positions, [tuple(root.get_pos(root.get_top()))], axis=0)
+        self.radius = np.append(self.radius, max(abs(scale[0]), abs(scale[1]), abs(scale[2])) * 0.5)
+        self.kind = np.append(self.kind, self.kinds[root.get_python_tag('lod_shape')])
+        self.level = np.append(self.level, 0)
+        self.child = np.append(self.child, 0)
+        self.moving = np.append(self.moving, moving)
+
+    def remove(self, entity):
+        self._drop(entity.model)
+
+    def _detached(self, i):
+        # destroy() detaches the entity, but the model keeps the entity node as its parent.
+        return self.roots[i].get_top() != self.tops[i]
+
+    def _drop(self, root):
+        slot = root.get_python_tag('lod_slot')
+        if slot is None:
+            return
+        root.clear_python_tag('lod_slot')
+        last = len(self.roots) - 1
+        if slot != last:
+            # Move the last instance into the freed slot.
+            moved = self.roots[last]
+            self.roots[slot] = moved
+            self.levels[slot] = self.levels[last]
+            self.tops[slot] = self.tops[last]
+            moved.set_python_tag('lod_slot', slot)
+            for array in (self.positions, self.radius, self.kind, self.level, self.child, self.moving):
+                array[slot] = array[last]
+        self.roots.pop()
+        self.levels.pop()
+        self.tops.pop()
+        self.positions, self.radius, self.kind = self.positions[:last], self.radius[:last], self.kind[:last]
+        self.level, self.child, self.moving = self.level[:last], self.child[:last], self.moving[:last]
+
+    def update(self, camera_position, fov, screen_height):
+        """Every `every` calls, move instances whose on-screen size crossed a threshold to their new level."""
+        self._frame += 1
+        if self._frame % self.every or not self.roots:
+            return 0
+        moving = np.flatnonzero(self.moving)
+        detached = [self.roots[i] for i in moving if self._detached(i)]
+        if detached:
+            for root in detached:
+                self._drop(root)
+            moving = np.flatnonzero(self.moving)
+        if len(moving):
+            self.positions[moving] = [tuple(self.roots[i].get_pos(self.roots[i].get_top())) for i in moving]
+        focal = screen_height / (2 * math.tan(math.radians(fov) / 2))
+        distance = np.linalg.norm(self.positions - np.asarray(tuple(camera_position)), axis=1)
+        size = 2 * self.radius * focal / np.maximum(distance, 1e-3)
+        # Finer only once clearly above a threshold, coarser only once clearly below it.
+        finer = (size[:, None] < self.thresholds * (1 + self.hysteresis)).sum(axis=1)
+        coarser = (size[:, None] < self.thresholds * (1 - self.hysteresis)).sum(axis=1)
+        self.level = np.clip(self.level, coarser, finer).astype(np.int32)
+        child = np.asarray(self.child_of_level, np.int32)[self.kind, self.level]
+        changed = np.flatnonzero(child != self.child)
+        dropped = []
+        for i in changed:
+            root = self.roots[i]
+            if self._detached(i):
+                dropped.append(root)   # its entity was destroyed without remove()
+                continue
+            levels = self.levels[i]
+            levels[self.child[i]].stash()
+            levels[child[i]].unstash()
+        self.child[changed] = child[changed]
+        for root in dropped:
+            self._drop(root)
+        self.switches += len(changed) - len(dropped)
+        return len(changed) - len(dropped)
+
+    def counts(self):
+        """Instances per level, full detail first and impostors last."""
+        return np.bincount(self.level, minlength=len(self.thresholds) + 1)
+
+    def summary(self):
+        counts = ', '.join(str(n) for n in self.counts())
+        return f"{len(self.roots)} instances by level {counts} (impostors last), {self.switches} switches"
+
+
+if __name__ == '__main__':
+    import argparse
+    import tempfile
+    import time
+    from types import SimpleNamespace
+
+    from panda3d.core import NodePath
+
+    parser = argparse.ArgumentParser(description='Vertex load of a field of coins, stars and enemies with and without LOD.')
+    parser.add_argument('--count', type=int, default=2000, help='instances scattered over +-80 units')
+    parser.add_argument('--height', type=int, default=1080, help='screen height in pixels')
+    parser.add_argument('--fov', type=float, default=90)
+    args = parser.parse_args()
+
+    shapes = meshes.MeshCache(tempfile.mkdtemp())
+    lods = LodSet(shapes)
+    scene = NodePath('scene')
+    rng = np.random.default_rng(1)
+    names = ['coin'] * 6 + ['star', 'goomba', 'bobomb', 'koopa']
+    vertices = {}   # (name, child) -> vertices drawn
+    for name in set(names):
+        chain = meshes.LOD_CHAINS[name]
+        for child, params in enumerate(chain):
+            vertices[name, child] = len(meshes.SHAPES[name](**params)[0])
+        vertices[name, len(chain)] = 4
+    instances = []
+    for i in range(args.count):
+        name = names[i % len(names)]
+        root = lods.model(name)
+        root.reparent_to(scene)
+        root.set_pos(*rng.uniform(-80, 80, 3) * (1, 0.2, 1))
+        lods.add(SimpleNamespace(model=root))
+        instances.append(name)
+    full = sum(vertices[name, 0] for name in instances)
+    start = time.perf_counter()
+    for _ in range(lods.every):
+        lods.update((0, 5, 0), args.fov, args.height)
+    first = time.perf_counter() - start
+    start = time.perf_counter()
+    for step in range(60 * lods.every):
+        lods.update((step * 0.05, 5, 0), args.fov, args.height)   # walking forward at 3 units per second
+    steady = (time.perf_counter() - start) / 60
+    drawn = sum(vertices[name, child] for name, child in zip(instances, lods.child))
+    print(f"{args.count} instances: {full} vertices at full detail, {drawn} with LOD ({drawn / full:.0%}); "
+          f"{lods.summary()}")
+    print(f"first pass {first * 1000:.1f} ms (every instance switches), then {steady * 1000:.2f} ms per pass")
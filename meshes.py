@@ -0,0 +1,391 @@
+# meshes.py - Procedural low-poly models for collectibles, enemies and Mario.
+# Each shape is built from a few parts (lathed profiles, fans, boxes) with
+# NumPy, flat-shaded (three vertices per triangle, one face normal each) and
+# vertex-coloured, so it needs no texture and its triangle count is fixed by
+# its parameters. The first run bakes each shape to a Panda3D .bam under
+# .cache/meshes keyed by its parameters; later runs load the .bam directly,
+# which is much faster than building or parsing a mesh. Every shape fits the
+# unit box around the origin like Ursina's 'cube' and 'sphere' placeholders,
+# so entities keep their scale and colliders.
+
+import hashlib
+import math
+import os
+
+import numpy as np
+
+MESH_VERSION = 1
+
+GOLD = (1.0, 0.82, 0.12, 1.0)
+DARK_GOLD = (0.85, 0.6, 0.05, 1.0)
+BROWN = (0.5, 0.27, 0.1, 1.0)
+DARK_BROWN = (0.3, 0.15, 0.06, 1.0)
+TAN = (0.92, 0.78, 0.55, 1.0)
+WHITE = (1.0, 1.0, 1.0, 1.0)
+SHELL_GREEN = (0.15, 0.6, 0.2, 1.0)
+CREAM = (0.98, 0.94, 0.75, 1.0)
+YELLOW = (0.98, 0.85, 0.25, 1.0)
+RED = (0.85, 0.08, 0.08, 1.0)
+BLUE = (0.1, 0.2, 0.75, 1.0)
+SKIN = (1.0, 0.8, 0.62, 1.0)
+
+
+# --- Parts ---
+# A part is (triangles (n, 3, 3), outward (n, 3), colors (n, 4)); outward only
+# has to point to the outside of each face, it decides the winding.
+
+def _part(triangles, outward, color):
+    triangles = np.asarray(triangles, np.float32)
+    colors = np.broadcast_to(np.asarray(color, np.float32), (len(triangles), 4))
+    return triangles, np.asarray(outward, np.float32), colors
+
+
+def box(center, size, color):
+    """Axis-aligned box, 12 triangles."""
+    corners = np.array([(x, y, z) for x in (-0.5, 0.5) for y in (-0.5, 0.5) for z in (-0.5, 0.5)], np.float32)
+    corners = corners * size + center
+    faces = ((0, 1, 3, 2), (4, 6, 7, 5), (0, 4, 5, 1), (2, 3, 7, 6), (0, 2, 6, 4), (1, 5, 7, 3))
+    triangles = np.array([(corners[a], corners[b], corners[c]) for a, b, c, d in faces] +
+                         [(corners[a], corners[c], corners[d]) for a, b, c, d in faces])
+    return _part(triangles, triangles.mean(axis=1) - center, color)
+
+
+def lathe(profile, segments, colors, center=(0, 0, 0)):
+    """Revolve (radius, y) points around the y axis.
+
+    The profile runs from the bottom to the top around the outside of the
+    solid; a radius of 0 closes it with a fan. colors has one entry per band
+    between consecutive points, or is a single colour. Each band costs
+    2 * segments triangles, or segments for a fan.
+    """
+    colors = [colors] * (len(profile) - 1) if np.ndim(colors) == 1 else colors
+    theta = np.linspace(0, 2 * math.pi, segments + 1, dtype=np.float32)
+    cos, sin = np.cos(theta), np.sin(theta)
+    middle = (theta[:-1] + theta[1:]) / 2
+    triangles, outward, band_colors = [], [], []
+    for (r0, y0), (r1, y1), color in zip(profile[:-1], profile[1:], colors):
+        low = np.stack((r0 * cos, np.full_like(cos, y0), r0 * sin), axis=1)
+        high = np.stack((r1 * cos, np.full_like(cos, y1), r1 * sin), axis=1)
+        # Outward in the profile plane is the profile direction turned a quarter to the right.
+        normal = np.stack(((y1 - y0) * np.cos(middle), np.full_like(middle, r0 - r1), (y1 - y0) * np.sin(middle)), axis=1)
+        if r0 > 0:
+            triangles.append(np.stack((low[:-1], low[1:], high[1:]), axis=1))
+            outward.append(normal)
+            band_colors.append(np.broadcast_to(np.asarray(color, np.float32), (segments, 4)))
+        if r1 > 0:
+            triangles.append(np.stack((low[:-1], high[1:], high[:-1]), axis=1))
+            outward.append(normal)
+            band_colors.append(np.broadcast_to(np.asarray(color, np.float32), (segments, 4)))
+    return (np.concatenate(triangles) + np.asarray(center, np.float32), np.concatenate(outward),
+            np.concatenate(band_colors))
+
+
+def turned(part):
+    """A part rotated a quarter turn about x, so a lathe faces along z instead of y."""
+    triangles, outward, colors = part
+    rotate = np.array([[1, 0, 0], [0, 0, 1], [0, -1, 0]], np.float32)   # (x, y, z) -> (x, -z, y)
+    return triangles @ rotate, outward @ rotate, colors
+
+
+def assemble(parts):
+    """Flat-shaded (vertices, normals, colors) arrays, three rows per triangle."""
+    triangles = np.concatenate([p[0] for p in parts])
+    outward = np.concatenate([p[1] for p in parts])
+    colors = np.concatenate([p[2] for p in parts])
+    cross = np.cross(triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0])
+    # Ursina's space is left-handed, so a front face's right-handed cross product points inward.
+    flip = np.einsum('ij,ij->i', cross, outward) > 0
+    triangles[flip] = triangles[flip][:, ::-1]
+    cross[flip] = -cross[flip]
+    normals = -cross / np.maximum(np.linalg.norm(cross, axis=1, keepdims=True), 1e-12)
+    return (triangles.reshape(-1, 3), np.repeat(normals, 3, axis=0).astype(np.float32),
+            np.repeat(colors, 3, axis=0))
+
+
+# --- Shapes ---
+
+def star(points=5, outer=0.5, inner=0.22, thickness=0.24, color=GOLD):
+    """Power star facing +z: a rim of 2 * points corners pinched to a peak front and back, 4 * points triangles."""
+    angle = math.pi / 2 + np.arange(2 * points) * math.pi / points
+    radius = np.where(np.arange(2 * points) % 2 == 0, outer, inner)
+    rim = np.stack((radius * np.cos(angle), radius * np.sin(angle), np.zeros_like(angle)), axis=1)
+    after = np.roll(rim, -1, axis=0)
+    parts = []
+    for z in (thickness / 2, -thickness / 2):
+        peak = np.broadcast_to(np.array([0, 0, z]), rim.shape)
+        triangles = np.stack((peak, rim, after), axis=1)
+        parts.append(_part(triangles, triangles.mean(axis=1), color))
+    return assemble(parts)
+
+
+def coin(segments=12, radius=0.5, thickness=0.12, color=GOLD, rim=DARK_GOLD):
+    """Coin facing +z with a bevelled rim, 8 * segments triangles."""
+    h = thickness / 2
+    profile = [(0, -h), (radius * 0.8, -h), (radius, -h / 2), (radius, h / 2), (radius * 0.8, h), (0, h)]
+    return assemble([turned(lathe(profile, segments, [color, rim, rim, rim, color]))])
+
+
+def goomba(segments=8):
+    """Mushroom head on a stubby body with two feet and two eyes facing +z."""
+    profile = [(0, -0.28), (0.22, -0.28), (0.25, -0.05), (0.5, 0.05), (0.48, 0.25), (0.3, 0.45), (0, 0.5)]
+    return assemble([
+        lathe(profile, segments, [TAN, TAN, DARK_BROWN, BROWN, BROWN, BROWN]),
+        box((-0.16, -0.39, 0.06), (0.22, 0.22, 0.36), DARK_BROWN),
+        box((0.16, -0.39, 0.06), (0.22, 0.22, 0.36), DARK_BROWN),
+        box((-0.12, 0.14, 0.42), (0.1, 0.16, 0.1), WHITE),
+        box((0.12, 0.14, 0.42), (0.1, 0.16, 0.1), WHITE),
+    ])
+
+
+def bobomb(segments=10, rings=5):
+    """Round body with a fuse cap, feet and a wind-up key.
+
+    Baked white so the entity colour still decides how it looks (black,
+    flashing red as the fuse burns).
+    """
+    latitude = np.linspace(-math.pi / 2, math.pi / 2, rings + 1)
+    body = [(0.4 * math.cos(a) if 0 < i < rings else 0.0, 0.03 + 0.4 * math.sin(a)) for i, a in enumerate(latitude)]
+    cap = [(0, 0.4), (0.09, 0.4), (0.09, 0.5), (0, 0.5)]
+    return assemble([
+        lathe(body, segments, WHITE),
+        lathe(cap, 6, WHITE),
+        box((-0.15, -0.42, 0.05), (0.18, 0.14, 0.3), WHITE),
+        box((0.15, -0.42, 0.05), (0.18, 0.14, 0.3), WHITE),
+        box((0, 0.05, -0.46), (0.06, 0.06, 0.1), WHITE),
+        box((0, 0.05, -0.48), (0.3, 0.1, 0.04), WHITE),
+    ])
+
+
+def koopa(segments=10):
+    """Domed shell with a cream rim, head poking out toward +z and two legs."""
+    profile = [(0, -0.15), (0.42, -0.15), (0.46, -0.05), (0.4, 0.2), (0.22, 0.36), (0, 0.4)]
+    return assemble([
+        lathe(profile, segments, [CREAM, CREAM, SHELL_GREEN, SHELL_GREEN, SHELL_GREEN]),
+        box((0, 0.1, 0.38), (0.22, 0.26, 0.22), YELLOW),
+        box((-0.18, -0.33, 0.05), (0.14, 0.34, 0.18), YELLOW),
+        box((0.18, -0.33, 0.05), (0.14, 0.34, 0.18), YELLOW),
+    ])
+
+
+def mario(segments=8):
+    """Stand-in player: blue overalls, red shirt and cap, head and a cap brim facing +z."""
+    profile = [(0, -0.5), (0.3, -0.5), (0.35, -0.1), (0.3, 0.15), (0.15, 0.2), (0.25, 0.27),
+               (0.25, 0.38), (0.27, 0.4), (0.2, 0.48), (0, 0.5)]
+    return assemble([
+        lathe(profile, segments, [BLUE, BLUE, RED, RED, SKIN, SKIN, RED, RED, RED]),
+        box((0, 0.39, 0.27), (0.3, 0.03, 0.14), RED),
+    ])
+
+
+SHAPES = {'star': star, 'coin': coin, 'goomba': goomba, 'bobomb': bobomb, 'koopa': koopa, 'mario': mario}
+
+
+# --- Detail levels and impostors ---
+
+# Each shape's parameters from full detail down; an impostor follows the last level.
+LOD_CHAINS = {
+    'star': [{}],
+    'coin': [{'segments': 12}, {'segments': 8}, {'segments': 5}],
+    'goomba': [{'segments': 8}, {'segments': 6}, {'segments': 4}],
+    'bobomb': [{'segments': 10, 'rings': 5}, {'segments': 6, 'rings': 4}, {'segments': 4, 'rings': 3}],
+    'koopa': [{'segments': 10}, {'segments': 6}, {'segments': 4}],
+    'mario': [{'segments': 8}, {'segments': 6}, {'segments': 4}],
+}
+IMPOSTOR_LIGHT = (0.3, 0.6, 1.0)   # baked into the picture, toward the upper front
+
+
+def impostor(arrays, pixels=64, supersample=2):
+    """(pixels, pixels, 4) uint8 RGBA picture of a shape seen from its +z side, bottom row first.
+
+    A small z-buffered rasterizer: each front-facing triangle fills the
+    pixels inside it, flat-shaded toward IMPOSTOR_LIGHT, then the picture is
+    averaged down from `supersample` times the size for smooth edges.
+    Columns run along -x, so on a quad facing the camera the front reads the
+    right way round.
+    """
+    vertices, normals, colors = arrays
+    triangles, normals, colors = vertices.reshape(-1, 3, 3), normals[::3], colors[::3]
+    size = pixels * supersample
+    centers = (np.arange(size, dtype=np.float32) + 0.5) / size - 0.5
+    px, py = np.meshgrid(-centers, centers)
+    depth = np.full((size, size), -np.inf, np.float32)
+    image = np.zeros((size, size, 4), np.float32)
+    light = np.asarray(IMPOSTOR_LIGHT, np.float32) / np.linalg.norm(IMPOSTOR_LIGHT)
+    shade = 0.55 + 0.45 * np.clip(normals @ light, 0, 1)
+    for (a, b, c), normal, color, s in zip(triangles, normals, colors, shade):
+        area = (b[1] - c[1]) * (a[0] - c[0]) + (c[0] - b[0]) * (a[1] - c[1])
+        if normal[2] <= 0 or abs(area) < 1e-9:
+            continue   # faces away from the viewer, or is seen edge-on
+        x0, x1 = min(a[0], b[0], c[0]), max(a[0], b[0], c[0])
+        y0, y1 = min(a[1], b[1], c[1]), max(a[1], b[1], c[1])
+        j0, j1 = max(int((0.5 - x1) * size), 0), min(int(math.ceil((0.5 - x0) * size)), size)
+        i0, i1 = max(int((y0 + 0.5) * size), 0), min(int(math.ceil((y1 + 0.5) * size)), size)
+        if j0 >= j1 or i0 >= i1:
+            continue
+        x, y = px[i0:i1, j0:j1], py[i0:i1, j0:j1]
+        wa = ((b[1] - c[1]) * (x - c[0]) + (c[0] - b[0]) * (y - c[1])) / area
+        wb = ((c[1] - a[1]) * (x - c[0]) + (a[0] - c[0]) * (y - c[1])) / area
+        wc = 1 - wa - wb
+        z = wa * a[2] + wb * b[2] + wc * c[2]
+        window = depth[i0:i1, j0:j1]
+        hit = (wa >= 0) & (wb >= 0) & (wc >= 0) & (z > window)
+        window[hit] = z[hit]
+        image[i0:i1, j0:j1][hit] = (*(color[:3] * s), color[3])
+
+    image = image.reshape(pixels, supersample, pixels, supersample, 4).mean(axis=(1, 3))
+    alpha = image[..., 3:]
+    covered = alpha[..., 0] > 0
+    # Colours were averaged against a transparent black background; undo that, and give empty
+    # pixels the mean colour so filtering and mipmaps do not pull a dark fringe into the edge.
+    image[..., :3] = np.where(covered[..., None], image[..., :3] / np.maximum(alpha, 1e-6),
+                              image[covered, :3].mean(axis=0) / max(alpha[covered].mean(), 1e-6) if covered.any() else 0)
+    return np.round(np.clip(image, 0, 1) * 255).astype(np.uint8)
+
+
+# --- Panda3D geometry and the .bam cache ---
+
+def geom_node(name, arrays):
+    """A static GeomNode holding one interleaved vertex/normal/color array, drawn non-indexed."""
+    from panda3d.core import Geom, GeomNode, GeomTriangles, GeomVertexArrayFormat, GeomVertexData, GeomVertexFormat
+    vertices, normals, colors = arrays
+    array_format = GeomVertexArrayFormat()
+    array_format.add_column('vertex', 3, Geom.NT_float32, Geom.C_point)
+    array_format.add_column('normal', 3, Geom.NT_float32, Geom.C_normal)
+    array_format.add_column('color', 4, Geom.NT_uint8, Geom.C_color)
+    vertex_format = GeomVertexFormat.register_format(GeomVertexFormat(array_format))
+    rows = np.empty(len(vertices), [('vertex', '<f4', 3), ('normal', '<f4', 3), ('color', 'u1', 4)])
+    rows['vertex'], rows['normal'] = vertices, normals
+    rows['color'] = np.round(np.clip(colors, 0, 1) * 255)
+    vdata = GeomVertexData(name, vertex_format, Geom.UH_static)
+    vdata.unclean_set_num_rows(len(rows))
+    memoryview(vdata.modify_array(0)).cast('B')[:] = memoryview(rows).cast('B')
+    triangles = GeomTriangles(Geom.UH_static)
+    triangles.add_consecutive_vertices(0, len(rows))   # flat shading shares no vertices, so no index buffer
+    geom = Geom(vdata)
+    geom.add_primitive(triangles)
+    node = GeomNode(name)
+    node.add_geom(geom)
+    return node
+
+
+def impostor_node(name, image):
+    """A unit quad facing -z, textured with an impostor() picture, that turns to face the camera as it is drawn."""
+    from panda3d.core import (BillboardEffect, Geom, GeomNode, GeomTriangles, GeomVertexData, GeomVertexFormat,
+                              RenderState, SamplerState, Texture, TextureAttrib)
+    rows = np.zeros(4, [('vertex', '<f4', 3), ('normal', '<f4', 3), ('texcoord', '<f4', 2)])
+    rows['vertex'][:, :2] = ((-0.5, -0.5), (0.5, -0.5), (0.5, 0.5), (-0.5, 0.5))
+    rows['normal'] = (0, 0, -1)
+    rows['texcoord'] = rows['vertex'][:, :2] + 0.5
+    vdata = GeomVertexData(name, GeomVertexFormat.get_v3n3t2(), Geom.UH_static)
+    vdata.unclean_set_num_rows(len(rows))
+    memoryview(vdata.modify_array(0)).cast('B')[:] = memoryview(rows).cast('B')
+    triangles = GeomTriangles(Geom.UH_static)
+    triangles.add_vertices(0, 1, 2)
+    triangles.add_vertices(0, 2, 3)
+    geom = Geom(vdata)
+    geom.add_primitive(triangles)
+
+    # A texture without a filename is written into the .bam along with the quad.
+    texture = Texture(name)
+    texture.setup_2d_texture(image.shape[1], image.shape[0], Texture.T_unsigned_byte, Texture.F_rgba8)
+    texture.set_ram_image(np.ascontiguousarray(image[..., (2, 1, 0, 3)]).tobytes())   # Panda stores BGRA
+    texture.set_minfilter(SamplerState.FT_linear_mipmap_linear)
+    texture.set_magfilter(SamplerState.FT_linear)
+    texture.set_wrap_u(SamplerState.WM_clamp)
+    texture.set_wrap_v(SamplerState.WM_clamp)
+    node = GeomNode(name)
+    node.add_geom(geom, RenderState.make(TextureAttrib.make(texture)))
+    node.set_effect(BillboardEffect.make_point_eye())
+    return node
+
+
+class MeshCache:
+    """Shapes by name, baked to .bam on first use and loaded from disk after that.
+
+        shapes = MeshCache()
+        coin = Entity(model=shapes.model('coin'), color=color.white, ...)
+
+    model() returns a fresh NodePath per call (entities reparent and tint
+    their model) that shares the loaded vertex data with every other copy.
+    """
+
+    def __init__(self, cache_dir=os.path.join('.cache', 'meshes')):
+        self.cache_dir = cache_dir
+        self.templates = {}
+        self.baked = []
+        self.loaded = []
+
+    def path_for(self, name, params):
+        key = hashlib.sha1(repr((MESH_VERSION, name, sorted(params.items()))).encode()).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f'{name}-{key}.bam')
+
+    def template(self, name, **params):
+        return self._cached(name, params, lambda: geom_node(name, SHAPES[name](**params)))
+
+    def impostor(self, name, pixels=64):
+        """Billboard impostor of `name` at its full detail (the first of its LOD_CHAINS)."""
+        full = LOD_CHAINS.get(name, [{}])[0]
+        return self._cached(f'{name}-impostor', dict(full, pixels=pixels),
+                            lambda: impostor_node(f'{name}-impostor', impostor(SHAPES[name](**full), pixels)))
+
+    def _cached(self, name, params, build):
+        from panda3d.core import Filename, Loader, LoaderOptions, NodePath
+        key = (name, tuple(sorted(params.items())))
+        if key in self.templates:
+            return self.templates[key]
+        path = self.path_for(name, params) if self.cache_dir else None
+        node = None
+        if path and os.path.exists(path):
+            options = LoaderOptions(LoaderOptions.LF_no_cache | LoaderOptions.LF_report_errors)
+            node = Loader.get_global_ptr().load_sync(Filename.from_os_specific(path), options)
+        if node is not None:
+            self.loaded.append(name)
+        else:
+            # Missing or unreadable cache file: build it again.
+            node = build()
+            self.baked.append(name)
+            if path:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                tmp_path = path + '.tmp'
+                if NodePath(node).write_bam_file(Filename.from_os_specific(tmp_path)):
+                    os.replace(tmp_path, path)
+        self.templates[key] = NodePath(node)
+        return self.templates[key]
+
+    def model(self, name, **params):
+        from panda3d.core import NodePath
+        return self.template(name, **params).copy_to(NodePath())
+
+
+if __name__ == '__main__':
+    import argparse
+    import shutil
+    import tempfile
+    import time
+
+    parser = argparse.ArgumentParser(description='Report triangle counts and time building, baking and loading shapes.')
+    parser.add_argument('--repeat', type=int, default=200, help='copies made per shape when timing model()')
+    args = parser.parse_args()
+
+    cache_dir = tempfile.mkdtemp()
+    try:
+        for name, build in SHAPES.items():
+            start = time.perf_counter()
+            vertices, normals, colors = build()
+            built = time.perf_counter() - start
+            start = time.perf_counter()
+            MeshCache(cache_dir).template(name)
+            baked = time.perf_counter() - start
+            cache = MeshCache(cache_dir)
+            start = time.perf_counter()
+            cache.template(name)
+            loaded = time.perf_counter() - start
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                cache.model(name)
+            copied = (time.perf_counter() - start) / args.repeat
+            size = os.path.getsize(cache.path_for(name, {}))
+            print(f"{name:>7}: {len(vertices) // 3:>4} triangles, {size:>6} byte .bam; build {built * 1000:.2f} ms, "
+                  f"build+bake {baked * 1000:.2f} ms, cached load {loaded * 1000:.2f} ms, copy {copied * 1e6:.0f} us")
+    finally:
+        shutil.rmtree(cache_dir)
@@ -0,0 +1,459 @@
+# netsim.py - Server-authoritative multiplayer over UDP with delta snapshots.
+# A headless server process steps sim.World at a fixed tick and sends every
+# client only the entities near its player that changed since the snapshot
+# that client last acknowledged. Clients predict their own movement with the
+# same sim code, reconcile against the server and interpolate everyone else.
+#
+# Load test on localhost:
+#   python netsim.py --clients 32 --seconds 10
+
+import argparse
+import heapq
+import json
+import math
+import multiprocessing
+import random
+import selectors
+import socket
+import statistics
+import struct
+import time
+
+import level_gen
+import sim
+
+# --- Wire Format ---
+HELLO, WELCOME, INPUT, SNAPSHOT, BYE = range(5)
+
+HELLO_MSG = struct.Struct('<BI')              # type, nonce
+WELCOME_MSG = struct.Struct('<BIHHq')         # type, nonce, client id, tick rate, level seed; LevelParams JSON follows
+INPUT_MSG = struct.Struct('<BHIIffhB')        # type, client id, input seq, acked tick, move x, move z, yaw*100, buttons
+SNAPSHOT_HEADER = struct.Struct('<BIIIH')     # type, tick, base tick, last input seq, entity count
+OWN_STATE = struct.Struct('<ffffBHHb')        # x, y, z, vy, grounded, coins, stars, health
+ENTITY = struct.Struct('<HBBhhhh')            # id, kind, flags, x, y, z, yaw (fixed point)
+BYE_MSG = struct.Struct('<BH')
+
+BUTTON_JUMP = 1
+KIND_PLAYER, KIND_GOOMBA, KIND_COIN, KIND_STAR = range(4)
+REMOVED = 1
+
+# Entity id ranges on the wire; players take the ids below GOOMBA_BASE.
+GOOMBA_BASE, STAR_BASE, COIN_BASE = 256, 4096, 8192
+
+POSITION_SCALE = 32    # 1/32 unit precision, +-1023 units range
+INTEREST_RADIUS = 40.0
+HISTORY = 64           # snapshots kept per client for delta bases
+MAX_DATAGRAM = 1200    # stay under typical MTU
+
+
+def _quantize(x, y, z, yaw):
+    clamp = lambda v: max(-32768, min(32767, int(round(v))))
+    return (clamp(x * POSITION_SCALE), clamp(y * POSITION_SCALE), clamp(z * POSITION_SCALE),
+            clamp((yaw % 360) * 90))
+
+
+def _dequantize(q):
+    return q[0] / POSITION_SCALE, q[1] / POSITION_SCALE, q[2] / POSITION_SCALE, q[3] / 90
+
+
+class StaticInterest:
+    """Coins and stars never move, so they are quantized once and filed by interest cell."""
+
+    def __init__(self, world, radius=INTEREST_RADIUS):
+        self.radius = radius
+        self.cells = {}
+        for kind, base, items in ((KIND_STAR, STAR_BASE, world.stars), (KIND_COIN, COIN_BASE, world.coins)):
+            for i, (x, y, z) in enumerate(items):
+                cell = (math.floor(x / radius), math.floor(z / radius))
+                self.cells.setdefault(cell, []).append((x, z, kind, i, base + i, (kind,) + _quantize(x, y, z, 0)))
+
+    def near(self, cx, cz):
+        r2 = self.radius * self.radius
+        ix, iz = math.floor(cx / self.radius), math.floor(cz / self.radius)
+        for gx in (ix - 1, ix, ix + 1):
+            for gz in (iz - 1, iz, iz + 1):
+                for entry in self.cells.get((gx, gz), ()):
+                    if (entry[0] - cx) ** 2 + (entry[1] - cz) ** 2 <= r2:
+                        yield entry
+
+
+def world_view(world, statics, center, exclude=None):
+    """Quantized {entity_id: (kind, qx, qy, qz, qyaw)} of everything near `center`."""
+    cx, cz = center
+    r2 = statics.radius * statics.radius
+    near = lambda x, z: (x - cx) ** 2 + (z - cz) ** 2 <= r2
+    view = {}
+    for pid, p in world.players.items():
+        if pid != exclude and near(p.x, p.z):
+            view[pid] = (KIND_PLAYER,) + _quantize(p.x, p.y, p.z, p.yaw)
+    for i, g in enumerate(world.goombas):
+        if g.alive and near(g.x, g.z):
+            view[GOOMBA_BASE + i] = (KIND_GOOMBA,) + _quantize(g.x, g.y, g.z, 0)
+    for _, _, kind, i, eid, state in statics.near(cx, cz):
+        taken = world.star_taken if kind == KIND_STAR else world.coin_taken
+        if not taken[i]:
+            view[eid] = state
+    return view
+
+
+def encode_delta(base, view):
+    """Entity records turning `base` into `view`: changed or new entries plus removals."""
+    records = []
+    for eid, state in view.items():
+        if base.get(eid) != state:
+            records.append(ENTITY.pack(eid, state[0], 0, *state[1:]))
+    for eid, state in base.items():
+        if eid not in view:
+            records.append(ENTITY.pack(eid, state[0], REMOVED, 0, 0, 0, 0))
+    return records
+
+
+def apply_delta(base, payload, count):
+    view = dict(base)
+    for eid, kind, flags, qx, qy, qz, qyaw in ENTITY.iter_unpack(payload[:count * ENTITY.size]):
+        if flags & REMOVED:
+            view.pop(eid, None)
+        else:
+            view[eid] = (kind, qx, qy, qz, qyaw)
+    return view
+
+
+# --- Server ---
+
+class ClientSlot:
+    def __init__(self, client_id, address):
+        self.client_id = client_id
+        self.address = address
+        self.inputs = {}          # seq -> (move_x, move_z, yaw, jump)
+        self.last_seq = 0
+        self.last_input = (0.0, 0.0, 0.0, False)
+        self.acked_tick = 0
+        self.sent = {}            # tick -> view sent at that tick
+        self.bytes_out = 0
+
+
+class Server:
+    def __init__(self, seed, port=0, tick_rate=sim.TICK_RATE, params=None):
+        self.seed = seed
+        self.tick_rate = tick_rate
+        self.dt = 1.0 / tick_rate
+        level = level_gen.generate_level(seed, params)
+        self.world = sim.World(level)
+        # Clients rebuild the level themselves, so they need the exact params too.
+        self.level_params = json.dumps(level.params.as_dict(), separators=(',', ':')).encode()
+        self.statics = StaticInterest(self.world)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(('127.0.0.1', port))
+        self.sock.setblocking(False)
+        self.port = self.sock.getsockname()[1]
+        self.clients = {}         # address -> ClientSlot
+        self.next_id = 0
+        self.free_ids = []        # ids of players who left, handed out again first
+        self.tick_times = []
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.peak_clients = 0
+
+    def _receive(self):
+        while True:
+            try:
+                data, address = self.sock.recvfrom(2048)
+            except (BlockingIOError, ConnectionResetError):
+                return
+            self.bytes_in += len(data)
+            kind = data[0]
+            if kind == HELLO:
+                _, nonce = HELLO_MSG.unpack_from(data)
+                slot = self.clients.get(address)
+                if slot is None:
+                    client_id = self._allocate_id()
+                    if client_id is None:
+                        continue   # server full: no WELCOME, so the client keeps retrying
+                    slot = self.clients[address] = ClientSlot(client_id, address)
+                    self.world.add_player(slot.client_id)
+                    self.peak_clients = max(self.peak_clients, len(self.clients))
+                welcome = WELCOME_MSG.pack(WELCOME, nonce, slot.client_id, self.tick_rate, self.seed)
+                self.sock.sendto(welcome + self.level_params, address)
+            elif kind == INPUT:
+                slot = self.clients.get(address)
+                if slot is None:
+                    continue
+                _, _, seq, acked, move_x, move_z, yaw, buttons = INPUT_MSG.unpack_from(data)
+                if seq > slot.last_seq:
+                    slot.inputs[seq] = (move_x, move_z, yaw / 100, bool(buttons & BUTTON_JUMP))
+                if acked in slot.sent and acked > slot.acked_tick:
+                    slot.acked_tick = acked
+            elif kind == BYE:
+                slot = self.clients.pop(address, None)
+                if slot:
+                    self.world.remove_player(slot.client_id)
+                    heapq.heappush(self.free_ids, slot.client_id)
+
+    def _allocate_id(self):
+        """Lowest free player id, or None once all GOOMBA_BASE ids are taken."""
+        if self.free_ids:
+            return heapq.heappop(self.free_ids)
+        if self.next_id >= GOOMBA_BASE:
+            return None
+        self.next_id += 1
+        return self.next_id - 1
+
+    def _consume_inputs(self):
+        # One input per client per tick; a missing input repeats the last one.
+        inputs = {}
+        for slot in self.clients.values():
+            seq = slot.last_seq + 1
+            if seq in slot.inputs:
+                slot.last_input = slot.inputs.pop(seq)
+                slot.last_seq = seq
+            elif slot.inputs and min(slot.inputs) > seq:
+                # Lost packets: skip ahead rather than stalling this client.
+                seq = min(slot.inputs)
+                slot.last_input = slot.inputs.pop(seq)
+                slot.last_seq = seq
+            inputs[slot.client_id] = slot.last_input
+        return inputs
+
+    def _send_snapshots(self):
+        tick = self.world.tick
+        for slot in self.clients.values():
+            p = self.world.players.get(slot.client_id)
+            if p is None:
+                continue
+            view = world_view(self.world, self.statics, (p.x, p.z), exclude=slot.client_id)
+            base_tick = slot.acked_tick if slot.acked_tick in slot.sent else 0
+            base = slot.sent.get(base_tick, {})
+            records = encode_delta(base, view)
+            own = OWN_STATE.pack(p.x, p.y, p.z, p.vy, p.grounded, p.coins, p.stars, p.health)
+            room = (MAX_DATAGRAM - SNAPSHOT_HEADER.size - OWN_STATE.size) // ENTITY.size
+            if len(records) > room:
+                # Too much changed for one datagram: send what fits and let the rest
+                # arrive next tick by recording only what the client will really know.
+                records = records[:room]
+                view = apply_delta(base, b''.join(records), len(records))
+            packet = SNAPSHOT_HEADER.pack(SNAPSHOT, tick, base_tick, slot.last_seq, len(records)) + own + b''.join(records)
+            self.sock.sendto(packet, slot.address)
+            slot.bytes_out += len(packet)
+            self.bytes_out += len(packet)
+            slot.sent[tick] = view
+            for old in [t for t in slot.sent if t < tick - HISTORY]:
+                del slot.sent[old]
+            if slot.acked_tick < tick - HISTORY:
+                slot.acked_tick = 0
+
+    def run(self, seconds):
+        next_tick = time.perf_counter()
+        end = next_tick + seconds
+        while True:
+            now = time.perf_counter()
+            if now >= end:
+                break
+            if now < next_tick:
+                time.sleep(min(next_tick - now, 0.002))
+                self._receive()
+                continue
+            began = time.perf_counter()
+            self._receive()
+            self.world.step(self._consume_inputs(), self.dt)
+            self._send_snapshots()
+            self.tick_times.append(time.perf_counter() - began)
+            next_tick += self.dt
+        return self.metrics(seconds)
+
+    def metrics(self, seconds):
+        times = sorted(self.tick_times) or [0.0]
+        bytes_out = self.bytes_out
+        clients = max(1, self.peak_clients)
+        return {
+            'ticks': len(self.tick_times),
+            'clients': self.peak_clients,
+            'tick_ms_mean': statistics.fmean(times) * 1000,
+            'tick_ms_p99': times[int(len(times) * 0.99) - 1 if len(times) > 1 else 0] * 1000,
+            'tick_ms_max': times[-1] * 1000,
+            'kbps_out_total': bytes_out * 8 / 1000 / seconds,
+            'kbps_out_per_client': bytes_out * 8 / 1000 / seconds / clients,
+            'kbps_in_total': self.bytes_in * 8 / 1000 / seconds,
+        }
+
+
+def _run_server_process(seed, tick_rate, seconds, ready, results):
+    server = Server(seed, tick_rate=tick_rate)
+    ready.put(server.port)
+    results.put(server.run(seconds))
+
+
+# --- Client ---
+
+class NetClient:
+    """One player's connection: prediction, reconciliation and interpolation."""
+
+    def __init__(self, server_address, interp_ticks=2):
+        self.server_address = server_address
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.setblocking(False)
+        self.nonce = random.getrandbits(32)
+        self.client_id = None
+        self.world = None
+        self.predicted = None
+        self.pending = []          # (seq, input) not yet confirmed by the server
+        self.seq = 0
+        self.views = {0: {}}       # server tick -> reconstructed view
+        self.latest_tick = 0
+        self.latest_time = 0.0
+        self.tick_rate = sim.TICK_RATE
+        self.interp_ticks = interp_ticks
+        self.bytes_in = 0
+        self.corrections = []
+
+    def connect(self):
+        self.sock.sendto(HELLO_MSG.pack(HELLO, self.nonce), self.server_address)
+
+    def close(self):
+        self.sock.sendto(BYE_MSG.pack(BYE, self.client_id or 0), self.server_address)
+        self.sock.close()
+
+    def receive(self):
+        while True:
+            try:
+                data = self.sock.recv(2048)
+            except (BlockingIOError, ConnectionResetError):
+                return
+            self.bytes_in += len(data)
+            if data[0] == WELCOME and self.client_id is None:
+                _, nonce, client_id, tick_rate, seed = WELCOME_MSG.unpack_from(data)
+                if nonce == self.nonce:
+                    self.client_id = client_id
+                    self.tick_rate = tick_rate
+                    params = level_gen.LevelParams(**json.loads(data[WELCOME_MSG.size:]))
+                    self.world = sim.World(level_gen.generate_level(seed, params))
+            elif data[0] == SNAPSHOT and self.client_id is not None:
+                self._on_snapshot(data)
+
+    def _on_snapshot(self, data):
+        _, tick, base_tick, input_seq, count = SNAPSHOT_HEADER.unpack_from(data)
+        if tick <= self.latest_tick or base_tick not in self.views:
+            return
+        offset = SNAPSHOT_HEADER.size
+        x, y, z, vy, grounded, coins, stars, health = OWN_STATE.unpack_from(data, offset)
+        offset += OWN_STATE.size
+        self.views[tick] = apply_delta(self.views[base_tick], data[offset:], count)
+        self.latest_tick = tick
+        self.latest_time = time.perf_counter()
+        # Tick 0 is the empty baseline the server falls back to when this client lags behind; keep it.
+        for old in [t for t in self.views if 0 < t < tick - HISTORY]:
+            del self.views[old]
+
+        # Reconcile: rewind to the authoritative state and replay unconfirmed inputs.
+        if self.predicted is None:
+            self.predicted = sim.PlayerState(x, y, z)
+        p = self.predicted
+        before = (p.x, p.y, p.z)
+        p.x, p.y, p.z, p.vy, p.grounded = x, y, z, vy, bool(grounded)
+        p.coins, p.stars, p.health = coins, stars, health
+        self.pending = [(seq, inp) for seq, inp in self.pending if seq > input_seq]
+        for _, (move_x, move_z, yaw, jump) in self.pending:
+            p.yaw = yaw
+            sim.step_player(p, move_x, move_z, jump, self.world.surfaces, self.world.params, 1.0 / self.tick_rate)
+        self.corrections.append(math.dist(before, (p.x, p.y, p.z)))
+
+    def send_input(self, move_x, move_z, yaw, jump):
+        """Predict locally and send the input; call once per client tick."""
+        if self.predicted is None:
+            return
+        self.seq += 1
+        inp = (move_x, move_z, yaw, jump)
+        self.pending.append((self.seq, inp))
+        self.predicted.yaw = yaw
+        sim.step_player(self.predicted, move_x, move_z, jump, self.world.surfaces, self.world.params,
+                        1.0 / self.tick_rate)
+        packet = INPUT_MSG.pack(INPUT, self.client_id, self.seq, self.latest_tick, move_x, move_z,
+                                int(round(((yaw + 180) % 360 - 180) * 100)), BUTTON_JUMP if jump else 0)
+        self.sock.sendto(packet, self.server_address)
+
+    def interpolated(self, now=None):
+        """{entity_id: (kind, x, y, z, yaw)} for remote entities, interp_ticks behind the latest snapshot."""
+        now = time.perf_counter() if now is None else now
+        render_tick = self.latest_tick - self.interp_ticks + min(1.0, (now - self.latest_time) * self.tick_rate)
+        t0 = math.floor(render_tick)
+        a = self._nearest_view(t0, -1)
+        b = self._nearest_view(t0 + 1, 1)
+        alpha = render_tick - t0
+        result = {}
+        for eid, state in b.items():
+            old = a.get(eid, state)
+            ax, ay, az, ayaw = _dequantize(old[1:])
+            bx, by, bz, byaw = _dequantize(state[1:])
+            result[eid] = (state[0], ax + (bx - ax) * alpha, ay + (by - ay) * alpha, az + (bz - az) * alpha, byaw)
+        return result
+
+    def _nearest_view(self, tick, step):
+        for t in range(tick, tick + step * HISTORY, step):
+            if t in self.views:
+                return self.views[t]
+            if t <= 0 or t > self.latest_tick:
+                break
+        return self.views.get(self.latest_tick, {})
+
+
+# --- Load Test ---
+
+def load_test(clients=32, seconds=10.0, tick_rate=sim.TICK_RATE, seed=1):
+    """Run a server process and `clients` random-walking bots on localhost."""
+    ready, results = multiprocessing.Queue(), multiprocessing.Queue()
+    server = multiprocessing.Process(target=_run_server_process, args=(seed, tick_rate, seconds + 1.0, ready, results))
+    server.start()
+    address = ('127.0.0.1', ready.get(timeout=30))
+
+    bots = [NetClient(address) for _ in range(clients)]
+    selector = selectors.DefaultSelector()
+    for bot in bots:
+        bot.connect()
+        selector.register(bot.sock, selectors.EVENT_READ, bot)
+    rng = random.Random(seed)
+    headings = [rng.uniform(0, 360) for _ in bots]
+    dt = 1.0 / tick_rate
+    next_tick = time.perf_counter()
+    end = next_tick + seconds
+    while time.perf_counter() < end:
+        for key, _ in selector.select(timeout=max(0.0, next_tick - time.perf_counter())):
+            key.data.receive()
+        if time.perf_counter() < next_tick:
+            continue
+        for i, bot in enumerate(bots):
+            if bot.client_id is None:
+                bot.connect()
+                continue
+            if bot.predicted is None:
+                continue
+            if rng.random() < 0.05:
+                headings[i] = rng.uniform(0, 360)
+            bot.send_input(0.0, 1.0, headings[i], rng.random() < 0.05)
+            bot.interpolated()
+        next_tick += dt
+    for bot in bots:
+        bot.close()
+    metrics = results.get(timeout=30)
+    server.join()
+
+    corrections = [c for bot in bots for c in bot.corrections]
+    metrics['client_kbps_in_mean'] = statistics.fmean(b.bytes_in for b in bots) * 8 / 1000 / seconds
+    metrics['prediction_error_mean'] = statistics.fmean(corrections) if corrections else 0.0
+    metrics['connected'] = sum(1 for b in bots if b.client_id is not None)
+    return metrics
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Localhost load test for the authoritative server.')
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--tick-rate', type=int, default=sim.TICK_RATE)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args(argv)
+    metrics = load_test(args.clients, args.seconds, args.tick_rate, args.seed)
+    for name, value in metrics.items():
+        print(f'{name:>24}: {value:.3f}' if isinstance(value, float) else f'{name:>24}: {value}')
+
+
+if __name__ == '__main__':
+    main()
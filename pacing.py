@@ -0,0 +1,199 @@
+# pacing.py - Frame pacing and input-to-display latency telemetry.
+# An FPS counter says nothing about how evenly frames arrive or how long a
+# key press takes to show up. The pacer timestamps every presented frame into
+# an interval histogram (percentiles, jank counts against the target refresh)
+# and follows each input event from the moment input() sees it to the frame
+# that displays its effect. In low-latency mode it also moves the idle time of
+# a vsync'd frame from after rendering to before input is sampled, so the
+# input a frame uses is as fresh as the deadline allows.
+
+import json
+import time
+from collections import deque
+
+BIN_MS = 0.5        # histogram resolution
+MAX_BIN_MS = 100    # intervals beyond this land in the last bin
+
+
+class InputEvent:
+    __slots__ = ('key', 'time', 'frame', 'waiting')
+
+    def __init__(self, key, time, frame, waiting):
+        self.key = key
+        self.time = time
+        self.frame = frame
+        self.waiting = waiting      # True until the game calls reflect(key)
+
+
+class FramePacer:
+    """Call presented() once per frame after the swap and input(key) from the input handler.
+
+        pacer = FramePacer(target_fps=60)
+        def input(key):
+            pacer.input(key)                  # shown by the frame that handles it
+            pacer.input('space', wait=True)   # shown when the game calls pacer.reflect('space')
+
+    Latency runs from the input handler to the end of the frame that shows
+    the effect; `frames` counts the presents in between. Events still waiting
+    after `max_wait_frames` are dropped (a jump the game refused).
+    """
+
+    def __init__(self, target_fps=60, history=3600, max_wait_frames=30, jank_factor=1.5, clock=time.perf_counter):
+        self.target = 1.0 / target_fps
+        self.clock = clock
+        self.max_wait_frames = max_wait_frames
+        self.jank_factor = jank_factor
+        self.bins = [0] * (int(MAX_BIN_MS / BIN_MS) + 1)
+        self.intervals = deque(maxlen=history)      # seconds, most recent frames
+        self.latencies = deque(maxlen=history)      # (key, ms, frames)
+        self.frame = 0
+        self.frames = 0
+        self.jank = 0           # intervals over jank_factor x target (a missed refresh)
+        self.severe_jank = 0    # intervals of three refreshes or more
+        self.expired = 0
+        self.pending = []
+        self.last_present = None
+        self.wake = None
+        self.work = deque(maxlen=120)   # wake-to-present seconds, for the low-latency deadline
+
+    # --- Input ---
+
+    def input(self, key, wait=False):
+        """Stamp an input event as the game handles it."""
+        event = InputEvent(key, self.clock(), self.frame, wait)
+        self.pending.append(event)
+        return event
+
+    def reflect(self, key):
+        """Mark the oldest waiting `key` event as visible in the frame being built."""
+        for event in self.pending:
+            if event.waiting and event.key == key:
+                event.waiting = False
+                return True
+        return False
+
+    def waiting(self, key):
+        return any(event.waiting and event.key == key for event in self.pending)
+
+    # --- Frames ---
+
+    def presented(self):
+        """Record the end of a frame: its interval and the latency of inputs it shows."""
+        now = self.clock()
+        if self.last_present is not None:
+            interval = now - self.last_present
+            self.intervals.append(interval)
+            self.bins[min(int(interval * 1000 / BIN_MS), len(self.bins) - 1)] += 1
+            self.frames += 1
+            if interval > self.target * self.jank_factor:
+                self.jank += 1
+            if interval > self.target * 2.5:
+                self.severe_jank += 1
+        if self.wake is not None:
+            self.work.append(now - self.wake)
+            self.wake = None
+        self.last_present = now
+
+        still = []
+        for event in self.pending:
+            if not event.waiting:
+                self.latencies.append((event.key, (now - event.time) * 1000, self.frame - event.frame))
+            elif self.frame - event.frame >= self.max_wait_frames:
+                self.expired += 1
+            else:
+                still.append(event)
+        self.pending = still
+        self.frame += 1
+
+    def sleep_until_input(self, safety=0.002):
+        """Low-latency pacing: sleep away the frame's slack before input is sampled.
+
+        Wakes at the next refresh deadline minus the recent 95th-percentile
+        frame work and a safety margin, so input is read as late as possible.
+        """
+        if self.last_present is not None and len(self.work) >= 10:
+            work = sorted(self.work)[int(len(self.work) * 0.95) - 1]
+            wake_at = self.last_present + self.target - work - safety
+            delay = wake_at - self.clock()
+            if delay > 0:
+                time.sleep(delay)
+        self.wake = self.clock()
+
+    # --- Reports ---
+
+    def percentiles(self, points=(50, 90, 99, 99.9)):
+        ordered = sorted(self.intervals)
+        if not ordered:
+            return {}
+        return {f'p{p:g}': round(ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] * 1000, 2)
+                for p in points}
+
+    def latency_percentiles(self, key=None, points=(50, 90, 99)):
+        ordered = sorted(ms for k, ms, _ in self.latencies if key is None or k == key)
+        if not ordered:
+            return {}
+        return {f'p{p:g}': round(ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))], 2) for p in points}
+
+    def histogram(self):
+        """Non-empty bins as {'16.5-17.0': count}; the last bin is open-ended."""
+        last = len(self.bins) - 1
+        return {(f'{i * BIN_MS:.1f}-{(i + 1) * BIN_MS:.1f}' if i < last else f'{MAX_BIN_MS}+'): n
+                for i, n in enumerate(self.bins) if n}
+
+    def report(self):
+        keys = sorted({k for k, _, _ in self.latencies})
+        frames_behind = [f for _, _, f in self.latencies]
+        return {
+            'frames': self.frames,
+            'target_ms': round(self.target * 1000, 2),
+            'interval_ms': self.percentiles(),
+            'jank': self.jank,
+            'severe_jank': self.severe_jank,
+            'histogram': self.histogram(),
+            'input_latency_ms': self.latency_percentiles(),
+            'input_latency_by_key_ms': {k: self.latency_percentiles(k) for k in keys},
+            'input_frames_max': max(frames_behind, default=0),
+            'inputs_expired': self.expired,
+        }
+
+    def summary(self):
+        p = self.percentiles()
+        latency = self.latency_percentiles()
+        return (f"{self.frames} frames, interval p50 {p.get('p50', 0)} / p99 {p.get('p99', 0)} ms, "
+                f"jank {self.jank} ({self.severe_jank} severe), "
+                f"input latency p50 {latency.get('p50', 0)} / p99 {latency.get('p99', 0)} ms")
+
+    def dump(self, path='pacing.json'):
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+
+
+def install(app, target_fps=60, low_latency=False, **kwargs):
+    """Hook a FramePacer into a Panda3D/Ursina app's task loop.
+
+    presented() runs right after igLoop (sort 50) renders the frame. Panda
+    normally flips a frame at the start of the next render_frame; auto-flip
+    makes the swap happen inside this frame's igLoop, so the present stamp is
+    the swap. In low-latency mode the frame-rate limiter is turned off and a
+    task ahead of dataLoop (sort -50) sleeps until just before the deadline.
+    """
+    from panda3d.core import ClockObject
+
+    pacer = FramePacer(target_fps=target_fps, **kwargs)
+    app.graphicsEngine.set_auto_flip(True)
+
+    def present_task(task):
+        pacer.presented()
+        return task.cont
+
+    app.taskMgr.add(present_task, 'pacing-present', sort=60)
+    if low_latency:
+        ClockObject.get_global_clock().set_mode(ClockObject.M_normal)
+
+        def wait_task(task):
+            pacer.sleep_until_input()
+            return task.cont
+
+        app.taskMgr.add(wait_task, 'pacing-wait', sort=-60)
+    pacer.low_latency = low_latency
+    return pacer
@@ -0,0 +1,273 @@
+# particles.py - Vectorized particles drawn from one dynamic vertex buffer.
+# Every live particle is a row in a set of NumPy arrays kept packed at the
+# front, so spawning, integrating, expiring and building camera-facing quads
+# are whole-array operations with no Python loop over particles. Emitters only
+# decide how many particles to spawn; the renderer copies the finished quads
+# into a single Panda3D GeomVertexData and draws them in one call.
+
+import math
+
+import numpy as np
+
+# Spawn parameters by effect. speed, life and size are (low, high) ranges;
+# colors fade from start to end over each particle's life.
+PRESETS = {
+    'spark': dict(speed=(2.0, 5.0), spread=0.6, direction=(0, 1, 0), life=(0.2, 0.5), size=(0.12, 0.02),
+                  start=(1.0, 0.9, 0.4, 1.0), end=(1.0, 0.2, 0.0, 0.0), gravity=6.0, drag=1.0),
+    'explosion': dict(speed=(4.0, 12.0), spread=1.0, direction=(0, 1, 0), life=(0.4, 1.0), size=(0.9, 0.2),
+                      start=(1.0, 0.8, 0.3, 1.0), end=(0.6, 0.1, 0.0, 0.0), gravity=3.0, drag=2.5),
+    'smoke': dict(speed=(0.5, 2.0), spread=0.5, direction=(0, 1, 0), life=(1.0, 2.0), size=(0.6, 1.8),
+                  start=(0.3, 0.3, 0.3, 0.7), end=(0.5, 0.5, 0.5, 0.0), gravity=-0.5, drag=0.8),
+    'sparkle': dict(speed=(0.1, 0.6), spread=1.0, direction=(0, 1, 0), life=(0.4, 0.9), size=(0.15, 0.0),
+                    start=(1.0, 1.0, 0.7, 1.0), end=(1.0, 0.85, 0.2, 0.0), gravity=0.0, drag=0.0, jitter=0.4),
+}
+
+_CORNERS = np.array([(-1, -1), (1, -1), (1, 1), (-1, 1)], np.float32)
+
+
+class Emitter:
+    """A continuous source: `rate` particles per second at a point or following an entity."""
+
+    def __init__(self, system, preset, rate, position=(0, 0, 0), follow=None, offset=(0, 0, 0), cull_distance=60.0):
+        self.system = system
+        self.preset = preset
+        self.rate = rate
+        self.position = position
+        self.follow = follow
+        self.offset = offset
+        self.cull_distance = cull_distance
+        self.active = True
+        self.visible = True
+        self.id = len(system.emitters)
+        self._owed = 0.0
+
+    def world_position(self):
+        if self.follow is not None:
+            p = self.follow.world_position
+            return (p[0] + self.offset[0], p[1] + self.offset[1], p[2] + self.offset[2])
+        return self.position
+
+    def stop(self):
+        self.active = False
+
+
+class ParticleSystem:
+    """Up to `budget` particles; spawn requests past the budget are dropped and counted."""
+
+    def __init__(self, budget=50000, seed=None):
+        self.budget = budget
+        self.rng = np.random.default_rng(seed)
+        self.count = 0
+        self.position = np.zeros((budget, 3), np.float32)
+        self.velocity = np.zeros((budget, 3), np.float32)
+        self.age = np.zeros(budget, np.float32)
+        self.life = np.ones(budget, np.float32)
+        self.size = np.zeros((budget, 2), np.float32)       # start, end
+        self.start = np.zeros((budget, 4), np.float32)
+        self.end = np.zeros((budget, 4), np.float32)
+        self.physics = np.zeros((budget, 2), np.float32)    # gravity, drag
+        self.source = np.zeros(budget, np.int32)            # emitter id, or -1 for bursts
+        self.emitters = []
+        self.dropped = 0
+        # Four corners per particle; positions and colors are separate vertex arrays.
+        self.vertices = np.zeros((budget * 4, 3), np.float32)
+        self.colors = np.zeros((budget * 4, 4), np.float32)
+        corner = np.arange(budget, dtype=np.uint32)[:, None] * 4
+        self.indices = (corner + np.array([0, 1, 2, 0, 2, 3], np.uint32)).ravel()
+
+    # --- Spawning ---
+
+    def emit(self, position, count, preset='spark', source=-1, **overrides):
+        """Spawn `count` particles at `position` with a preset's ranges; returns how many fit.
+
+        position and source may also be arrays with one row per particle, which
+        is how step() spawns for every emitter of a preset in a single call.
+        """
+        params = dict(PRESETS[preset], **overrides)
+        n = min(count, self.budget - self.count)
+        self.dropped += count - n
+        if n <= 0:
+            return 0
+        rng = self.rng
+        s = slice(self.count, self.count + n)
+        # Directions: the preset direction blended toward uniformly random ones by `spread`.
+        random_dirs = rng.normal(size=(n, 3)).astype(np.float32)
+        random_dirs /= np.linalg.norm(random_dirs, axis=1, keepdims=True) + 1e-6
+        dirs = np.asarray(params['direction'], np.float32) * (1 - params['spread']) + random_dirs * params['spread']
+        dirs /= np.linalg.norm(dirs, axis=1, keepdims=True) + 1e-6
+        self.velocity[s] = dirs * rng.uniform(*params['speed'], size=(n, 1))
+        self.position[s] = position[:n] if np.ndim(position) == 2 else position
+        jitter = params.get('jitter', 0.0)
+        if jitter:
+            self.position[s] += rng.uniform(-jitter, jitter, size=(n, 3))
+        self.age[s] = 0
+        self.life[s] = rng.uniform(*params['life'], size=n)
+        self.size[s] = params['size']
+        self.start[s] = params['start']
+        self.end[s] = params['end']
+        self.physics[s] = (params['gravity'], params['drag'])
+        self.source[s] = source[:n] if np.ndim(source) else source
+        self.count += n
+        return n
+
+    def add_emitter(self, preset, rate, **kwargs):
+        emitter = Emitter(self, preset, rate, **kwargs)
+        self.emitters.append(emitter)
+        return emitter
+
+    # --- Simulation ---
+
+    def step(self, dt, camera_position=None):
+        """Run emitters, integrate and expire particles."""
+        pending = {}   # preset -> ([position], [count], [emitter id])
+        for emitter in self.emitters:
+            if not emitter.active:
+                continue
+            follow = emitter.follow
+            if follow is not None and not getattr(follow, 'enabled', True):
+                continue
+            position = emitter.world_position()
+            if camera_position is not None:
+                dx, dy, dz = (position[i] - camera_position[i] for i in range(3))
+                emitter.visible = dx * dx + dy * dy + dz * dz <= emitter.cull_distance ** 2
+                if not emitter.visible:
+                    emitter._owed = 0.0   # culled emitters neither spawn nor draw
+                    continue
+            emitter._owed += emitter.rate * dt
+            whole = int(emitter._owed)
+            if whole:
+                emitter._owed -= whole
+                batch = pending.setdefault(emitter.preset, ([], [], []))
+                batch[0].append(position)
+                batch[1].append(whole)
+                batch[2].append(emitter.id)
+        for preset, (positions, counts, ids) in pending.items():
+            self.emit(np.repeat(np.asarray(positions, np.float32), counts, axis=0), sum(counts), preset,
+                      source=np.repeat(np.asarray(ids, np.int32), counts))
+        if not all(e.active for e in self.emitters):
+            # Renumber the survivors; particles of stopped emitters become bursts and live out their life.
+            remap = np.full(len(self.emitters) + 1, -1, np.int32)
+            self.emitters = [e for e in self.emitters if e.active]
+            for i, e in enumerate(self.emitters):
+                remap[e.id] = i
+                e.id = i
+            self.source[:self.count] = remap[self.source[:self.count]]
+
+        n = self.count
+        if not n:
+            return
+        age = self.age[:n]
+        age += dt
+        alive = age < self.life[:n]
+        if not alive.all():
+            n = int(alive.sum())
+            for a in (self.position, self.velocity, self.age, self.life, self.size, self.start, self.end,
+                      self.physics, self.source):
+                a[:n] = np.compress(alive, a[:self.count], axis=0)
+            self.count = n
+        v = self.velocity[:n]
+        v[:, 1] -= self.physics[:n, 0] * dt
+        v *= np.maximum(0.0, 1.0 - self.physics[:n, 1:2] * dt)
+        self.position[:n] += v * dt
+
+    # --- Drawing ---
+
+    def build_quads(self, right, up):
+        """Fill self.vertices with camera-facing quads for every drawn particle; returns the quad count."""
+        n = self.count
+        if not n:
+            return 0
+        if self.emitters and not all(e.visible for e in self.emitters):
+            hidden = np.array([not e.visible for e in self.emitters] + [False], bool)   # index -1: bursts
+            keep = ~hidden[self.source[:n]]
+            index = np.flatnonzero(keep)
+        else:
+            index = slice(0, n)
+        t = (self.age[:n] / self.life[:n])[index]
+        position = self.position[:n][index]
+        m = len(position)
+        if not m:
+            return 0
+        size = (self.size[:n, 0][index] + (self.size[:n, 1][index] - self.size[:n, 0][index]) * t) * 0.5
+        color = self.start[:n][index] + (self.end[:n][index] - self.start[:n][index]) * t[:, None]
+        # Corner offsets in camera space (-r-u, +r-u, +r+u, -r+u) scaled by each particle's size.
+        corners = _CORNERS @ np.array([right, up], np.float32)
+        quads = self.vertices[:m * 4].reshape(m, 4, 3)
+        np.multiply(size[:, None, None], corners, out=quads)
+        quads += position[:, None, :]
+        self.colors[:m * 4].reshape(m, 16)[:] = np.tile(color, 4)
+        return m
+
+
+class ParticleRenderer:
+    """Draws a ParticleSystem as one GeomTriangles over one dynamic vertex array."""
+
+    def __init__(self, system, parent):
+        from panda3d.core import (Geom, GeomNode, GeomTriangles, GeomVertexArrayFormat, GeomVertexData,
+                                  GeomVertexFormat, OmniBoundingVolume, TransparencyAttrib)
+        self.system = system
+        vertex_format = GeomVertexFormat()
+        vertex_format.add_array(GeomVertexArrayFormat('vertex', 3, Geom.NT_float32, Geom.C_point))
+        vertex_format.add_array(GeomVertexArrayFormat('color', 4, Geom.NT_float32, Geom.C_color))
+        vertex_format = GeomVertexFormat.register_format(vertex_format)
+        self.vdata = GeomVertexData('particles', vertex_format, Geom.UH_dynamic)
+        self.triangles = GeomTriangles(Geom.UH_dynamic)
+        self.triangles.set_index_type(Geom.NT_uint32)
+        self.geom = Geom(self.vdata)
+        self.geom.add_primitive(self.triangles)
+        node = GeomNode('particles')
+        node.add_geom(self.geom)
+        # Particles fly everywhere; skip bounds upkeep and never frustum-cull the batch.
+        node.set_bounds(OmniBoundingVolume())
+        node.set_final(True)
+        self.node_path = parent.attach_new_node(node)
+        self.node_path.set_transparency(TransparencyAttrib.M_alpha)
+        self.node_path.set_depth_write(False)
+        self.node_path.set_two_sided(True)
+        self.node_path.set_light_off()
+        self.node_path.set_bin('transparent', 10)
+        self.drawn = 0
+
+    def upload(self, right, up):
+        m = self.system.build_quads(right, up)
+        vdata = self.geom.modify_vertex_data()
+        vdata.unclean_set_num_rows(m * 4)
+        if m:
+            memoryview(vdata.modify_array(0)).cast('B').cast('f')[:] = memoryview(self.system.vertices[:m * 4].reshape(-1))
+            memoryview(vdata.modify_array(1)).cast('B').cast('f')[:] = memoryview(self.system.colors[:m * 4].reshape(-1))
+        primitive = self.geom.modify_primitive(0)
+        indices = primitive.modify_vertices()
+        indices.unclean_set_num_rows(m * 6)
+        if m:
+            memoryview(indices).cast('B').cast('I')[:] = memoryview(self.system.indices[:m * 6])
+        self.drawn = m
+        return m
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description='Time particle simulation and quad building.')
+    parser.add_argument('--particles', type=int, default=50000)
+    parser.add_argument('--frames', type=int, default=120)
+    args = parser.parse_args()
+
+    system = ParticleSystem(budget=args.particles, seed=1)
+    for i in range(200):
+        angle = i / 200 * 2 * math.pi
+        system.add_emitter('spark', rate=args.particles / 200 / 0.35,
+                           position=(math.cos(angle) * 40, 1, math.sin(angle) * 40), cull_distance=1000)
+    dt = 1 / 60
+    for _ in range(60):
+        system.step(dt, (0, 0, 0))
+    step_time = quad_time = 0.0
+    for _ in range(args.frames):
+        start = time.perf_counter()
+        system.step(dt, (0, 0, 0))
+        step_time += time.perf_counter() - start
+        start = time.perf_counter()
+        system.build_quads((1, 0, 0), (0, 1, 0))
+        quad_time += time.perf_counter() - start
+    print(f"{system.count} live particles, {system.dropped} dropped by the budget")
+    print(f"step {step_time / args.frames * 1000:.2f} ms, quads {quad_time / args.frames * 1000:.2f} ms per frame")
@@ -5,12 +5,76 @@
 
 from ursina import *
 from ursina.prefabs.first_person_controller import FirstPersonController
-from ursina.shaders import lit_with_shadows_shader
+from ursina.shaders import lit_with_shadows_shader, unlit_shader
+import os
 import random
+import capture
+import governor
+import hitch
+import level_gen
+import lightbake
+import lod
+import live_tweak
+import meshes
+import particles
+import placement
+import savestate
+import sfx
+from contacts import ContactSystem
+from dormant import ActorStore
+from lifecycle import Lifecycle
+from timer_wheel import TimerWheel
+from triggers import TriggerSystem
 
 # Initialize the Ursina app for our SM64-inspired world.
+capture.prepare()
 app = Ursina()
 
+# Level size and effect quality are fitted to this machine by a short benchmark
+# cached under .cache/governor (SM64_CALIBRATE=1 measures again). SM64_LEVEL_SCALE=1
+# forces the full-size level, e.g. to replay a seed vetted by seed_farm.py.
+FRAME_BUDGET_MS = 1000 / 60
+LEVEL_COUNTS = {'num_platforms': 70, 'num_coins': 150, 'num_goombas': 10, 'num_bobombs': 5}
+# (drawn, updated) entities per item; coins are dormant unless within ACTIVE_RADIUS.
+LEVEL_COSTS = {'num_platforms': (1, 0), 'num_coins': (0.13, 0.13), 'num_goombas': (1, 1), 'num_bobombs': (1, 1)}
+calibration = governor.load_calibration(refresh=bool(os.environ.get('SM64_CALIBRATE')))
+level_counts, level_scale, quality_name = governor.plan_counts(
+    calibration, LEVEL_COUNTS, LEVEL_COSTS, FRAME_BUDGET_MS, max_scale=2.0,
+    scale=float(os.environ['SM64_LEVEL_SCALE']) if os.environ.get('SM64_LEVEL_SCALE') else None)
+quality = governor.QUALITY[quality_name]
+print(f"Planned a {level_scale:.2f}x level at {quality_name} quality for this machine.")
+# While frames run over budget, coins near the player stay dormant a little longer.
+spawns = governor.SpawnGovernor(FRAME_BUDGET_MS)
+
+# Every timed gameplay event (wander timers, fuses) is a deadline on this wheel,
+# advanced once per frame by the simulation clock in update().
+timers = TimerWheel()
+# Pickups, stomps and hurts are dispatched from contact pairs found once per frame.
+contacts = ContactSystem()
+# Proximity sensors (Bob-omb fuses) report enter events instead of polling distance().
+triggers = TriggerSystem()
+# Effects are synthesized once (cached under .cache/sfx) and share 8 voices;
+# SM64_AUDIO=null swaps in the silent backend.
+sounds = sfx.VoicePool(sfx.SoundBank().load(),
+                       sfx.NullBackend() if os.environ.get('SM64_AUDIO') == 'null' else sfx.PandaBackend(app.loader))
+# Sparks, blasts and coin sparkles share one NumPy particle pool drawn as a single batch.
+effects = particles.ParticleSystem(budget=quality['particles'])
+effect_renderer = particles.ParticleRenderer(effects, scene)
+# Stars, coins and enemies are low-poly procedural meshes, baked once to .cache/meshes.
+shapes = meshes.MeshCache()
+# Each of them drops to coarser meshes and then a billboard impostor as it shrinks on screen.
+lods = lod.LodSet(shapes)
+# Coins wait as compact dormant rows and only become entities near the player.
+actors = ActorStore()
+ACTIVE_RADIUS = 40
+# Frames over 1/30 s are logged to hitches.jsonl with the GC passes and game
+# events they contained; SM64_HITCH_TRACE=1 adds tracemalloc deltas.
+hitches = hitch.HitchMonitor(trace_allocations=bool(os.environ.get('SM64_HITCH_TRACE'))).start()
+# Entity census per class with growth warnings. Stars and enemies only ever
+# disable, since a rewind or a loaded save brings them back; one-off entities
+# such as banners are destroyed on a per-frame budget.
+lifecycle = Lifecycle(lambda: scene.entities, destroy, on_alert=lambda message: hitches.note('leak', message))
+
 # Create a sky with a color reminiscent of SM64's skyboxes.
 Sky(color=color.rgba(random.randint(50, 150), random.randint(50, 150), random.randint(150, 255), 255))
 
@@ -23,20 +87,10 @@ player = FirstPersonController(
     position=(0, 10, 0)  # Starting position elevated for a vast world.
 )
 player.cursor.visible = False  # Hide the cursor for immersive gameplay.
+contacts.add(player, half_extents=(0.5, 1, 0.5), offset=(0, 1, 0))  # Collider box from the feet up.
+triggers.track(player)
 player.gun = None  # No gun, staying true to Mario's character.
 
-# Create a large ground plane inspired by Bob-omb Battlefield.
-ground = Entity(
-    model='quad',
-    color=color.hex('8c5a2b'),  # Earthy color for a natural look.
-    scale=200,
-    rotation_x=90,
-    collider='box',
-    texture='white_cube',
-    shader=lit_with_shadows_shader
-)
-ground.texture_scale = (ground.scale_x / 10, ground.scale_z / 10)  # Tiled texture for retro aesthetics.
-
 # --- Power Stars ---
 # Inspired by the collectible stars in SM64.
 TOTAL_STARS = 7  # Number of stars to collect in this version.
@@ -46,148 +100,213 @@ star_entities = []  # List to hold star entities.
 class Star(Entity):
     def __init__(self, position=(0, 1, 0)):
         super().__init__(
-            model='sphere',  # Placeholder for the actual star model.
-            color=color.yellow,
+            model=lods.model('star'),
+            color=color.white,  # Colours are baked into the mesh.
             scale=0.8,
             collider='sphere',
             position=position,
             shader=lit_with_shadows_shader  # Enhanced lighting for visual appeal.
         )
+        lods.add(self)
         self.id = f"STAR_{random.randint(1000, 9999)}"  # Unique identifier for the star.
         self.collected = False
         self.rotation_speed = random.uniform(80, 120)  # Rotation speed for visual effect.
+        contacts.add(self, static=True)
         print(f"Star created at {position} with ID: {self.id}")
 
     def update(self):
         self.rotation_y += self.rotation_speed * time.dt  # Rotate the star.
-        if not self.collected and self.intersects(player).hit:
-            print(f"Player collected Star {self.id}")
-            self.collected = True
-            self.disable()  # Remove the star from the scene.
-            global stars_collected
-            stars_collected += 1
-            update_star_ui()
-            # TODO: Add sound effect for collecting a star.
+
+@contacts.on(FirstPersonController, Star)
+def collect_star(player, star):
+    global stars_collected
+    if star.collected:
+        return
+    print(f"Player collected Star {star.id}")
+    star.collected = True
+    star.disable()  # Remove the star from the scene.
+    hitches.note('disable', 'Star')
+    stars_collected += 1
+    update_star_ui()
+    sounds.play('star')
 
 # UI for Stars - Inspired by the interface in SM64.
 star_text = Text(text=f'Stars: 0/{TOTAL_STARS}', origin=(0, -18), color=color.gold, scale=2, background=True)
 
 def update_star_ui():
+    hitches.note('hud', 'stars')
     star_text.text = f'Stars: {stars_collected}/{TOTAL_STARS}'
     if stars_collected >= TOTAL_STARS:
-        Text("All stars collected! Well done!", origin=(0,0), scale=3, color=color.cyan, background=True, lifetime=10)
+        lifecycle.expire(Text("All stars collected! Well done!", origin=(0,0), scale=3, color=color.cyan, background=True), 10)
         # Here you could trigger a "game end" or "next level" event.
 
 # --- Platforms and Level Chunks ---
 # Procedurally generated platforms inspired by SM64's level design.
-num_platforms = 70  # Number of platforms to generate.
+# The layout comes from level_gen so seed_farm.py can vet the exact same seeds;
+# set SM64_SEED to replay a curated seed.
+LEVEL_SEED = int(os.environ.get('SM64_SEED', random.randrange(2 ** 31)))
+num_platforms = level_counts['num_platforms']  # Number of platforms to generate.
+num_coins = level_counts['num_coins']  # Number of coins to spawn.
+num_goombas = level_counts['num_goombas']
+num_bobombs = level_counts['num_bobombs']
+level = level_gen.load_level(LEVEL_SEED, level_gen.LevelParams(
+    num_platforms=num_platforms,
+    num_coins=num_coins,
+    total_stars=TOTAL_STARS,
+    num_goombas=num_goombas,
+    num_bobombs=num_bobombs,
+    jump_height=player.jump_height,
+    gravity=player.gravity,
+    speed=player.speed
+))
+print(f"Generating level from seed {LEVEL_SEED}.")
+placement.warn_shortfall(level.shortfall, LEVEL_SEED)
+
+# Neither the sun nor the static platforms move, so sunlight, platform shadows
+# and ambient occlusion are baked into vertex colours (cached beside the level)
+# and drawn unlit. Only moving platforms and actors use the shadowed shader.
+GROUND_SIZE = 200
+
+def bake_lighting(spec, current=None):
+    static = [record for record in spec.platforms if not record[7]]
+    if current is not None and current.matches(static):
+        return current  # no static platform changed
+    return lightbake.load_bake(static, ground_size=GROUND_SIZE)
+
+lighting = bake_lighting(level)
+
+# Create a large ground plane inspired by Bob-omb Battlefield.
+ground = Entity(
+    model=lighting.ground_mesh(),
+    color=color.hex('8c5a2b'),  # Earthy color for a natural look.
+    collider='box',
+    texture='white_cube',
+    shader=unlit_shader
+)
+ground.texture_scale = (GROUND_SIZE / 10, GROUND_SIZE / 10)  # Tiled texture for retro aesthetics.
+ground.hide(lightbake.SHADOW_CASTER_MASK)  # Its shadows are baked; keep it out of the shadow map.
+
+# Entities are created per stable level ID so a parameter tweak only rebuilds what changed.
+live = live_tweak.LiveLevel(level)
 platform_list = []
 
-# Generate platforms similar to Whomp's Fortress.
-print("Generating platforms inspired by Whomp's Fortress.")
-for i in range(num_platforms // 2):
+# Whomp's Fortress platforms are gray stone, Bob-omb Battlefield ones grassy green.
+def spawn_platform(key, record, state):
+    x, y, z, sx, sy, sz, kind, motion = record
     platform = Entity(
-        model='cube',
-        color=color.gray,  # Gray color for a stone-like appearance.
+        model='cube' if motion else lighting.platform_mesh(record),
+        color=color.gray if kind == 'whomp' else color.green,
         collider='box',
-        position=(
-            random.uniform(-80, 80),
-            random.uniform(1, 30),
-            random.uniform(-80, 80)
-        ),
-        scale=(random.uniform(5, 15), random.uniform(1, 3), random.uniform(5, 15)),
-        shader=lit_with_shadows_shader
+        position=(x, y, z),
+        scale=(sx, sy, sz),
+        shader=lit_with_shadows_shader if motion else unlit_shader
     )
-    platform_list.append(platform)
+    platform.record = record
+    platform.lighting = lighting
     # Add movement to some platforms for dynamic gameplay.
-    if random.random() < 0.2:
-        if random.random() < 0.5:
-            platform.animate_position(
-                platform.position + Vec3(random.uniform(-5, 5), 0, 0),
-                duration=random.uniform(3, 6),
-                loop=True,
-                curve=curve.in_out_sine
-            )
-        else:
-            platform.animate_position(
-                platform.position + Vec3(0, random.uniform(-3, 3), 0),
-                duration=random.uniform(3, 6),
-                loop=True,
-                curve=curve.in_out_sine
-            )
-
-# Generate platforms similar to Bob-omb Battlefield.
-print("Generating platforms inspired by Bob-omb Battlefield.")
-for i in range(num_platforms // 2):
-    platform = Entity(
-        model='cube',
-        color=color.green,  # Green color for a grassy appearance.
-        collider='box',
-        position=(
-            random.uniform(-80, 80),
-            random.uniform(1, 25),
-            random.uniform(-80, 80)
-        ),
-        scale=(random.uniform(3, 10), random.uniform(0.5, 2), random.uniform(3, 10)),
-        shader=lit_with_shadows_shader
-    )
-    platform_list.append(platform)
-
-# --- Coins ---
-num_coins = 150  # Number of coins to spawn.
-print(f"Spawning {num_coins} coins throughout the level.")
-for _ in range(num_coins):
-    # Place coins on platforms if available.
-    chosen_platform = random.choice(platform_list) if platform_list else None
-    if chosen_platform:
-        coin_pos_y = chosen_platform.y + chosen_platform.scale_y / 2 + 0.5
-        coin_pos_x = chosen_platform.x + random.uniform(-chosen_platform.scale_x / 2.1, chosen_platform.scale_x / 2.1)
-        coin_pos_z = chosen_platform.z + random.uniform(-chosen_platform.scale_z / 2.1, chosen_platform.scale_z / 2.1)
-        coin_pos = (coin_pos_x, coin_pos_y, coin_pos_z)
+    if motion:
+        dx, dy, dz, duration = motion
+        platform.animate_position(
+            platform.position + Vec3(dx, dy, dz),
+            duration=duration,
+            loop=True,
+            curve=curve.in_out_sine
+        )
     else:
-        coin_pos = (random.uniform(-78, 78), random.uniform(2, 32), random.uniform(-78, 78))
+        platform.hide(lightbake.SHADOW_CASTER_MASK)
+    return platform
+
+def relight():
+    """Swap in the current bake for static platforms and ground lit by an older one."""
+    for platform in live.ordered('platforms'):
+        if not platform.record[7] and platform.lighting is not lighting:
+            platform.model = lighting.platform_mesh(platform.record)
+            platform.lighting = lighting
+    ground.model = lighting.ground_mesh()
+
+live.register('platforms', create=spawn_platform, destroy=destroy)
 
+# --- Coins ---
+def spawn_coin(actor):
     coin = Entity(
-        model='sphere',  # Placeholder for coin model.
-        color=color.gold,
+        model=lods.model('coin'),
+        color=color.white,
         scale=0.5,
         collider='sphere',
-        position=coin_pos,
+        position=actor.position,
+        rotation_y=actor.rotation_y,
         shader=lit_with_shadows_shader
     )
+    lods.add(coin)
     coin.rotation_speed = random.uniform(50, 150)
     def update_coin_rotation(c=coin):
         c.rotation_y += c.rotation_speed * time.dt
     coin.update = update_coin_rotation
+    coin.sparkle = effects.add_emitter('sparkle', 3, follow=coin, cull_distance=30)
+    hitches.note('spawn', 'coin')
+    return coin
+
+def despawn_coin(coin):
+    hitches.note('despawn', 'coin')
+    coin.sparkle.stop()
+    lods.remove(coin)
+    destroy(coin)
+
+def save_coin(actor, coin):
+    actor.rotation_y = coin.rotation_y
+
+def add_coin(key, record, collected):
+    index = actors.add('coin', record[:3])
+    if collected:
+        actors.retire(index)
+    return index
+
+actors.register('coin', spawn=spawn_coin, despawn=despawn_coin, save=save_coin)
+# Removed coins stay behind as retired rows; the store never reuses indices.
+live.register('coins', create=add_coin, destroy=actors.retire,
+              move=lambda index, record: actors.move(index, record[:3]),
+              save=lambda index: actors.proxy(index).retired)
+coin_actors = []
 
 # --- Enemies (Goombas, Bob-ombs) ---
 # Inspired by the enemies in SM64.
+GOOMBA_DIRECTIONS = [Vec3(1, 0, 0), Vec3(-1, 0, 0), Vec3(0, 0, 1), Vec3(0, 0, -1)]
+goomba_list = []
+bobomb_list = []
 
 class Goomba(Entity):
     def __init__(self, position=(0, 1, 0)):
         super().__init__(
-            model='cube',  # Placeholder for Goomba model.
-            color=color.brown,
+            model=lods.model('goomba'),
+            color=color.white,
             collider='box',
             position=position,
             scale=(1, 1, 1),
             shader=lit_with_shadows_shader
         )
+        lods.add(self, moving=True)
         self.speed = random.uniform(1, 3)
-        self.direction = random.choice([Vec3(1, 0, 0), Vec3(-1, 0, 0), Vec3(0, 0, 1), Vec3(0, 0, -1)])
-        self.move_timer = random.uniform(2, 5)
+        self.direction = random.choice(GOOMBA_DIRECTIONS)
+        self.move_timer = timers.schedule(random.uniform(2, 5), self.change_direction)
         self.health = 1
+        goomba_list.append(self)
+        contacts.add(self)
         print(f"Goomba spawned at {position}")
 
+    def change_direction(self):
+        self.direction = random.choice(GOOMBA_DIRECTIONS)
+        timers.reschedule(self.move_timer, random.uniform(2, 5))
+
+    def defeat(self):
+        self.disable()
+        hitches.note('disable', 'Goomba')
+        self.health = 0
+        timers.cancel(self.move_timer)
+
     def update(self):
         if self.health <= 0:
             return
 
-        self.move_timer -= time.dt
-        if self.move_timer <= 0:
-            self.direction = random.choice([Vec3(1, 0, 0), Vec3(-1, 0, 0), Vec3(0, 0, 1), Vec3(0, 0, -1)])
-            self.move_timer = random.uniform(2, 5)
-
         self.position += self.direction * self.speed * time.dt
 
         # Basic boundary check
@@ -195,147 +314,339 @@ class Goomba(Entity):
             self.position -= self.direction * self.speed * time.dt
             self.direction = -self.direction
 
-        # Check for player collision
-        hit_info = self.intersects(player)
-        if hit_info.hit:
-            if player.y > self.world_y + self.scale_y * 0.7 and player.velocity.y < -0.1:
-                print("Player stomped a Goomba")
-                self.disable()
-                self.health = 0
-                # TODO: Add coin spawn or sound effect.
-            else:
-                print("Player hit by a Goomba")
-                player.position = (random.uniform(-5, 5), 10, random.uniform(-5, 5))
-                # TODO: Add damage sound effect.
+@contacts.on(FirstPersonController, Goomba)
+def touch_goomba(player, goomba):
+    # FirstPersonController has no velocity vector and its origin is at the feet,
+    # so an airborne player whose feet are in the Goomba's upper half stomps it.
+    if player.y > goomba.world_y + goomba.scale_y * 0.25 and not player.grounded:
+        print("Player stomped a Goomba")
+        goomba.defeat()
+        sounds.play('stomp')
+        # TODO: Spawn a coin.
+    else:
+        print("Player hit by a Goomba")
+        player.position = (random.uniform(-5, 5), 10, random.uniform(-5, 5))
+        sounds.play('damage')
+
+FUSE_TIME = 3
 
 class Bobomb(Entity):
     def __init__(self, position=(0, 1, 0)):
         super().__init__(
-            model='sphere',  # Placeholder for Bob-omb model.
+            model=lods.model('bobomb'),  # Baked white, so the fuse tint below shows.
             color=color.black,
             collider='sphere',
             position=position,
             scale=0.7,
             shader=lit_with_shadows_shader
         )
+        lods.add(self, moving=True)   # rewinds and level tweaks move them
         self.fuse_lit = False
-        self.fuse_time = 3
+        self.fuse = None
+        self.sparks = None
         self.explosion_radius = 5
+        # Disabled (exploded) Bob-ombs drop out of the sensor test; rewinding re-enables them.
+        self.sensor = triggers.attach(self, 4, on_enter=self.player_nearby)
+        bobomb_list.append(self)
         print(f"Bob-omb spawned at {position}")
 
+    @property
+    def fuse_time(self):
+        return timers.remaining(self.fuse) if self.fuse_lit else FUSE_TIME
+
+    def light_fuse(self, fuse_time=None):
+        if self.fuse_lit:
+            return
+        self.fuse_lit = True
+        self.fuse = timers.schedule(FUSE_TIME if fuse_time is None else fuse_time, self.explode)
+        self.sparks = effects.add_emitter('spark', 60, follow=self, offset=(0, 0.45, 0))
+
+    def put_out_fuse(self):
+        timers.cancel(self.fuse)
+        self.fuse_lit = False
+        if self.sparks:
+            self.sparks.stop()
+            self.sparks = None
+
+    def player_nearby(self, subject, volume):
+        if not self.fuse_lit:
+            print("Bob-omb fuse lit")
+            self.light_fuse()
+            sounds.play('fuse')
+
     def update(self):
         if self.disabled:
             return
 
         if self.fuse_lit:
-            self.fuse_time -= time.dt
-            # Flash redder as the fuse burns
-            self.color = color.lerp(color.black, color.rgb(255, random.randint(0, 50), 0), 1 - (self.fuse_time / 3))
-            if self.fuse_time <= 0:
-                self.explode()
-        elif not self.disabled and distance(self.world_position, player.world_position) < 4:
-            print("Bob-omb fuse lit")
-            self.fuse_lit = True
-            # TODO: Add particle effect for fuse spark.
+            # Flash redder as the fuse burns; the explosion itself is a timer.
+            self.color = color.lerp(color.black, color.rgb(255, random.randint(0, 50), 0), 1 - (self.fuse_time / FUSE_TIME))
 
     def explode(self):
         if self.disabled:
             return
         print("Bob-omb exploded")
-        # Create explosion effect
-        explosion_effect = Entity(
-            model='sphere',
-            color=color.rgba(255, 100, 0, 200),
-            scale=self.explosion_radius,
-            lifetime=0.5,
-            shader=lit_with_shadows_shader
-        )
-        explosion_effect.animate_scale(self.explosion_radius * 1.5, duration=0.5, curve=curve.out_expo)
-        explosion_effect.fade_out(duration=0.5)
+        hitches.note('explosion')
+        sounds.play('explosion')
+        if self.sparks:
+            self.sparks.stop()
+            self.sparks = None
+        effects.emit(self.world_position, 300, 'explosion')
+        effects.emit(self.world_position, 60, 'smoke')
 
         # Check if player is within explosion radius
         if distance(self.world_position, player.world_position) < self.explosion_radius:
             print("Player caught in Bob-omb blast")
             player.position = (random.uniform(-5, 5), 10, random.uniform(-5, 5))
-            # TODO: Add explosion sound effect.
+            sounds.play('damage')
 
-        # Check other entities
-        for e in scene.entities:
-            if isinstance(e, Goomba) and e.enabled and distance(self.world_position, e.world_position) < self.explosion_radius:
+        # Check other enemies; walking scene.entities would also visit every disabled entity.
+        for e in goomba_list:
+            if e.enabled and distance(self.world_position, e.world_position) < self.explosion_radius:
                 print("Goomba caught in blast")
-                e.disable()
-                e.health = 0
-            if isinstance(e, Bobomb) and e.enabled and e != self and distance(self.world_position, e.world_position) < self.explosion_radius:
+                e.defeat()
+        for e in bobomb_list:
+            if e.enabled and e != self and distance(self.world_position, e.world_position) < self.explosion_radius:
                 if not e.fuse_lit:
                     print("Another Bob-omb caught in blast, lighting its fuse")
-                    e.fuse_lit = True
+                    e.light_fuse()
 
         self.disable()
+        hitches.note('disable', 'Bob-omb')
 
 # --- Spawn Entities ---
-# Spawn stars in reachable locations.
-star_positions = []
-print("Calculating star positions.")
-for _ in range(TOTAL_STARS):
-    if platform_list:
-        p = random.choice(platform_list)
-        pos = (
-            p.x + random.uniform(-p.scale_x / 2, p.scale_x / 2),
-            p.y + p.scale_y / 2 + 1.5,
-            p.z + random.uniform(-p.scale_z / 2, p.scale_z / 2)
-        )
-        star_positions.append(pos)
-    else:
-        star_positions.append((random.uniform(-30, 30), random.uniform(5, 15), random.uniform(-30, 30)))
-
-for pos in star_positions:
-    star_entities.append(Star(position=pos))
-
+def add_star(key, record, collected):
+    star = Star(position=record[:3])
+    if collected:
+        star.collected = True
+        star.disable()
+    return star
+
+def remove_star(star):
+    contacts.remove(star)
+    lods.remove(star)
+    destroy(star)
+
+def add_goomba(key, record, health):
+    goomba = Goomba(position=record[:3])
+    if health is not None and health <= 0:
+        goomba.defeat()
+    return goomba
+
+def remove_goomba(goomba):
+    timers.cancel(goomba.move_timer)
+    contacts.remove(goomba)
+    lods.remove(goomba)
+    destroy(goomba)
+
+def add_bobomb(key, record, exploded):
+    bobomb = Bobomb(position=record[:3])
+    if exploded:
+        bobomb.disable()
+    return bobomb
+
+def remove_bobomb(bobomb):
+    bobomb.put_out_fuse()
+    triggers.remove(bobomb.sensor)
+    lods.remove(bobomb)
+    destroy(bobomb)
+
+def move_to(entity, record):
+    entity.position = record[:3]
+
+live.register('stars', create=add_star, destroy=remove_star, save=lambda star: star.collected)
+live.register('goombas', create=add_goomba, destroy=remove_goomba, move=move_to, save=lambda goomba: goomba.health)
+live.register('bobombs', create=add_bobomb, destroy=remove_bobomb, move=move_to, save=lambda bobomb: not bobomb.enabled)
+
+def relink_level():
+    """Point the spec-ordered lists (save states index them) at the live objects."""
+    global TOTAL_STARS, stars_collected
+    platform_list[:] = live.ordered('platforms')
+    coin_actors[:] = live.ordered('coins')
+    star_entities[:] = live.ordered('stars')
+    goomba_list[:] = live.ordered('goombas')
+    bobomb_list[:] = live.ordered('bobombs')
+    TOTAL_STARS = level.params.total_stars
+    stars_collected = sum(s.collected for s in star_entities)
+
+print(f"Spawning {num_coins} coins, {num_goombas} Goombas and {num_bobombs} Bob-ombs.")
+live.build()
+relink_level()
 update_star_ui()  # Initialize UI
 
-# Spawn Goombas
-num_goombas = 10
-print(f"Spawning {num_goombas} Goombas.")
-for _ in range(num_goombas):
-    if platform_list:
-        p = random.choice(platform_list)
-        pos = (
-            p.x + random.uniform(-p.scale_x / 2.1, p.scale_x / 2.1),
-            p.y + p.scale_y / 2 + 0.51,
-            p.z + random.uniform(-p.scale_z / 2.1, p.scale_z / 2.1)
-        )
-        Goomba(position=pos)
-    else:
-        Goomba(position=(random.uniform(-30, 30), 1, random.uniform(-30, 30)))
-
-# Spawn Bob-ombs
-num_bobombs = 5
-print(f"Spawning {num_bobombs} Bob-ombs.")
-for _ in range(num_bobombs):
-    if platform_list:
-        p = random.choice(platform_list)
-        pos = (
-            p.x + random.uniform(-p.scale_x / 2.1, p.scale_x / 2.1),
-            p.y + p.scale_y / 2 + 0.36,
-            p.z + random.uniform(-p.scale_z / 2.1, p.scale_z / 2.1)
-        )
-        Bobomb(position=pos)
-    else:
-        Bobomb(position=(random.uniform(-30, 30), 0.7, random.uniform(-30, 30)))
-
 # Enable FPS counter and set window title
 window.fps_counter.enabled = True
 window.title = 'SM64-Inspired Python Port'
 window.borderless = False
 
+# SM64_CAPTURE=frames records a PNG sequence (SM64_CAPTURE_PIPE='ffmpeg ...' streams raw
+# frames instead), at SM64_CAPTURE_SIZE=3840x2160 if given; F10 stops and restarts it.
+recorder = capture.from_environment(app, cameras=lambda: (app.cam, camera.ui_camera))
+if recorder:
+    recorder.start()
+
 # Enable shadows for better visuals
-sun = DirectionalLight(shadows=True)
+sun = DirectionalLight(shadows=quality['shadows'])
+sun.shadow_map_resolution = Vec2(quality['shadow_map'], quality['shadow_map'])
 sun.look_at(Vec3(1, -1, -1))
 
+# The level is built: with SM64_GC_FREEZE=1 its long-lived objects move out of
+# the collector's reach so gen-2 passes stop rescanning them every time.
+if os.environ.get('SM64_GC_FREEZE'):
+    print(f"Froze {hitch.freeze_after_load()} objects after level load.")
+
+# --- Live Tweaks ---
+# SM64_TWEAK=level_tweak.json watches that file for LevelParams overrides, e.g.
+# {"num_coins": 400, "whomp_sizes": [[3, 8], [1, 2], [3, 8]]}; saving it
+# regenerates the spec and adds, removes or moves only the items that changed.
+base_params = level.params
+tweak_watcher = live_tweak.ConfigWatcher(os.environ['SM64_TWEAK']) if os.environ.get('SM64_TWEAK') else None
+
+def retweak(overrides):
+    global level, lighting
+    start = time.perf_counter()
+    try:
+        params = live_tweak.tweaked_params(base_params, overrides)
+    except (TypeError, ValueError) as e:
+        print(f"Ignoring level tweak: {e}")
+        return
+    level = level_gen.generate_level(LEVEL_SEED, params)
+    placement.warn_shortfall(level.shortfall, LEVEL_SEED)
+    previous = lighting
+    lighting = bake_lighting(level, previous)
+    diff = live.apply(level)
+    if lighting is not previous:
+        relight()  # a moved platform changes the shadows and occlusion around it
+    relink_level()
+    update_star_ui()
+    rewind_buffer.clear()  # recorded frames index the old lists
+    hitches.note('tweak', diff.summary())
+    print(f"Level tweak applied in {(time.perf_counter() - start) * 1000:.1f} ms: {diff.summary()}")
+
+# --- Save States and Rewind ---
+SAVE_PATH = 'pcport4k.sav'
+save_io = savestate.SaveIO()
+rewind_buffer = savestate.RewindBuffer(max_bytes=8 * 1024 * 1024)
+frame_number = 0
+
+def capture_world():
+    flags = savestate.FLAG_GROUNDED if player.grounded else 0
+    player_state = (
+        player.x, player.y, player.z, 0, 0, 0,
+        player.rotation_y, player.camera_pivot.rotation_x, player.air_time,
+        0, 0, stars_collected, 0, flags, 0
+    )
+    goombas = [
+        (g.x, g.y, g.z, GOOMBA_DIRECTIONS.index(g.direction) if g.direction in GOOMBA_DIRECTIONS else 0,
+         g.health, timers.remaining(g.move_timer))
+        for g in goomba_list
+    ]
+    bobombs = [
+        (b.x, b.y, b.z, (savestate.FUSE_LIT if b.fuse_lit else 0) | (savestate.EXPLODED if not b.enabled else 0),
+         b.fuse_time)
+        for b in bobomb_list
+    ]
+    return savestate.WorldState(
+        frame_number,
+        player_state,
+        [actors.proxy(i).retired for i in coin_actors],
+        [s.collected for s in star_entities],
+        goombas,
+        bobombs
+    )
+
+def apply_world(state):
+    global stars_collected
+    x, y, z, _, _, _, yaw, pitch, air_time = state.player[:9]
+    player.position = (x, y, z)
+    player.rotation_y = yaw
+    player.camera_pivot.rotation_x = pitch
+    player.air_time = air_time
+    stars_collected = state.player[11]
+    for i, collected in zip(coin_actors, state.coins_collected):
+        if collected:
+            actors.retire(i)
+        else:
+            actors.restore(i)
+    for s, collected in zip(star_entities, state.stars_collected):
+        s.collected = collected
+        s.enabled = not collected
+    for g, (gx, gy, gz, direction, health, move_timer) in zip(goomba_list, state.goombas):
+        g.position = (gx, gy, gz)
+        g.direction = GOOMBA_DIRECTIONS[direction]
+        g.health = health
+        g.enabled = health > 0
+        if health > 0:
+            timers.reschedule(g.move_timer, move_timer)
+        else:
+            timers.cancel(g.move_timer)
+    for b, (bx, by, bz, flags, fuse_time) in zip(bobomb_list, state.bobombs):
+        b.position = (bx, by, bz)
+        b.enabled = not flags & savestate.EXPLODED
+        b.put_out_fuse()
+        if flags & savestate.FUSE_LIT and b.enabled:
+            b.light_fuse(fuse_time)
+        else:
+            b.color = color.black
+    update_star_ui()
+
+def on_state_loaded(state, error):
+    if error:
+        print(f"Could not load save: {error}")
+        return
+    apply_world(state)
+    rewind_buffer.clear()
+    print(f"Loaded save from frame {state.frame}")
+
+def update():
+    global frame_number
+    hitches.frame()
+    spawns.frame(time.dt)
+    frame_number += 1
+    effects.step(time.dt, camera.world_position)
+    effect_renderer.upload(camera.right, camera.up)
+    lods.update(camera.world_position, camera.fov, window.size[1])
+    save_io.poll()
+    if held_keys['backspace']:
+        # Hold backspace to rewind, one recorded frame per rendered frame.
+        if len(rewind_buffer) > 1:
+            apply_world(savestate.unpack(rewind_buffer.rewind(1)))
+        return
+    if tweak_watcher:
+        overrides = tweak_watcher.poll()
+        if overrides is not None:
+            retweak(overrides)
+    timers.advance(time.dt)
+    lifecycle.step(time.dt)
+    actors.update(player.position, ACTIVE_RADIUS, max_spawns=spawns.allowance())
+    contacts.step()
+    triggers.step()
+    rewind_buffer.push(savestate.pack(capture_world()))
+
 # Input handling
 def input(key):
     if key == 'escape':
+        if recorder and recorder.recording:
+            print(f"Capture stopped: {recorder.stop()}")
         application.quit()
+    if key == 'f5':
+        save_io.save(SAVE_PATH, savestate.pack(capture_world()), lambda path, error: print(f"Saved to {path}" if not error else f"Save failed: {error}"))
+    if key == 'f9':
+        save_io.load(SAVE_PATH, on_state_loaded)
+    if key == 'f8':
+        hitches.dump()
+        print(f"Hitches: {hitches.summary()}")
+        print(f"Spawns: {spawns.summary()}")
+        print(f"Detail: {lods.summary()}")
+        lifecycle.census()
+        print(f"Entities: {lifecycle.summary()}\n{lifecycle.report()}")
+        if recorder:
+            print(f"Capture: {recorder.summary()}")
+    if key == 'f10' and recorder:
+        if recorder.recording:
+            print(f"Capture stopped: {recorder.stop()}")
+        else:
+            recorder.start()
 
 # Run the game
 print("Starting the game. Enjoy!")
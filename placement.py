@@ -0,0 +1,114 @@
+# placement.py - Non-overlapping platform layout with density zones.
+# Dart throwing in the style of Poisson-disk sampling: every candidate box is
+# tested only against boxes already filed in the neighbouring cells of a
+# background XZ grid, so placing N platforms costs roughly O(N) instead of
+# comparing every pair. Boxes keep a minimum gap on every axis, and moving
+# platforms reserve their whole sweep so they never slide into a neighbour.
+
+import math
+import random
+import sys
+
+
+class Zone:
+    """A region of the level with its own platform count, sizes and spacing.
+
+    bounds: (min_x, min_z, max_x, max_z) for platform centers.
+    size_x, size_y, size_z, y_range: (low, high) ranges sampled uniformly.
+    motion: optional callable rng -> (dx, dy, dz, duration) or None, whose
+            offsets never exceed max_motion on any axis.
+    """
+
+    def __init__(self, name, bounds, count, y_range, size_x, size_y, size_z, min_gap=1.0, motion=None,
+                 max_motion=0.0):
+        self.name = name
+        self.bounds = bounds
+        self.count = count
+        self.y_range = y_range
+        self.size_x = size_x
+        self.size_y = size_y
+        self.size_z = size_z
+        self.min_gap = min_gap
+        self.motion = motion
+        self.max_motion = max_motion
+
+    def max_half_extent(self):
+        return (max(self.size_x[1], self.size_z[1]) + self.max_motion) / 2
+
+
+class Layout:
+    """Boxes placed so far, filed in a uniform XZ grid."""
+
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.boxes = []   # (x, y, z, sx, sy, sz, zone_name, motion)
+
+    def _cell(self, x, z):
+        return math.floor(x / self.cell_size), math.floor(z / self.cell_size)
+
+    def fits(self, x, y, z, hx, hy, hz, gap):
+        cx, cz = self._cell(x, z)
+        cells = self.cells
+        for ix in (cx - 1, cx, cx + 1):
+            for iz in (cz - 1, cz, cz + 1):
+                for bx, by, bz, bhx, bhy, bhz, bgap in cells.get((ix, iz), ()):
+                    g = gap if gap > bgap else bgap
+                    if abs(x - bx) < hx + bhx + g and abs(y - by) < hy + bhy + g and abs(z - bz) < hz + bhz + g:
+                        return False
+        return True
+
+    def add(self, x, y, z, hx, hy, hz, gap, box):
+        self.cells.setdefault(self._cell(x, z), []).append((x, y, z, hx, hy, hz, gap))
+        self.boxes.append(box)
+
+
+def _swept(x, y, z, sx, sy, sz, motion):
+    # Half extents and center of the box covering the platform's whole path.
+    dx, dy, dz = motion[:3] if motion else (0, 0, 0)
+    return (x + dx / 2, y + dy / 2, z + dz / 2,
+            (sx + abs(dx)) / 2, (sy + abs(dy)) / 2, (sz + abs(dz)) / 2)
+
+
+def place_platforms(zones, seed, attempts=30):
+    """Place each zone's platforms without overlaps; deterministic for `seed`.
+
+    Returns (boxes, shortfall) where boxes are (x, y, z, sx, sy, sz, zone_name,
+    motion) in zone order and shortfall maps zone names to how many platforms
+    could not be fitted after `attempts` darts each.
+    """
+    if not zones:
+        return [], {}
+    # Any two boxes that can touch have centers within one cell of each other. A pair can mix
+    # zones, so size cells for the two largest boxes anywhere and the largest gap between them.
+    cell_size = 2 * max(z.max_half_extent() for z in zones) + max(z.min_gap for z in zones)
+    layout = Layout(cell_size)
+    shortfall = {}
+    for zone in zones:
+        rng = random.Random(f'{seed}:{zone.name}')
+        min_x, min_z, max_x, max_z = zone.bounds
+        placed = 0
+        for _ in range(zone.count):
+            for _ in range(attempts):
+                x = rng.uniform(min_x, max_x)
+                y = rng.uniform(*zone.y_range)
+                z = rng.uniform(min_z, max_z)
+                sx = rng.uniform(*zone.size_x)
+                sy = rng.uniform(*zone.size_y)
+                sz = rng.uniform(*zone.size_z)
+                motion = zone.motion(rng) if zone.motion else None
+                cx, cy, cz, hx, hy, hz = _swept(x, y, z, sx, sy, sz, motion)
+                if layout.fits(cx, cy, cz, hx, hy, hz, zone.min_gap):
+                    layout.add(cx, cy, cz, hx, hy, hz, zone.min_gap, (x, y, z, sx, sy, sz, zone.name, motion))
+                    placed += 1
+                    break
+        if placed < zone.count:
+            shortfall[zone.name] = zone.count - placed
+    return layout.boxes, shortfall
+
+
+def warn_shortfall(shortfall, seed):
+    """Report on stderr which zones of place_platforms() came up short, if any."""
+    if shortfall:
+        missing = ', '.join(f"{name} {count}" for name, count in shortfall.items())
+        print(f"Platform placement for seed {seed!r} came up short ({missing} platforms did not fit).", file=sys.stderr)
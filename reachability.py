@@ -0,0 +1,170 @@
+# reachability.py - Vectorized platform reachability graph.
+# Pairwise jump edges are evaluated with NumPy broadcasting, but only for
+# platforms in neighbouring cells of a coarse XZ grid, so the cost scales with
+# the number of nearby pairs rather than N^2. The graph is walked once from
+# the spawn point and the result travels with the LevelSpec.
+
+import math
+
+import numpy as np
+
+# --- Player Jump Model ---
+# Mirrors Ursina's FirstPersonController: a jump animates y up by jump_height
+# over jump_up_duration, then the fall accelerates with air_time, which grows
+# by 0.25 * gravity per second and moves the player 100 * air_time units per
+# second, i.e. a drop of 12.5 * gravity * t^2 after t seconds.
+JUMP_UP_DURATION = 0.5
+FALL_RATE = 12.5
+
+
+def jump_reach(dy, params):
+    """Horizontal distance coverable by a jump that lands `dy` above take-off, or -1."""
+    if dy > params.jump_height:
+        return -1.0
+    fall_time = math.sqrt((params.jump_height - dy) / (FALL_RATE * params.gravity))
+    return params.speed * (JUMP_UP_DURATION + fall_time)
+
+
+def ground_box(params):
+    return (0.0, -0.5, 0.0, params.ground_size, 1.0, params.ground_size)
+
+
+def spawn_box_index(boxes, params):
+    """Index of the box the player lands on when dropped from the spawn point."""
+    sx, sy, sz = params.spawn
+    best, best_top = 0, -math.inf
+    for i, (x, y, z, w, h, d) in enumerate(boxes):
+        top = y + h / 2
+        if abs(sx - x) <= w / 2 and abs(sz - z) <= d / 2 and best_top < top <= sy:
+            best, best_top = i, top
+    return best
+
+
+# --- Graph ---
+
+class ReachabilityGraph:
+    """Directed jump graph over platform boxes in CSR form.
+
+    Node 0 is the ground; node i + 1 is platform i. `reachable` is indexed by
+    platform (ground excluded): True where a chain of jumps from the box the
+    player spawns on reaches it.
+    """
+
+    def __init__(self, indptr, indices, reachable, spawn_node):
+        self.indptr = indptr
+        self.indices = indices
+        self.reachable = reachable
+        self.spawn_node = spawn_node
+
+    @property
+    def edge_count(self):
+        return len(self.indices)
+
+    def neighbors(self, node):
+        return self.indices[self.indptr[node]:self.indptr[node + 1]]
+
+    def reachable_indices(self):
+        return np.flatnonzero(self.reachable)
+
+
+def _max_reach(tops, params):
+    # The longest jump is the deepest drop; everything else reaches less far.
+    deepest = float(tops.max() - min(tops.min(), 0.0)) if len(tops) else 0.0
+    return jump_reach(-deepest, params)
+
+
+def _candidate_pairs(boxes, cell_size):
+    """All (i, j) with i < j whose XZ grid cells are adjacent, without Python loops per pair."""
+    n = len(boxes)
+    cx = np.floor(boxes[:, 0] / cell_size).astype(np.int64)
+    cz = np.floor(boxes[:, 2] / cell_size).astype(np.int64)
+    cx -= cx.min()
+    cz -= cz.min()
+    width = int(cz.max()) + 3
+    keys = (cx + 1) * width + (cz + 1)
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+
+    pairs_i, pairs_j = [], []
+    for dx in (-1, 0, 1):
+        for dz in (-1, 0, 1):
+            target = keys + dx * width + dz
+            lo = np.searchsorted(sorted_keys, target, side='left')
+            hi = np.searchsorted(sorted_keys, target, side='right')
+            counts = hi - lo
+            total = int(counts.sum())
+            if not total:
+                continue
+            # Expand each [lo, hi) range into explicit partner indices.
+            src = np.repeat(np.arange(n), counts)
+            starts = np.repeat(lo - np.cumsum(counts) + counts, counts)
+            dst = order[np.arange(total) + starts]
+            keep = src < dst
+            pairs_i.append(src[keep])
+            pairs_j.append(dst[keep])
+    if not pairs_i:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty
+    return np.concatenate(pairs_i), np.concatenate(pairs_j)
+
+
+def _jump_edges(boxes, tops, src, dst, params):
+    """Boolean mask of src -> dst jumps that are possible, evaluated in one pass."""
+    dy = tops[dst] - tops[src]
+    gx = np.maximum(0.0, np.abs(boxes[src, 0] - boxes[dst, 0]) - (boxes[src, 3] + boxes[dst, 3]) / 2)
+    gz = np.maximum(0.0, np.abs(boxes[src, 2] - boxes[dst, 2]) - (boxes[src, 5] + boxes[dst, 5]) / 2)
+    gap = np.hypot(gx, gz)
+    airtime = np.sqrt(np.maximum(params.jump_height - dy, 0.0) / (FALL_RATE * params.gravity))
+    reach = params.speed * (JUMP_UP_DURATION + airtime)
+    return (dy <= params.jump_height) & (gap <= reach)
+
+
+def build_graph(boxes, params):
+    """Compute the jump graph for `boxes` and traverse it once from spawn."""
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 6)
+    n = len(boxes)
+    tops = boxes[:, 1] + boxes[:, 4] / 2
+
+    if n:
+        cell_size = max(_max_reach(tops, params) + float(boxes[:, [3, 5]].max()), 1.0)
+        i, j = _candidate_pairs(boxes, cell_size)
+        forward = _jump_edges(boxes, tops, i, j, params)
+        backward = _jump_edges(boxes, tops, j, i, params)
+        src = np.concatenate([i[forward], j[backward]]) + 1
+        dst = np.concatenate([j[forward], i[backward]]) + 1
+    else:
+        src = dst = np.empty(0, dtype=np.int64)
+
+    # The ground lies under everything: any platform can drop to it and it
+    # reaches every platform low enough to jump onto.
+    platform_nodes = np.arange(1, n + 1)
+    low = platform_nodes[tops <= params.jump_height]
+    src = np.concatenate([src, platform_nodes, np.zeros(len(low), dtype=np.int64)])
+    dst = np.concatenate([dst, np.zeros(n, dtype=np.int64), low])
+
+    order = np.argsort(src, kind='stable')
+    indices = dst[order]
+    indptr = np.zeros(n + 2, dtype=np.int64)
+    np.add.at(indptr, src + 1, 1)
+    indptr = np.cumsum(indptr)
+
+    all_boxes = [ground_box(params)] + [tuple(b) for b in boxes]
+    spawn_node = spawn_box_index(all_boxes, params)
+
+    # Frontier-at-a-time BFS: each level gathers all neighbour ranges at once.
+    seen = np.zeros(n + 1, dtype=bool)
+    frontier = np.unique(np.array([spawn_node, 0]))
+    seen[frontier] = True
+    while len(frontier):
+        starts = indptr[frontier]
+        counts = indptr[frontier + 1] - starts
+        total = int(counts.sum())
+        if not total:
+            break
+        offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        nxt = indices[np.repeat(starts, counts) + offsets]
+        nxt = np.unique(nxt[~seen[nxt]])
+        seen[nxt] = True
+        frontier = nxt
+
+    return ReachabilityGraph(indptr, indices, seen[1:], spawn_node)
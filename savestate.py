@@ -0,0 +1,242 @@
+# savestate.py - Compact binary save states and a rewind ring buffer.
+# World state is packed into fixed-layout little-endian records so a save is
+# a handful of struct calls, and consecutive snapshots XOR down to mostly
+# zero bytes, which zlib squeezes to almost nothing for the rewind buffer.
+
+import os
+import queue
+import struct
+import threading
+import zlib
+from collections import deque
+
+MAGIC = b'SM64'
+VERSION = 1
+
+# --- Record Layouts ---
+# Header: magic, version, frame, coin count, star count, goomba count, bob-omb count.
+HEADER = struct.Struct('<4sHIHHHH')
+# Player: position, velocity, yaw, camera pitch, air time, health, coins,
+# stars collected, red coins, flags (bit 0 can_fly, bit 1 swimming, bit 2 grounded),
+# wing cap time remaining.
+PLAYER = struct.Struct('<3f3f3fhHHHBf')
+# Goomba: position, direction index, health, move timer.
+GOOMBA = struct.Struct('<3fBbf')
+# Bob-omb: position, flags (bit 0 fuse lit, bit 1 exploded), fuse time.
+BOBOMB = struct.Struct('<3fBf')
+
+FLAG_CAN_FLY = 1
+FLAG_SWIMMING = 2
+FLAG_GROUNDED = 4
+FUSE_LIT = 1
+EXPLODED = 2
+
+
+class WorldState:
+    """Plain snapshot of everything a save needs; no Ursina objects inside."""
+
+    __slots__ = ('frame', 'player', 'coins_collected', 'stars_collected', 'goombas', 'bobombs')
+
+    def __init__(self, frame=0, player=None, coins_collected=(), stars_collected=(), goombas=(), bobombs=()):
+        self.frame = frame
+        # (x, y, z, vx, vy, vz, yaw, pitch, air_time, health, coins, stars, red_coins, flags, wing_cap_time)
+        self.player = player or (0.0,) * 9 + (0, 0, 0, 0, 0, 0.0)
+        self.coins_collected = list(coins_collected)
+        self.stars_collected = list(stars_collected)
+        self.goombas = list(goombas)    # (x, y, z, direction_index, health, move_timer)
+        self.bobombs = list(bobombs)    # (x, y, z, flags, fuse_time)
+
+    def __eq__(self, other):
+        return isinstance(other, WorldState) and pack(self) == pack(other)
+
+
+def _pack_bits(flags):
+    bits = 0
+    for i, flag in enumerate(flags):
+        if flag:
+            bits |= 1 << i
+    return bits.to_bytes((len(flags) + 7) // 8, 'little')
+
+
+def _unpack_bits(data, count):
+    bits = int.from_bytes(data, 'little')
+    return [bool(bits >> i & 1) for i in range(count)]
+
+
+def pack(state):
+    """Serialize a WorldState into its fixed-layout binary record."""
+    parts = [
+        HEADER.pack(MAGIC, VERSION, state.frame, len(state.coins_collected), len(state.stars_collected),
+                    len(state.goombas), len(state.bobombs)),
+        PLAYER.pack(*state.player),
+        _pack_bits(state.coins_collected),
+        _pack_bits(state.stars_collected),
+    ]
+    parts.extend(GOOMBA.pack(*g) for g in state.goombas)
+    parts.extend(BOBOMB.pack(*b) for b in state.bobombs)
+    return b''.join(parts)
+
+
+def unpack(data):
+    """Inverse of pack(); raises ValueError on a foreign or truncated record."""
+    if len(data) < HEADER.size + PLAYER.size:
+        raise ValueError('save state is truncated')
+    magic, version, frame, n_coins, n_stars, n_goombas, n_bobombs = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f'unsupported save state {magic!r} v{version}')
+    offset = HEADER.size
+    player = PLAYER.unpack_from(data, offset)
+    offset += PLAYER.size
+    coin_bytes = (n_coins + 7) // 8
+    star_bytes = (n_stars + 7) // 8
+    coins = _unpack_bits(data[offset:offset + coin_bytes], n_coins)
+    offset += coin_bytes
+    stars = _unpack_bits(data[offset:offset + star_bytes], n_stars)
+    offset += star_bytes
+    goomba_end = offset + GOOMBA.size * n_goombas
+    bobomb_end = goomba_end + BOBOMB.size * n_bobombs
+    if len(data) != bobomb_end:
+        raise ValueError('save state length does not match its header')
+    goombas = list(GOOMBA.iter_unpack(data[offset:goomba_end]))
+    bobombs = list(BOBOMB.iter_unpack(data[goomba_end:bobomb_end]))
+    return WorldState(frame, player, coins, stars, goombas, bobombs)
+
+
+# --- Background File I/O ---
+
+class SaveIO:
+    """Runs save/load file I/O on a daemon thread.
+
+    Loads finish on the worker but their callbacks are only run from poll(),
+    so Ursina entities are never touched off the main thread.
+    """
+
+    def __init__(self):
+        self._jobs = queue.Queue()
+        self._done = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='save-io', daemon=True)
+        self._thread.start()
+
+    def save(self, path, data, callback=None):
+        self._jobs.put(('save', path, bytes(data), callback))
+
+    def load(self, path, callback):
+        self._jobs.put(('load', path, None, callback))
+
+    def poll(self):
+        """Deliver finished jobs on the calling thread; call once per frame."""
+        while True:
+            try:
+                callback, result, error = self._done.get_nowait()
+            except queue.Empty:
+                return
+            if callback:
+                callback(result, error)
+
+    def flush(self):
+        """Block until every queued job has been written or read."""
+        self._jobs.join()
+
+    def _run(self):
+        while True:
+            kind, path, data, callback = self._jobs.get()
+            result = error = None
+            try:
+                if kind == 'save':
+                    tmp_path = path + '.tmp'
+                    with open(tmp_path, 'wb') as f:
+                        f.write(data)
+                    os.replace(tmp_path, path)
+                    result = path
+                else:
+                    with open(path, 'rb') as f:
+                        result = unpack(f.read())
+            except (OSError, ValueError) as e:
+                error = e
+            self._done.put((callback, result, error))
+            self._jobs.task_done()
+
+
+# --- Rewind Ring Buffer ---
+
+def _xor(a, b):
+    return (int.from_bytes(a, 'little') ^ int.from_bytes(b, 'little')).to_bytes(len(a), 'little')
+
+
+class RewindBuffer:
+    """Bounded history of packed snapshots for rewind and desync debugging.
+
+    Every `keyframe_interval`-th entry is stored whole; the rest are XOR deltas
+    against the previous snapshot. All entries are zlib-compressed. When the
+    buffer exceeds `max_bytes` the oldest entries are evicted, promoting the
+    next delta to a keyframe so history stays decodable.
+    """
+
+    def __init__(self, max_bytes=4 * 1024 * 1024, keyframe_interval=60):
+        self.max_bytes = max_bytes
+        self.keyframe_interval = keyframe_interval
+        self._entries = deque()   # (is_keyframe, compressed)
+        self._last = None
+        self._since_keyframe = 0
+        self.size_bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def push(self, data):
+        data = bytes(data)
+        # A change in entity counts changes the record length; start a new keyframe.
+        keyframe = (self._last is None or len(data) != len(self._last)
+                    or self._since_keyframe >= self.keyframe_interval)
+        payload = data if keyframe else _xor(data, self._last)
+        compressed = zlib.compress(payload, 1)
+        self._entries.append((keyframe, compressed))
+        self.size_bytes += len(compressed)
+        self._since_keyframe = 1 if keyframe else self._since_keyframe + 1
+        self._last = data
+        while self.size_bytes > self.max_bytes and len(self._entries) > 1:
+            self._evict_oldest()
+
+    def _evict_oldest(self):
+        _, oldest = self._entries.popleft()
+        self.size_bytes -= len(oldest)
+        next_keyframe, next_payload = self._entries[0]
+        if not next_keyframe:
+            full = _xor(zlib.decompress(next_payload), zlib.decompress(oldest))
+            promoted = zlib.compress(full, 1)
+            self.size_bytes += len(promoted) - len(next_payload)
+            self._entries[0] = (True, promoted)
+
+    def get(self, steps_back=0):
+        """Return the packed snapshot `steps_back` entries before the newest."""
+        if not 0 <= steps_back < len(self._entries):
+            raise IndexError('rewind past the start of the buffer')
+        target = len(self._entries) - 1 - steps_back
+        start = target
+        while not self._entries[start][0]:
+            start -= 1
+        data = zlib.decompress(self._entries[start][1])
+        for i in range(start + 1, target + 1):
+            data = _xor(data, zlib.decompress(self._entries[i][1]))
+        return data
+
+    def rewind(self, steps_back):
+        """Drop the newest `steps_back` snapshots and return the one now on top."""
+        steps_back = min(steps_back, len(self._entries) - 1)
+        data = self.get(steps_back)
+        for _ in range(steps_back):
+            _, payload = self._entries.pop()
+            self.size_bytes -= len(payload)
+        self._last = data
+        self._since_keyframe = 0
+        for keyframe, _ in reversed(self._entries):
+            self._since_keyframe += 1
+            if keyframe:
+                break
+        return data
+
+    def clear(self):
+        self._entries.clear()
+        self._last = None
+        self._since_keyframe = 0
+        self.size_bytes = 0
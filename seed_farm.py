@@ -0,0 +1,150 @@
+# seed_farm.py - Generate and score pcport4k levels across many processes.
+# No entities are created: each worker runs level_gen on plain tuples and
+# reports star reachability, coin density, platform overlap and enemy density.
+#
+# Usage:
+#   python seed_farm.py --count 100000 --out seeds.csv --curated curated_seeds.txt
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import level_gen
+
+FIELDS = [
+    'seed', 'all_stars_reachable', 'stars_reachable', 'stars_on_ground', 'reachable_platforms', 'coin_density',
+    'coins_reachable', 'overlapping_pairs', 'overlap_ratio', 'enemy_density', 'score'
+]
+
+
+def analyze_level(spec):
+    """Score one LevelSpec; returns a dict keyed by FIELDS."""
+    boxes = spec.boxes()
+    reachable = spec.reachable
+    # Ground stars are reachable but are not platforming goals; count them apart.
+    stars_on_ground = sum(1 for s in spec.stars if s[3] < 0)
+    stars_reachable = sum(1 for s in spec.stars if s[3] >= 0 and reachable[s[3]])
+    coins_reachable = sum(1 for c in spec.coins if c[3] < 0 or reachable[c[3]])
+
+    overlapping = 0
+    for i in range(len(boxes)):
+        for j in range(i + 1, len(boxes)):
+            if level_gen.boxes_overlap(boxes[i], boxes[j]):
+                overlapping += 1
+    pairs = len(boxes) * (len(boxes) - 1) // 2
+
+    top_area = sum(b[3] * b[5] for b in boxes) or 1.0
+    enemies = len(spec.goombas) + len(spec.bobombs)
+    reachable_count = int(reachable.sum())
+    all_reachable = stars_reachable + stars_on_ground == len(spec.stars)
+    coin_density = len(spec.coins) / top_area * 100   # coins per 100 square units of platform top
+    enemy_density = enemies / max(1, reachable_count)
+    # Prefer fully reachable levels with stars up on platforms, many reachable coins
+    # and little hidden geometry. Ground stars earn nothing.
+    score = (
+        (100.0 if all_reachable else 0.0)
+        + 10.0 * stars_reachable
+        + 20.0 * coins_reachable / max(1, len(spec.coins))
+        - 2.0 * overlapping
+        - 5.0 * abs(enemy_density - 0.3)
+    )
+    return {
+        'seed': spec.seed,
+        'all_stars_reachable': int(all_reachable),
+        'stars_reachable': stars_reachable,
+        'stars_on_ground': stars_on_ground,
+        'reachable_platforms': reachable_count,
+        'coin_density': round(coin_density, 4),
+        'coins_reachable': coins_reachable,
+        'overlapping_pairs': overlapping,
+        'overlap_ratio': round(overlapping / max(1, pairs), 6),
+        'enemy_density': round(enemy_density, 4),
+        'score': round(score, 3),
+    }
+
+
+def analyze_seed(seed, params=None):
+    return analyze_level(level_gen.generate_level(seed, params))
+
+
+def _analyze_chunk(args):
+    # Workers get a whole range so per-task pickling stays negligible.
+    start, stop, params = args
+    return [analyze_seed(seed, params) for seed in range(start, stop)]
+
+
+class _Writer:
+    def __init__(self, path, fmt):
+        self.fmt = fmt
+        self.file = open(path, 'w', newline='') if path != '-' else sys.stdout
+        if fmt == 'csv':
+            self.csv = csv.DictWriter(self.file, fieldnames=FIELDS)
+            self.csv.writeheader()
+
+    def write(self, row):
+        if self.fmt == 'csv':
+            self.csv.writerow(row)
+        else:
+            self.file.write(json.dumps(row) + '\n')
+
+    def close(self):
+        if self.file is not sys.stdout:
+            self.file.close()
+
+
+def farm(start, count, params=None, workers=None, chunk=256):
+    """Yield analysis rows for seeds [start, start + count) in seed order."""
+    chunks = [(s, min(s + chunk, start + count), params) for s in range(start, start + count, chunk)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for rows in pool.map(_analyze_chunk, chunks):
+            yield from rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Vet pcport4k level seeds in parallel.')
+    parser.add_argument('--start', type=int, default=0)
+    parser.add_argument('--count', type=int, default=10000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--chunk', type=int, default=256, help='seeds per worker task')
+    parser.add_argument('--out', default='seeds.csv', help="results file, '-' for stdout")
+    parser.add_argument('--format', choices=('csv', 'jsonl'), default='csv')
+    parser.add_argument('--curated', help='write the best fully reachable seeds here, one per line')
+    parser.add_argument('--top', type=int, default=100)
+    parser.add_argument('--max-overlap', type=int, default=0, help='curated seeds may have at most this many overlapping pairs')
+    parser.add_argument('--min-reachable-platforms', type=int, default=3,
+                        help='curated seeds need at least this many platforms reachable from spawn')
+    args = parser.parse_args(argv)
+
+    writer = _Writer(args.out, args.format)
+    best = []
+    began = time.perf_counter()
+    analyzed = passed = 0
+    try:
+        for row in farm(args.start, args.count, workers=args.workers, chunk=args.chunk):
+            writer.write(row)
+            analyzed += 1
+            if (row['all_stars_reachable'] and row['overlapping_pairs'] <= args.max_overlap
+                    and row['reachable_platforms'] >= args.min_reachable_platforms):
+                passed += 1
+                best.append((row['score'], row['seed']))
+                if len(best) > args.top * 4:
+                    best = sorted(best, reverse=True)[:args.top]
+    finally:
+        writer.close()
+    elapsed = time.perf_counter() - began
+
+    if args.curated:
+        with open(args.curated, 'w') as f:
+            for score, seed in sorted(best, reverse=True)[:args.top]:
+                f.write(f'{seed}\n')
+    print(f'{analyzed} seeds in {elapsed:.1f}s ({analyzed / max(elapsed, 1e-9):.0f}/s), '
+          f'{passed} fully reachable with <= {args.max_overlap} overlaps and '
+          f'>= {args.min_reachable_platforms} reachable platforms', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
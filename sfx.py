@@ -0,0 +1,245 @@
+# sfx.py - Synthesized sound effects played through a fixed voice pool.
+# The coin, star, stomp, damage, fuse and explosion sounds are generated with
+# NumPy once, written to a WAV cache and preloaded, so no event ever touches
+# the disk. A pool of N voices plays them: each sound has a priority, a cap on
+# simultaneous copies and a minimum interval, so a chain of Bob-omb blasts
+# steals or drops voices instead of stacking dozens of explosions.
+
+import os
+import time
+import wave
+
+import numpy as np
+
+RATE = 22050
+SYNTH_VERSION = 1   # bump when a synth changes so stale cache files are replaced
+
+
+# --- Synthesis ---
+
+def _t(seconds, rate):
+    return np.arange(int(seconds * rate), dtype=np.float32) / rate
+
+
+def _square(freq, t, softness=0.3):
+    # A rounded square wave: the NES/N64 beep without the harshest aliasing.
+    return np.tanh(np.sin(2 * np.pi * freq * t) / softness)
+
+
+def _envelope(t, attack=0.005, decay=0.2):
+    return np.minimum(t / attack, 1.0) * np.exp(-t / decay)
+
+
+def _lowpass(signal, width):
+    kernel = np.ones(width, np.float32) / width
+    return np.convolve(signal, kernel, mode='same')
+
+
+def synth_coin(rate=RATE):
+    a, b = _t(0.07, rate), _t(0.4, rate)
+    return np.concatenate((_square(988, a) * 0.6, _square(1319, b) * _envelope(b, decay=0.12)))
+
+
+def synth_star(rate=RATE):
+    notes = [1047, 1319, 1568, 2093]
+    parts = []
+    for i, freq in enumerate(notes):
+        t = _t(0.09 if i < len(notes) - 1 else 0.8, rate)
+        shimmer = 1 + 0.004 * np.sin(2 * np.pi * 6 * t)
+        parts.append((np.sin(2 * np.pi * freq * shimmer * t) + 0.3 * np.sin(4 * np.pi * freq * t)) * _envelope(t, decay=0.3))
+    return np.concatenate(parts) * 0.6
+
+
+def synth_stomp(rate=RATE):
+    t = _t(0.16, rate)
+    freq = 420 * np.exp(-t * 18) + 70
+    phase = 2 * np.pi * np.cumsum(freq) / rate
+    noise = np.random.default_rng(1).uniform(-1, 1, len(t)).astype(np.float32)
+    return (np.sin(phase) * 0.8 + _lowpass(noise, 8) * 0.4) * _envelope(t, decay=0.06)
+
+
+def synth_damage(rate=RATE):
+    t = _t(0.45, rate)
+    freq = 640 - 900 * t + 30 * np.sin(2 * np.pi * 14 * t)
+    phase = 2 * np.pi * np.cumsum(freq) / rate
+    return np.tanh(np.sin(phase) / 0.4) * _envelope(t, decay=0.25) * 0.5
+
+
+def synth_fuse(rate=RATE):
+    t = _t(0.3, rate)
+    rng = np.random.default_rng(2)
+    crackle = rng.uniform(-1, 1, len(t)).astype(np.float32) * (rng.random(len(t)) < 0.08)
+    hiss = _lowpass(rng.uniform(-1, 1, len(t)).astype(np.float32), 3) * 0.25
+    return (crackle * 0.7 + hiss) * _envelope(t, decay=0.15)
+
+
+def synth_explosion(rate=RATE):
+    t = _t(1.3, rate)
+    noise = np.random.default_rng(3).uniform(-1, 1, len(t)).astype(np.float32)
+    rumble = _lowpass(_lowpass(noise, 24), 24) * 4
+    thump = np.sin(2 * np.pi * (55 * np.exp(-t * 3) + 25) * t)
+    return np.tanh((rumble + thump) * _envelope(t, attack=0.002, decay=0.35) * 1.5) * 0.9
+
+
+# name -> (synth, priority, max simultaneous voices, minimum seconds between starts)
+SOUNDS = {
+    'coin': (synth_coin, 1, 3, 0.03),
+    'fuse': (synth_fuse, 1, 2, 0.2),
+    'stomp': (synth_stomp, 2, 2, 0.05),
+    'damage': (synth_damage, 3, 1, 0.3),
+    'explosion': (synth_explosion, 3, 3, 0.08),
+    'star': (synth_star, 4, 1, 0.5),
+}
+
+
+def to_pcm16(signal):
+    return (np.clip(signal, -1, 1) * 32767).astype('<i2')
+
+
+class SoundBank:
+    """All effects as int16 PCM in memory, backed by a WAV cache on disk."""
+
+    def __init__(self, cache_dir='.cache/sfx', rate=RATE, sounds=SOUNDS):
+        self.cache_dir = cache_dir
+        self.rate = rate
+        self.sounds = sounds
+        self.buffers = {}
+        self.paths = {}
+        self.durations = {}
+
+    def path_for(self, name):
+        return os.path.join(self.cache_dir, f'{name}-v{SYNTH_VERSION}-{self.rate}.wav')
+
+    def load(self):
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+        for name, (synth, _, _, _) in self.sounds.items():
+            path = self.path_for(name) if self.cache_dir else None
+            pcm = None
+            if path and os.path.exists(path):
+                try:
+                    with wave.open(path, 'rb') as f:
+                        pcm = np.frombuffer(f.readframes(f.getnframes()), '<i2')
+                except (OSError, EOFError, wave.Error):
+                    pcm = None   # unreadable cache file: synthesize it again
+            if pcm is None:
+                pcm = to_pcm16(synth(self.rate))
+                if path:
+                    with wave.open(path, 'wb') as f:
+                        f.setnchannels(1)
+                        f.setsampwidth(2)
+                        f.setframerate(self.rate)
+                        f.writeframes(pcm.tobytes())
+            self.buffers[name] = pcm
+            self.paths[name] = path
+            self.durations[name] = len(pcm) / self.rate
+        return self
+
+
+# --- Backends ---
+
+class NullBackend:
+    """Plays nothing; records starts and stops so the pool can run headless."""
+
+    def __init__(self):
+        self.started = []
+        self.stopped = []
+
+    def preload(self, bank, voices):
+        pass
+
+    def start(self, voice, name):
+        self.started.append((voice, name))
+
+    def stop(self, voice):
+        self.stopped.append(voice)
+
+
+class PandaBackend:
+    """One preloaded AudioSound per (voice, sound), loaded from the WAV cache at startup."""
+
+    def __init__(self, loader):
+        self.loader = loader
+        self.clips = []
+        self.playing = []
+
+    def preload(self, bank, voices):
+        from panda3d.core import Filename
+        paths = {name: Filename.from_os_specific(os.path.abspath(path)) for name, path in bank.paths.items()}
+        self.clips = [{name: self.loader.loadSfx(path) for name, path in paths.items()} for _ in range(voices)]
+        self.playing = [None] * voices
+
+    def start(self, voice, name):
+        self.stop(voice)
+        clip = self.clips[voice][name]
+        clip.play()
+        self.playing[voice] = clip
+
+    def stop(self, voice):
+        if self.playing[voice] is not None:
+            self.playing[voice].stop()
+            self.playing[voice] = None
+
+
+# --- Voice pool ---
+
+class VoicePool:
+    """At most `voices` sounds at once, chosen by priority.
+
+    play() starts a sound on a free voice; with none free it steals the
+    lowest-priority, oldest voice whose priority does not exceed the new
+    sound's, otherwise the request is dropped. Per-sound caps and minimum
+    intervals are checked first. Returns the voice index or None.
+    """
+
+    def __init__(self, bank, backend=None, voices=8, clock=time.perf_counter):
+        self.bank = bank
+        self.backend = backend or NullBackend()
+        self.clock = clock
+        self.names = [None] * voices
+        self.ends = [0.0] * voices
+        self.starts = [0.0] * voices
+        self.last_start = {}
+        self.dropped = 0
+        self.stolen = 0
+        self.backend.preload(bank, voices)
+
+    def _priority(self, name):
+        return self.bank.sounds[name][1]
+
+    def play(self, name):
+        _, priority, max_voices, interval = self.bank.sounds[name]
+        now = self.clock()
+        if now - self.last_start.get(name, -1e9) < interval:
+            self.dropped += 1
+            return None
+        live = [i for i, end in enumerate(self.ends) if end > now]
+        same = [i for i in live if self.names[i] == name]
+        if len(same) >= max_voices:
+            voice = min(same, key=self.starts.__getitem__)   # restart the oldest copy
+            self.stolen += 1
+        elif len(live) < len(self.ends):
+            voice = next(i for i, end in enumerate(self.ends) if end <= now)
+        else:
+            candidates = [i for i in live if self._priority(self.names[i]) <= priority]
+            if not candidates:
+                self.dropped += 1
+                return None
+            voice = min(candidates, key=lambda i: (self._priority(self.names[i]), self.starts[i]))
+            self.stolen += 1
+        self.backend.start(voice, name)
+        self.names[voice] = name
+        self.starts[voice] = now
+        self.ends[voice] = now + self.bank.durations[name]
+        self.last_start[name] = now
+        return voice
+
+    def active(self):
+        now = self.clock()
+        return [self.names[i] for i, end in enumerate(self.ends) if end > now]
+
+    def stop_all(self):
+        for i in range(len(self.ends)):
+            if self.ends[i] > self.clock():
+                self.backend.stop(i)
+            self.ends[i] = 0.0
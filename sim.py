@@ -0,0 +1,204 @@
+# sim.py - Headless, fixed-step simulation of the pcport4k game rules.
+# No Ursina here: players, Goombas, coins and stars are plain objects stepped
+# with a constant dt, so the same level and the same inputs always produce the
+# same result. The multiplayer server and client prediction share this code.
+
+import math
+import random
+
+import reachability
+
+TICK_RATE = 30
+DT = 1.0 / TICK_RATE
+
+PLAYER_HALF_WIDTH = 0.5
+COIN_RADIUS = 1.0
+STAR_RADIUS = 1.2
+GOOMBA_HALF = 0.5
+GOOMBA_DIRECTIONS = [(1, 0), (-1, 0), (0, 1), (0, -1)]
+SPAWN_JITTER = 5
+PICKUP_CELL = 4.0
+
+
+class SurfaceIndex:
+    """Platform tops filed in a coarse XZ grid for O(1) floor lookups."""
+
+    def __init__(self, boxes, ground_size=200, cell_size=16.0):
+        self.cell_size = cell_size
+        self.ground_half = ground_size / 2
+        self.cells = {}
+        for x, y, z, sx, sy, sz in boxes:
+            top = y + sy / 2
+            x0, x1 = x - sx / 2, x + sx / 2
+            z0, z1 = z - sz / 2, z + sz / 2
+            for cx in range(math.floor(x0 / cell_size), math.floor(x1 / cell_size) + 1):
+                for cz in range(math.floor(z0 / cell_size), math.floor(z1 / cell_size) + 1):
+                    self.cells.setdefault((cx, cz), []).append((x0, x1, z0, z1, top))
+
+    def floor_at(self, x, z, below):
+        """Highest surface under (x, z) no higher than `below`, or -inf off the map."""
+        best = 0.0 if abs(x) <= self.ground_half and abs(z) <= self.ground_half else -math.inf
+        for x0, x1, z0, z1, top in self.cells.get((math.floor(x / self.cell_size), math.floor(z / self.cell_size)), ()):
+            if best < top <= below and x0 - PLAYER_HALF_WIDTH <= x <= x1 + PLAYER_HALF_WIDTH \
+                    and z0 - PLAYER_HALF_WIDTH <= z <= z1 + PLAYER_HALF_WIDTH:
+                best = top
+        return best
+
+
+class PlayerState:
+    __slots__ = ('x', 'y', 'z', 'vy', 'yaw', 'grounded', 'coins', 'stars', 'health')
+
+    def __init__(self, x=0.0, y=10.0, z=0.0):
+        self.x, self.y, self.z = x, y, z
+        self.vy = 0.0
+        self.yaw = 0.0
+        self.grounded = False
+        self.coins = 0
+        self.stars = 0
+        self.health = 8
+
+    def copy(self):
+        other = PlayerState.__new__(PlayerState)
+        for name in PlayerState.__slots__:
+            setattr(other, name, getattr(self, name))
+        return other
+
+
+def gravity_accel(params):
+    # FirstPersonController falls 12.5 * gravity * t^2, i.e. accelerates at 25 * gravity.
+    return 2 * reachability.FALL_RATE * params.gravity
+
+
+def step_player(p, move_x, move_z, jump, surfaces, params, dt=DT):
+    """Advance one player by one tick. move_x/move_z are strafe/forward in [-1, 1]."""
+    length = math.hypot(move_x, move_z)
+    if length > 1:
+        move_x, move_z = move_x / length, move_z / length
+    sin_yaw, cos_yaw = math.sin(math.radians(p.yaw)), math.cos(math.radians(p.yaw))
+    p.x += (move_z * sin_yaw + move_x * cos_yaw) * params.speed * dt
+    p.z += (move_z * cos_yaw - move_x * sin_yaw) * params.speed * dt
+
+    g = gravity_accel(params)
+    if jump and p.grounded:
+        p.vy = math.sqrt(2 * g * params.jump_height)
+        p.grounded = False
+    previous_y = p.y
+    p.vy -= g * dt
+    p.y += p.vy * dt
+    floor = surfaces.floor_at(p.x, p.z, previous_y + 1e-4)
+    if p.y <= floor:
+        p.y = floor
+        p.vy = 0.0
+        p.grounded = True
+    else:
+        p.grounded = False
+
+
+class Goomba:
+    __slots__ = ('x', 'y', 'z', 'direction', 'speed', 'move_timer', 'alive')
+
+    def __init__(self, x, y, z, rng):
+        self.x, self.y, self.z = x, y, z
+        self.direction = rng.randrange(4)
+        self.speed = rng.uniform(1, 3)
+        self.move_timer = rng.uniform(2, 5)
+        self.alive = True
+
+
+class World:
+    """Authoritative game state for any number of players in one level."""
+
+    def __init__(self, spec):
+        self.spec = spec
+        self.params = spec.params
+        self.surfaces = SurfaceIndex(spec.boxes(), spec.params.ground_size)
+        self.rng = random.Random(f'{spec.seed}:sim')
+        self.tick = 0
+        self.players = {}
+        self.coins = [list(c[:3]) for c in spec.coins]
+        self.coin_taken = [False] * len(spec.coins)
+        self.stars = [list(s[:3]) for s in spec.stars]
+        self.star_taken = [False] * len(spec.stars)
+        self.goombas = [Goomba(x, y, z, self.rng) for x, y, z, _ in spec.goombas]
+        self.pickup_cells = {}    # coarse cell -> [('coin' | 'star', index)] for contact tests
+        for kind, items in (('coin', self.coins), ('star', self.stars)):
+            for i, (x, _, z) in enumerate(items):
+                self.pickup_cells.setdefault(self._cell(x, z), []).append((kind, i))
+
+    @staticmethod
+    def _cell(x, z):
+        return math.floor(x / PICKUP_CELL), math.floor(z / PICKUP_CELL)
+
+    def spawn_point(self):
+        sx, sy, sz = self.params.spawn
+        return (sx + self.rng.uniform(-SPAWN_JITTER, SPAWN_JITTER), sy,
+                sz + self.rng.uniform(-SPAWN_JITTER, SPAWN_JITTER))
+
+    def add_player(self, pid):
+        self.players[pid] = PlayerState(*self.spawn_point())
+        return self.players[pid]
+
+    def remove_player(self, pid):
+        self.players.pop(pid, None)
+
+    def step(self, inputs, dt=DT):
+        """inputs maps player id -> (move_x, move_z, yaw, jump). Returns a list of events."""
+        events = []
+        for pid, p in self.players.items():
+            move_x, move_z, yaw, jump = inputs.get(pid, (0.0, 0.0, p.yaw, False))
+            p.yaw = yaw
+            step_player(p, move_x, move_z, jump, self.surfaces, self.params, dt)
+            if p.y < -50:
+                p.x, p.y, p.z = self.spawn_point()
+                p.vy = 0.0
+
+        for g in self.goombas:
+            if not g.alive:
+                continue
+            g.move_timer -= dt
+            if g.move_timer <= 0:
+                g.direction = self.rng.randrange(4)
+                g.move_timer = self.rng.uniform(2, 5)
+            dx, dz = GOOMBA_DIRECTIONS[g.direction]
+            g.x += dx * g.speed * dt
+            g.z += dz * g.speed * dt
+            if abs(g.x) > 90 or abs(g.z) > 90:
+                g.direction ^= 1   # flip to the opposite direction on the same axis
+
+        for pid, p in self.players.items():
+            events.extend(self._player_contacts(pid, p))
+        self.tick += 1
+        return events
+
+    def _player_contacts(self, pid, p):
+        events = []
+        cx, cz = self._cell(p.x, p.z)
+        for ix in (cx - 1, cx, cx + 1):
+            for iz in (cz - 1, cz, cz + 1):
+                for kind, i in self.pickup_cells.get((ix, iz), ()):
+                    if kind == 'coin':
+                        x, y, z = self.coins[i]
+                        if not self.coin_taken[i] and abs(p.x - x) < COIN_RADIUS and abs(p.z - z) < COIN_RADIUS \
+                                and -0.5 < y - p.y < 2.0:
+                            self.coin_taken[i] = True
+                            p.coins += 1
+                            events.append(('coin', pid, i))
+                    else:
+                        x, y, z = self.stars[i]
+                        if not self.star_taken[i] and abs(p.x - x) < STAR_RADIUS and abs(p.z - z) < STAR_RADIUS \
+                                and -0.5 < y - p.y < 2.5:
+                            self.star_taken[i] = True
+                            p.stars += 1
+                            events.append(('star', pid, i))
+        for i, g in enumerate(self.goombas):
+            if g.alive and abs(p.x - g.x) < GOOMBA_HALF + PLAYER_HALF_WIDTH \
+                    and abs(p.z - g.z) < GOOMBA_HALF + PLAYER_HALF_WIDTH and -1.0 < p.y - g.y < 1.2:
+                if p.y > g.y + GOOMBA_HALF * 0.4 and p.vy < 0:
+                    g.alive = False
+                    events.append(('stomp', pid, i))
+                else:
+                    p.health -= 1
+                    p.x, p.y, p.z = self.spawn_point()
+                    p.vy = 0.0
+                    events.append(('hurt', pid, i))
+        return events
@@ -1,9 +1,15 @@
 from ursina import *
 from ursina.prefabs.first_person_controller import FirstPersonController
 import math
+import os
 import random
+import hdr
+import meshes
+import pacing
+from triggers import TriggerSystem
 
 app = Ursina()
+triggers = TriggerSystem()  # Swim volume membership, cached once per frame
 
 # --- Helper Function ---
 
@@ -25,6 +31,12 @@ window.title = "SM64‑Inspired Game – Build 2"
 window.borderless = False
 window.vsync = True  # Enables smoother 60 FPS control
 application.target_fps = 60  # Target 60 FPS
+# Frame intervals and input-to-display latency; F3 prints and writes pacing.json.
+# SM64_LOW_LATENCY=1 sleeps before input is sampled instead of after rendering.
+pacer = pacing.install(app, target_fps=60, low_latency=bool(os.environ.get("SM64_LOW_LATENCY")))
+# Float scene target, bloom and tonemapping. SM64_HDR=low/medium/high/off picks a tier;
+# the default fits one to 15% of the frame budget. F4 times each pass, F5 cycles tiers.
+hdr_pipeline = hdr.from_environment(app, budget_ms=1000 / 60)
 
 # --- Player Setup ---
 player = FirstPersonController(
@@ -47,12 +59,13 @@ player.is_ground_pounding = False
 player.is_diving = False
 player.dive_timer = 0
 player.original_gravity = player.gravity
+triggers.track(player)
 
 # Visible player model (so you can see your avatar in third‑person replays, etc.)
 player_model = Entity(
     parent=player,
-    model="cube",
-    color=color.azure,
+    model=meshes.MeshCache().model("mario"),  # Low-poly stand-in, baked once to .cache/meshes
+    color=color.white,
     scale=(0.8, 1.8, 0.8),
     position=Vec3(0, -0.9, 0),
 )
@@ -138,6 +151,28 @@ water_area = Entity(
     collider="box",
 )
 
+# Swimming starts once the feet are below y = water_area.y + 1
+def start_swimming(subject, volume):
+    player.is_swimming = True
+    player.gravity = player.original_gravity * 0.25  # buoyant
+    player.speed = 6
+
+
+def stop_swimming(subject, volume):
+    player.is_swimming = False
+    player.gravity = player.original_gravity
+    player.speed = 10
+
+
+water_bottom = water_area.y - water_area.scale_y / 2
+water_top = water_area.y + 1
+water = triggers.box(
+    (water_area.x, (water_bottom + water_top) / 2, water_area.z),
+    (water_area.scale_x / 2, (water_top - water_bottom) / 2, water_area.scale_z / 2),
+    on_enter=start_swimming,
+    on_exit=stop_swimming,
+)
+
 
 # --- Per‑frame Update Logic ---
 
@@ -148,19 +183,22 @@ def update():
     update_star_ui()
     update_red_coin_ui()
 
-    # Basic water / swim check
-    global stars_collected, red_coins_collected
-
-    if player.y < water_area.y + 1:
-        if not player.is_swimming:
-            player.is_swimming = True
-            player.gravity = player.original_gravity * 0.25  # buoyant
-            player.speed = 6
-    else:
-        if player.is_swimming:
-            player.is_swimming = False
-            player.gravity = player.original_gravity
-            player.speed = 10
+    # Water / swim state changes arrive as trigger enter and exit events
+    triggers.step()
+
+
+def input(key):
+    if not key.endswith(" up"):
+        pacer.input(key)  # Shown by the frame that handles it
+    if key == "f3":
+        print(f"Pacing: {pacer.summary()}")
+        pacer.dump()
+    if key == "f4" and hdr_pipeline:
+        hdr_pipeline.profile()
+        print(hdr_pipeline.summary())
+    if key == "f5" and hdr_pipeline:
+        hdr_pipeline.cycle()
+        print(hdr_pipeline.summary())
 
 
 # --- Run the game ---
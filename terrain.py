@@ -0,0 +1,274 @@
+# terrain.py - Heightfield terrain with geomipmapped chunks and direct height queries.
+# Hills are seeded value-noise fBm computed on the whole grid at once with
+# NumPy. Rendering splits the grid into square chunks, each meshed at a
+# power-of-two step chosen from its distance to the camera (geomipmapping),
+# with short skirts hiding the cracks between neighbours of different detail.
+# height_at()/normal_at() interpolate the stored samples directly, so players
+# and enemies stand on the ground without a raycast.
+
+import math
+
+import numpy as np
+
+GRASS = (0.36, 0.62, 0.22, 1.0)
+HILLTOP = (0.55, 0.74, 0.30, 1.0)
+DIRT = (0.55, 0.35, 0.17, 1.0)
+
+
+def fbm(samples, seed, octaves=5, base_cells=3, persistence=0.5):
+    """samples x samples fractal value noise in [0, 1], built one octave at a time."""
+    rng = np.random.default_rng(seed)
+    t = np.linspace(0.0, 1.0, samples, dtype=np.float32)
+    total = np.zeros((samples, samples), np.float32)
+    amplitude, norm = 1.0, 0.0
+    for octave in range(octaves):
+        cells = base_cells << octave
+        lattice = rng.random((cells + 1, cells + 1), dtype=np.float32)
+        u = t * cells
+        i = np.minimum(u.astype(np.int32), cells - 1)
+        f = u - i
+        f = f * f * (3 - 2 * f)   # smoothstep, so octave seams do not show as creases
+        # Separable bilinear interpolation: along z for every lattice column, then along x.
+        rows = lattice[i] + (lattice[i + 1] - lattice[i]) * f[:, None]
+        total += amplitude * (rows[:, i] + (rows[:, i + 1] - rows[:, i]) * f[None, :])
+        norm += amplitude
+        amplitude *= persistence
+    return total / norm
+
+
+def generate_heights(samples, size, seed, amplitude=16.0, sea_level=0.35, flat_radius=12.0):
+    """Bob-omb Battlefield style hills: rolling meadows, a few tall hills, a flat spawn area.
+
+    Returns a (samples, samples) float32 array of heights for a size x size
+    square centered on the origin, indexed [z, x].
+    """
+    noise = fbm(samples, seed)
+    heights = np.clip((noise - sea_level) / (1 - sea_level), 0, None) ** 1.5 * amplitude
+    coords = np.linspace(-size / 2, size / 2, samples, dtype=np.float32)
+    radius = np.hypot(coords[None, :], coords[:, None])
+    blend = np.clip((radius - flat_radius) / flat_radius, 0, 1)
+    return (heights * blend * blend * (3 - 2 * blend)).astype(np.float32)
+
+
+class Heightfield:
+    """Height samples on a regular grid centered on the origin.
+
+    height_at and normal_at are O(1) bilinear lookups; positions off the
+    grid clamp to its edge.
+    """
+
+    def __init__(self, heights, size):
+        self.heights = np.ascontiguousarray(heights, np.float32)
+        self.cells = heights.shape[0] - 1
+        self.width = heights.shape[1]
+        self._samples = memoryview(self.heights.reshape(-1))   # plain floats, no NumPy scalar overhead
+        self.size = size
+        self.spacing = size / self.cells
+        self.origin = -size / 2
+
+    @classmethod
+    def generate(cls, seed, size=200, samples=513, **kwargs):
+        return cls(generate_heights(samples, size, seed, **kwargs), size)
+
+    def _locate(self, x, z):
+        limit = self.cells - 1e-6
+        gx = min(max((x - self.origin) / self.spacing, 0.0), limit)
+        gz = min(max((z - self.origin) / self.spacing, 0.0), limit)
+        ix, iz = int(gx), int(gz)
+        return iz * self.width + ix, gx - ix, gz - iz
+
+    def height_at(self, x, z):
+        i, fx, fz = self._locate(x, z)
+        h, w = self._samples, self.width
+        top = h[i] + (h[i + 1] - h[i]) * fx
+        bottom = h[i + w] + (h[i + w + 1] - h[i + w]) * fx
+        return top + (bottom - top) * fz
+
+    def normal_at(self, x, z):
+        """Unit surface normal (x, y, z) of the interpolated surface."""
+        i, fx, fz = self._locate(x, z)
+        h, w = self._samples, self.width
+        h00, h10, h01, h11 = h[i], h[i + 1], h[i + w], h[i + w + 1]
+        dx = ((h10 - h00) * (1 - fz) + (h11 - h01) * fz) / self.spacing
+        dz = ((h01 - h00) * (1 - fx) + (h11 - h10) * fx) / self.spacing
+        length = math.sqrt(dx * dx + 1 + dz * dz)
+        return (-dx / length, 1 / length, -dz / length)
+
+    def heights_at(self, xs, zs):
+        """Vectorized height_at for arrays of positions."""
+        gx = np.clip((np.asarray(xs, np.float32) - self.origin) / self.spacing, 0, self.cells - 1e-3)
+        gz = np.clip((np.asarray(zs, np.float32) - self.origin) / self.spacing, 0, self.cells - 1e-3)
+        ix, iz = gx.astype(np.int32), gz.astype(np.int32)
+        fx, fz = gx - ix, gz - iz
+        h = self.heights
+        top = h[iz, ix] + (h[iz, ix + 1] - h[iz, ix]) * fx
+        bottom = h[iz + 1, ix] + (h[iz + 1, ix + 1] - h[iz + 1, ix]) * fx
+        return top + (bottom - top) * fz
+
+    def vertex_normals(self):
+        dz, dx = np.gradient(self.heights, self.spacing)
+        normals = np.stack((-dx, np.ones_like(dx), -dz), axis=-1)
+        return (normals / np.linalg.norm(normals, axis=-1, keepdims=True)).astype(np.float32)
+
+
+# --- Geomipmapped chunks ---
+
+def _grid_triangles(rows, cols):
+    # Two triangles per quad in the winding Ursina's own Terrain mesh uses.
+    i = np.arange(rows * cols, dtype=np.uint32).reshape(rows, cols)
+    v00, v10 = i[:-1, :-1], i[:-1, 1:]
+    v01, v11 = i[1:, :-1], i[1:, 1:]
+    return np.stack((v11, v01, v00, v11, v00, v10), axis=-1).ravel()
+
+
+def chunk_arrays(field, normals, colors, x0, z0, cells, step, skirt):
+    """Flat vertex, normal, color and index arrays for one chunk at one LOD step."""
+    h = field.heights[z0:z0 + cells + 1:step, x0:x0 + cells + 1:step]
+    n = normals[z0:z0 + cells + 1:step, x0:x0 + cells + 1:step]
+    c = colors[z0:z0 + cells + 1:step, x0:x0 + cells + 1:step]
+    rows, cols = h.shape
+    xs = field.origin + (x0 + np.arange(cols, dtype=np.float32) * step) * field.spacing
+    zs = field.origin + (z0 + np.arange(rows, dtype=np.float32) * step) * field.spacing
+    vertices = np.empty((rows, cols, 3), np.float32)
+    vertices[..., 0] = xs[None, :]
+    vertices[..., 1] = h
+    vertices[..., 2] = zs[:, None]
+    vertices = vertices.reshape(-1, 3)
+    normals_out = n.reshape(-1, 3)
+    colors_out = c.reshape(-1, 4)
+    triangles = [_grid_triangles(rows, cols)]
+
+    if skirt:
+        # Each border gets a curtain hanging `skirt` units below it. Both windings
+        # are emitted, so a crack shows a skirt from whichever side it is seen.
+        grid = np.arange(rows * cols, dtype=np.uint32).reshape(rows, cols)
+        extra_vertices, extra_normals, extra_colors = [], [], []
+        base = len(vertices)
+        for edge in (grid[0, :], grid[-1, :], grid[:, 0], grid[:, -1]):
+            lowered = vertices[edge].copy()
+            lowered[:, 1] -= skirt
+            extra_vertices.append(lowered)
+            extra_normals.append(normals_out[edge])
+            extra_colors.append(colors_out[edge])
+            top = edge[:-1], edge[1:]
+            bottom = np.arange(base, base + len(edge), dtype=np.uint32)
+            bottom = bottom[:-1], bottom[1:]
+            triangles.append(np.stack((top[0], bottom[0], top[1], top[1], bottom[0], bottom[1],
+                                       top[0], top[1], bottom[0], top[1], bottom[1], bottom[0]), axis=-1).ravel())
+            base += len(edge)
+        vertices = np.concatenate([vertices] + extra_vertices)
+        normals_out = np.concatenate([normals_out] + extra_normals)
+        colors_out = np.concatenate([colors_out] + extra_colors)
+
+    return (np.ascontiguousarray(vertices).ravel(), np.ascontiguousarray(normals_out).ravel(),
+            np.ascontiguousarray(colors_out).ravel(), np.concatenate(triangles))
+
+
+def terrain_colors(field, normals):
+    """Grass that lightens toward hilltops, dirt on steep slopes."""
+    peak = max(float(field.heights.max()), 1e-6)
+    t = (field.heights / peak)[..., None]
+    colors = np.asarray(GRASS, np.float32) * (1 - t) + np.asarray(HILLTOP, np.float32) * t
+    steep = np.clip((0.85 - normals[..., 1:2]) / 0.2, 0, 1)
+    return (colors * (1 - steep) + np.asarray(DIRT, np.float32) * steep).astype(np.float32)
+
+
+class Terrain:
+    """Chunked, geomipmapped rendering of a Heightfield.
+
+    Chunks are chunk_cells samples square. A chunk at distance d from the
+    camera is meshed with step 2**k, k = log2(d / lod_distance), capped so the
+    coarsest mesh keeps at least 4 quads per side. Meshes are built on first
+    use and cached; update() builds at most `builds_per_frame` new ones so
+    flying across the map never stalls a frame.
+    """
+
+    def __init__(self, field, chunk_cells=64, lod_distance=40.0, skirt=None, builds_per_frame=4, **entity_kwargs):
+        from ursina import Entity
+        if field.cells % chunk_cells:
+            raise ValueError(f"terrain cells ({field.cells}) must be a multiple of chunk_cells ({chunk_cells})")
+        self.field = field
+        self.chunk_cells = chunk_cells
+        self.lod_distance = lod_distance
+        self.max_lod = max(0, int(math.log2(chunk_cells)) - 2)
+        self.skirt = skirt if skirt is not None else field.spacing * 4
+        self.builds_per_frame = builds_per_frame
+        self.normals = field.vertex_normals()
+        self.colors = terrain_colors(field, self.normals)
+        per_side = field.cells // chunk_cells
+        self.origins = [(cx * chunk_cells, cz * chunk_cells) for cz in range(per_side) for cx in range(per_side)]
+        half = chunk_cells * field.spacing / 2
+        self.centers = np.array([(field.origin + x0 * field.spacing + half, field.origin + z0 * field.spacing + half)
+                                 for x0, z0 in self.origins], np.float32)
+        self.lods = np.full(len(self.origins), -1, np.int32)
+        self.meshes = {}    # (chunk, lod) -> Mesh
+        self.chunks = [Entity(**entity_kwargs) for _ in self.origins]
+
+    def lod_for(self, distances):
+        ratio = np.maximum(distances / self.lod_distance, 1.0)
+        return np.minimum(np.log2(ratio).astype(np.int32), self.max_lod)
+
+    def mesh(self, chunk, lod):
+        from ursina import Mesh
+        key = (chunk, lod)
+        if key not in self.meshes:
+            x0, z0 = self.origins[chunk]
+            vertices, normals, colors, triangles = chunk_arrays(
+                self.field, self.normals, self.colors, x0, z0, self.chunk_cells, 1 << lod, self.skirt)
+            self.meshes[key] = Mesh(vertices=vertices, triangles=triangles, normals=normals, colors=colors)
+        return self.meshes[key]
+
+    def update(self, camera_position):
+        """Switch chunks whose distance band changed; returns how many were switched."""
+        x, _, z = camera_position
+        distances = np.hypot(self.centers[:, 0] - x, self.centers[:, 1] - z)
+        wanted = self.lod_for(distances)
+        changed = np.flatnonzero(wanted != self.lods)
+        builds = 0
+        # Nearest chunks first, so a limited build budget goes where it is seen.
+        for chunk in changed[np.argsort(distances[changed])]:
+            lod = int(wanted[chunk])
+            if (chunk, lod) not in self.meshes:
+                if builds >= self.builds_per_frame and self.lods[chunk] >= 0:
+                    continue
+                builds += 1
+            self.chunks[chunk].model = self.mesh(chunk, lod)
+            self.lods[chunk] = lod
+        return len(changed)
+
+    def triangle_count(self):
+        return sum(len(self.meshes[(i, int(lod))].triangles) // 3 for i, lod in enumerate(self.lods) if lod >= 0)
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description='Time heightfield generation, chunk meshing and height queries.')
+    parser.add_argument('--samples', type=int, default=2049, help='samples per side (cells + 1)')
+    parser.add_argument('--size', type=float, default=2000, help='world units per side')
+    parser.add_argument('--chunk', type=int, default=64, help='cells per chunk side')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    field = Heightfield.generate(args.seed, args.size, args.samples)
+    print(f"heightfield {args.samples}x{args.samples}: {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    normals = field.vertex_normals()
+    colors = terrain_colors(field, normals)
+    for step in (1, 2, 4, 8, 16):
+        start = time.perf_counter()
+        arrays = chunk_arrays(field, normals, colors, 0, 0, args.chunk, step, field.spacing * 4)
+        print(f"chunk mesh step {step:>2}: {len(arrays[3]) // 3:>6} triangles, {(time.perf_counter() - start) * 1000:.2f} ms")
+
+    rng = np.random.default_rng(0)
+    points = rng.uniform(-args.size / 2, args.size / 2, (100000, 2))
+    start = time.perf_counter()
+    for x, z in points[:20000].tolist():
+        field.height_at(x, z)
+    per_query = (time.perf_counter() - start) / 20000
+    start = time.perf_counter()
+    field.heights_at(points[:, 0], points[:, 1])
+    batch = time.perf_counter() - start
+    print(f"height_at: {per_query * 1e6:.2f} us per query; heights_at: {batch * 1000:.2f} ms per 100k")
@@ -0,0 +1,154 @@
+# timer_wheel.py - Hierarchical timer wheel for timed gameplay events.
+# Fuses, wander timers, cooldowns and power-up expiry register a deadline here
+# instead of counting down by time.dt every frame. Advancing the wheel touches
+# one slot per tick plus whatever fires, so cost follows the number of due
+# events rather than the number of live timers.
+
+import math
+from collections import deque
+
+BITS = 6
+SLOTS = 1 << BITS
+MASK = SLOTS - 1
+
+
+class Timer:
+    __slots__ = ('deadline', 'callback', 'args', 'slot', 'active')
+
+    def __init__(self, deadline, callback, args):
+        self.deadline = deadline
+        self.callback = callback
+        self.args = args
+        self.slot = None
+        self.active = True
+
+
+class TimerWheel:
+    """Deadlines measured on the simulation clock, quantized to `resolution` seconds.
+
+    Only advance() moves time, so paused games and replays that feed the same
+    dt sequence fire the same callbacks in the same order. Callbacks may
+    schedule, cancel or reschedule timers, including zero-delay ones, which
+    fire within the same advance() call (chain reactions resolve in one frame).
+    """
+
+    def __init__(self, resolution=1 / 120, levels=4):
+        self.resolution = resolution
+        self.levels = levels
+        self.tick = 0
+        self.time = 0.0
+        self._wheels = [[{} for _ in range(SLOTS)] for _ in range(levels)]
+        self._overflow = {}
+        self._due = deque()
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def schedule(self, delay, callback, *args):
+        """Call callback(*args) once `delay` seconds of simulation time have passed."""
+        timer = Timer(self.tick + max(0, math.ceil(delay / self.resolution - 1e-9)), callback, args)
+        self.count += 1
+        self._insert(timer)
+        return timer
+
+    def cancel(self, timer):
+        if timer is None or not timer.active:
+            return
+        timer.active = False
+        self.count -= 1
+        if timer.slot is not None:
+            del timer.slot[timer]
+            timer.slot = None
+
+    def reschedule(self, timer, delay):
+        """Move an active or already fired timer to a new deadline, keeping its callback."""
+        self.cancel(timer)
+        timer.deadline = self.tick + max(0, math.ceil(delay / self.resolution - 1e-9))
+        timer.active = True
+        self.count += 1
+        self._insert(timer)
+        return timer
+
+    def remaining(self, timer):
+        if timer is None or not timer.active:
+            return 0.0
+        return max(0, timer.deadline - self.tick) * self.resolution
+
+    def advance(self, dt):
+        """Move simulation time forward by dt, firing everything that comes due."""
+        self.time += dt
+        target = math.floor(self.time / self.resolution + 1e-9)
+        self._fire_due()
+        while self.tick < target:
+            if not self.count:
+                # Nothing pending anywhere: jump straight to the target tick.
+                self.tick = target
+                break
+            self.tick += 1
+            self._cascade()
+            slot = self._wheels[0][self.tick & MASK]
+            if slot:
+                self._wheels[0][self.tick & MASK] = {}
+                for timer in slot:
+                    timer.slot = None
+                    self._due.append((timer, timer.deadline))
+            if self._due:
+                self._fire_due()
+
+    def clear(self):
+        """Drop every pending timer; handles still held elsewhere read as inactive, so cancelling them is a no-op."""
+        slots = [slot for wheel in self._wheels for slot in wheel] + [self._overflow]
+        for timer in [timer for slot in slots for timer in slot] + [timer for timer, _ in self._due]:
+            timer.active = False
+            timer.slot = None
+        for wheel in self._wheels:
+            for i in range(SLOTS):
+                wheel[i] = {}
+        self._overflow = {}
+        self._due.clear()
+        self.count = 0
+
+    def _insert(self, timer):
+        delta = timer.deadline - self.tick
+        if delta <= 0:
+            timer.slot = None
+            self._due.append((timer, timer.deadline))
+            return
+        for level in range(self.levels):
+            if delta < 1 << (BITS * (level + 1)):
+                slot = self._wheels[level][(timer.deadline >> (BITS * level)) & MASK]
+                break
+        else:
+            slot = self._overflow
+        slot[timer] = None
+        timer.slot = slot
+
+    def _cascade(self):
+        # When the lower digits of the tick roll over, redistribute the next
+        # coarse slot into finer wheels.
+        for level in range(1, self.levels):
+            if self.tick & ((1 << (BITS * level)) - 1):
+                return
+            index = (self.tick >> (BITS * level)) & MASK
+            slot = self._wheels[level][index]
+            if slot:
+                self._wheels[level][index] = {}
+                for timer in slot:
+                    self._insert(timer)
+        if self._overflow:
+            overflow, self._overflow = self._overflow, {}
+            for timer in overflow:
+                self._insert(timer)
+
+    def _fire_due(self):
+        due = self._due
+        while due:
+            timer, deadline = due.popleft()
+            # Skip entries left behind by cancel() or reschedule().
+            if not timer.active or timer.deadline != deadline or timer.slot is not None:
+                continue
+            timer.active = False
+            timer.slot = None
+            self.count -= 1
+            timer.callback(*timer.args)
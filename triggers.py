@@ -0,0 +1,174 @@
+# triggers.py - Trigger volumes with cached membership and enter/exit events.
+# Water, snow and talk/fuse radii are volumes: static boxes and spheres filed
+# once in a uniform XZ grid, plus sphere sensors that ride along with moving
+# actors. Once per tick each tracked subject (usually just the player) is
+# tested against the volumes in its own cell only, the result is diffed with
+# the last tick and the differences fire on_enter/on_exit. Game code asks
+# is_inside(volume), a set lookup, instead of re-testing geometry per actor.
+
+import math
+
+
+class Volume:
+    __slots__ = ('id', 'shape', 'center', 'half', 'radius', 'owner', 'offset', 'tag',
+                 'on_enter', 'on_exit', 'cells')
+
+    def __init__(self, id, shape, center, half, radius, owner, offset, tag, on_enter, on_exit):
+        self.id = id
+        self.shape = shape      # 'box' or 'sphere'
+        self.center = center
+        self.half = half
+        self.radius = radius
+        self.owner = owner      # entity a sensor follows, or None for static volumes
+        self.offset = offset
+        self.tag = tag
+        self.on_enter = on_enter
+        self.on_exit = on_exit
+        self.cells = ()
+
+    def bounds(self):
+        x, y, z = self.center
+        hx, hy, hz = self.half if self.shape == 'box' else (self.radius,) * 3
+        return (x - hx, y - hy, z - hz, x + hx, y + hy, z + hz)
+
+    def contains(self, x, y, z):
+        cx, cy, cz = self.center
+        if self.shape == 'box':
+            hx, hy, hz = self.half
+            return abs(x - cx) <= hx and abs(y - cy) <= hy and abs(z - cz) <= hz
+        return (x - cx) ** 2 + (y - cy) ** 2 + (z - cz) ** 2 <= self.radius * self.radius
+
+
+class TriggerSystem:
+    """Static and attached trigger volumes tested against a few tracked subjects.
+
+        triggers = TriggerSystem()
+        triggers.track(player)
+        water = triggers.box_around(water_area, on_enter=start_swimming, on_exit=stop_swimming)
+        triggers.attach(bobomb, radius=4, on_enter=lambda subject, volume: bobomb.light_fuse())
+
+        def update():
+            triggers.step()
+            if triggers.is_inside(water): ...
+
+    Handlers receive (subject, volume). Subjects are points: an entity's
+    world position plus an optional offset. Sensors whose owner is disabled
+    drop out of the test, firing on_exit like any other departure.
+    """
+
+    def __init__(self, cell_size=8.0):
+        self.cell_size = cell_size
+        self.volumes = {}         # volume id -> Volume
+        self._next_id = 0
+        self._static_cells = {}   # (cx, cz) -> [Volume]
+        self._sensors = []
+        self.subjects = []        # [(entity, offset)]
+        self._inside = {}         # id(subject) -> set of volume ids
+
+    # --- Registration ---
+
+    def _add(self, shape, center, half, radius, owner=None, offset=(0, 0, 0), tag=None, on_enter=None, on_exit=None):
+        volume = Volume(self._next_id, shape, tuple(center), half, radius, owner, offset, tag, on_enter, on_exit)
+        self._next_id += 1
+        self.volumes[volume.id] = volume
+        if owner is None:
+            volume.cells = self._cells_for(volume.bounds())
+            for cell in volume.cells:
+                self._static_cells.setdefault(cell, []).append(volume)
+        else:
+            self._sensors.append(volume)
+        return volume
+
+    def box(self, center, half_extents, **kwargs):
+        return self._add('box', center, tuple(half_extents), 0.0, **kwargs)
+
+    def box_around(self, entity, **kwargs):
+        """A static box covering an entity's current world bounds."""
+        p, s = entity.world_position, entity.world_scale
+        return self.box((p[0], p[1], p[2]), (abs(s[0]) / 2, abs(s[1]) / 2, abs(s[2]) / 2), **kwargs)
+
+    def sphere(self, center, radius, **kwargs):
+        return self._add('sphere', center, None, radius, **kwargs)
+
+    def attach(self, owner, radius, offset=(0, 0, 0), **kwargs):
+        """A sphere sensor that follows `owner` (a proximity radius around an actor)."""
+        return self._add('sphere', (0, 0, 0), None, radius, owner=owner, offset=offset, **kwargs)
+
+    def remove(self, volume):
+        if self.volumes.pop(volume.id, None) is None:
+            return
+        if volume.owner is None:
+            for cell in volume.cells:
+                self._static_cells[cell].remove(volume)
+        else:
+            self._sensors.remove(volume)
+        for subject, _ in self.subjects:
+            inside = self._inside[id(subject)]
+            if volume.id in inside:
+                inside.discard(volume.id)
+                if volume.on_exit:
+                    volume.on_exit(subject, volume)
+
+    def track(self, subject, offset=(0, 0, 0)):
+        self.subjects.append((subject, offset))
+        self._inside[id(subject)] = set()
+        return subject
+
+    # --- Membership ---
+
+    def _cell(self, x, z):
+        return math.floor(x / self.cell_size), math.floor(z / self.cell_size)
+
+    def _cells_for(self, bounds):
+        size = self.cell_size
+        return [(ix, iz)
+                for ix in range(math.floor(bounds[0] / size), math.floor(bounds[3] / size) + 1)
+                for iz in range(math.floor(bounds[2] / size), math.floor(bounds[5] / size) + 1)]
+
+    def step(self):
+        """Recompute which volumes each subject is in and fire enter/exit handlers."""
+        sensor_cells = {}
+        for sensor in self._sensors:
+            owner = sensor.owner
+            if not getattr(owner, 'enabled', True):
+                continue
+            p = owner.world_position
+            ox, oy, oz = sensor.offset
+            sensor.center = (p[0] + ox, p[1] + oy, p[2] + oz)
+            for cell in self._cells_for(sensor.bounds()):
+                sensor_cells.setdefault(cell, []).append(sensor)
+
+        for subject, (ox, oy, oz) in self.subjects:
+            p = subject.world_position
+            x, y, z = p[0] + ox, p[1] + oy, p[2] + oz
+            cell = self._cell(x, z)
+            now = set()
+            for volume in self._static_cells.get(cell, ()):
+                if volume.contains(x, y, z):
+                    now.add(volume.id)
+            for volume in sensor_cells.get(cell, ()):
+                if volume.contains(x, y, z):
+                    now.add(volume.id)
+
+            before = self._inside[id(subject)]
+            self._inside[id(subject)] = now
+            for volume_id in before - now:
+                volume = self.volumes.get(volume_id)
+                if volume is not None and volume.on_exit:
+                    volume.on_exit(subject, volume)
+            for volume_id in now - before:
+                volume = self.volumes.get(volume_id)
+                # A handler may have removed the volume (a Bob-omb that exploded).
+                if volume is not None and volume.on_enter:
+                    volume.on_enter(subject, volume)
+
+    def is_inside(self, volume, subject=None):
+        """Whether `subject` (default: the first tracked one) was inside `volume` at the last step()."""
+        if subject is None:
+            subject = self.subjects[0][0]
+        return volume.id in self._inside.get(id(subject), ())
+
+    def inside(self, subject=None):
+        if subject is None:
+            subject = self.subjects[0][0]
+        return [self.volumes[i] for i in self._inside.get(id(subject), ()) if i in self.volumes]
@@ -1,11 +1,30 @@
 from ursina import *
-
+import os
+import capture
+import pacing
+from lifecycle import Lifecycle
+from timer_wheel import TimerWheel
+from triggers import TriggerSystem
+
+capture.prepare()
 app = Ursina()
+timers = TimerWheel()  # Deadlines for power-ups, wander timers and cooldowns, advanced in update()
+triggers = TriggerSystem()  # Water, snow and talk radii; membership is cached once per frame
+# Picked-up and stomped entities are destroyed a few per frame instead of lingering disabled; F4 prints a census.
+lifecycle = Lifecycle(lambda: scene.entities, destroy)
 window.fps_counter.enabled = True
 window.title = 'SM64-Inspired Game'
 window.borderless = False
 window.vsync = True
 application.development_mode = False
+# Frame intervals and input-to-display latency; F3 prints and writes pacing.json.
+# SM64_LOW_LATENCY=1 sleeps before input is sampled instead of after rendering.
+pacer = pacing.install(app, target_fps=60, low_latency=bool(os.environ.get('SM64_LOW_LATENCY')))
+# SM64_CAPTURE=frames records a PNG sequence (SM64_CAPTURE_PIPE='ffmpeg ...' streams raw
+# frames instead), at SM64_CAPTURE_SIZE=3840x2160 if given; F10 stops and restarts it.
+recorder = capture.from_environment(app, cameras=lambda: (app.cam, camera.ui_camera))
+if recorder:
+    recorder.start()
 
 # Player
 player = FirstPersonController(
@@ -20,11 +39,22 @@ player.can_fly = False
 player.jump_count = 0
 player.on_ground_last_frame = False
 player.is_swimming = False
+player.jump_from_y = player.y
+triggers.track(player)
 
 # Terrains
 ground = Entity(model='quad', color=color.green, scale=200, rotation_x=90, collider='box')
 water_area = Entity(model='cube', color=color.blue, collider='box', position=(50, -5, 50), scale=(50, 10, 50), alpha=0.5)
 snow_area = Entity(model='cube', color=color.white, collider='box', position=(-50, 5, -50), scale=(50, 1, 50))
+# Swimming needs the feet strictly below the surface: the volume's inclusive top stops just under it,
+# so standing on the ground (y = 0) over the pool is dry land.
+water_bottom = water_area.y - water_area.scale_y / 2
+water_top = water_area.y + water_area.scale_y / 2 - 0.01
+water = triggers.box((water_area.x, (water_bottom + water_top) / 2, water_area.z),
+                     (water_area.scale_x / 2, (water_top - water_bottom) / 2, water_area.scale_z / 2))
+snow = triggers.box((-50, 5, -50), (25, 1.5, 25),  # Slippery going on the snow
+                    on_enter=lambda subject, volume: setattr(subject, 'speed', 8),
+                    on_exit=lambda subject, volume: setattr(subject, 'speed', 12))
 
 # Wing Cap
 class WingCap(Entity):
@@ -37,8 +67,8 @@ class WingCap(Entity):
         if self.intersects(player).hit and not player.can_fly:
             player.can_fly = True
             print_on_screen("Wing Cap Activated!", position=(-0.5, 0.4), scale=2, duration=3)
-            invoke(self.remove_wing_cap, delay=15)
-            self.disable()
+            timers.schedule(15, self.remove_wing_cap)
+            lifecycle.retire(self)
 
     def remove_wing_cap(self):
         player.can_fly = False
@@ -61,14 +91,14 @@ class Star(Entity):
             global stars_collected
             stars_collected += 1
             update_star_ui()
-            self.disable()
+            lifecycle.retire(self)
 
 star_text = Text(text=f'Stars: 0/{TOTAL_STARS}', origin=(0, -18), color=color.gold, scale=2, background=True)
 
 def update_star_ui():
     star_text.text = f'Stars: {stars_collected}/{TOTAL_STARS}'
     if stars_collected >= TOTAL_STARS:
-        Text("All stars collected!", origin=(0, 0), scale=3, color=color.cyan, background=True, duration=10)
+        lifecycle.expire(Text("All stars collected!", origin=(0, 0), scale=3, color=color.cyan, background=True), 10)
 
 for _ in range(TOTAL_STARS):
     Star(position=(random.uniform(-70, 70), random.uniform(5, 20), random.uniform(-70, 70)))
@@ -80,7 +110,7 @@ for _ in range(150):
     def coin_update(self=coin):
         self.rotation_y += self.rotation_speed * time.dt
         if self.intersects(player).hit:
-            self.disable()
+            lifecycle.retire(self)
     coin.update = coin_update
 
 # Enemies
@@ -89,22 +119,23 @@ class Goomba(Entity):
         super().__init__(model='cube', color=color.brown, collider='box', position=position, scale=(1, 1, 1))
         self.speed = random.uniform(1, 3)
         self.direction = random.choice([Vec3(1, 0, 0), Vec3(-1, 0, 0), Vec3(0, 0, 1), Vec3(0, 0, -1)])
-        self.move_timer = random.uniform(2, 5)
+        self.move_timer = timers.schedule(random.uniform(2, 5), self.change_direction)
         self.health = 1
 
+    def change_direction(self):
+        self.direction = random.choice([Vec3(1, 0, 0), Vec3(-1, 0, 0), Vec3(0, 0, 1), Vec3(0, 0, -1)])
+        timers.reschedule(self.move_timer, random.uniform(2, 5))
+
     def update(self):
         if self.health <= 0:
             return
-        self.move_timer -= time.dt
-        if self.move_timer <= 0:
-            self.direction = random.choice([Vec3(1, 0, 0), Vec3(-1, 0, 0), Vec3(0, 0, 1), Vec3(0, 0, -1)])
-            self.move_timer = random.uniform(2, 5)
         self.position += self.direction * self.speed * time.dt
         if self.x > 90 or self.x < -90 or self.z > 90 or self.z < -90:
             self.direction *= -1
         if self.intersects(player).hit:
             if player.y > self.world_y + self.scale_y * 0.6 and player.velocity.y < -0.05:
-                self.disable()
+                timers.cancel(self.move_timer)
+                lifecycle.retire(self)
                 player.jump()
             else:
                 player.position = (0, 10, 0)
@@ -118,20 +149,37 @@ class NPC(Entity):
     def __init__(self, position, message="Find all the stars!"):
         super().__init__(model='cube', color=color.white, position=position, collider='box', scale=1.5)
         self.message = message
-        self.talk_cooldown = 0
+        self.talk_cooldown = None
+        self.repeat = None
+        triggers.attach(self, 3, on_enter=self.greet, on_exit=self.leave)
 
-    def update(self):
-        if self.talk_cooldown > 0:
-            self.talk_cooldown -= time.dt
-        if distance(self, player) < 3 and self.talk_cooldown <= 0:
-            print_on_screen(self.message, position=(-0.5, 0.3), scale=1.5, duration=4)
-            self.talk_cooldown = 5
+    def say(self):
+        print_on_screen(self.message, position=(-0.5, 0.3), scale=1.5, duration=4)
+        self.talk_cooldown = timers.schedule(5, lambda: None)
+
+    def greet(self, subject, volume):
+        # Speaks on arrival unless it spoke in the last 5 s, then every 5 s while the player stays close.
+        wait = timers.remaining(self.talk_cooldown)
+        if not wait:
+            self.say()
+            wait = 5
+        self.repeat = timers.schedule(wait, self.talk_again)
+
+    def talk_again(self):
+        self.say()
+        timers.reschedule(self.repeat, 5)
+
+    def leave(self, subject, volume):
+        timers.cancel(self.repeat)
 
 npc = NPC(position=(20, ground.y + 5, 20))
 
 # Update function
 def update():
-    if player.y < water_area.y + water_area.scale_y / 2 and water_area.intersects(player).hit:
+    timers.advance(time.dt)
+    lifecycle.step(time.dt)
+    triggers.step()
+    if triggers.is_inside(water):
         if not player.is_swimming:
             player.is_swimming = True
         player.gravity = 0.05
@@ -154,9 +202,32 @@ def update():
     elif not player.is_swimming:
         player.gravity = 0.7
 
+    # A space press is on screen once the player has left the height it was pressed at.
+    if pacer.waiting('space') and player.y != player.jump_from_y:
+        pacer.reflect('space')
+
 # Input handling
 def input(key):
+    if not key.endswith(' up') and key != 'space':
+        # Keys show in the frame that handles them; space is recorded below.
+        pacer.input(key)
+    if key == 'f3':
+        print(f"Pacing: {pacer.summary()}")
+        pacer.dump()
+    if key == 'f4':
+        lifecycle.census()
+        print(f"Entities: {lifecycle.summary()}\n{lifecycle.report()}")
+    if key == 'f10' and recorder:
+        if recorder.recording:
+            print(f"Capture stopped: {recorder.stop()}")
+        else:
+            recorder.start()
     if key == 'space':
+        # Only a ground jump is sure to move the player, so only it waits to show on screen.
+        ground_jump = player.grounded and not (player.is_swimming or player.can_fly)
+        pacer.input(key, wait=ground_jump)
+        if ground_jump:
+            player.jump_from_y = player.y
         if player.is_swimming or player.can_fly:
             return
         if player.grounded:
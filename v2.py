@@ -1,16 +1,46 @@
 from ursina import *
 from ursina.prefabs.first_person_controller import FirstPersonController
 from ursina.shaders import lit_with_shadows_shader
+import os
 import random
+import numpy as np
+import ai_stage
+import flowfield
+import lod
+import meshes
+import placement
+import terrain
+from lifecycle import Lifecycle
+from timer_wheel import TimerWheel
+from triggers import TriggerSystem
 
 # Initialize Ursina app
 app = Ursina()
+timers = TimerWheel()  # Deadlines for fuses, wander timers and power-ups, advanced in update()
+triggers = TriggerSystem()  # Water, snow and proximity volumes, stepped in update()
+shapes = meshes.MeshCache()  # Low-poly star, coin and enemy meshes, baked once to .cache/meshes
+lods = lod.LodSet(shapes)  # Coarser meshes and then billboard impostors as they shrink on screen
+lifecycle = Lifecycle(lambda: scene.entities, destroy)  # Spent pickups, enemies and effects are destroyed on a budget
 
 # SM64-inspired sky
 Sky(color=color.rgba(random.randint(50, 150), random.randint(50, 150), random.randint(150, 255), 255))
 
+LEVEL_SEED = random.randrange(2 ** 31)
+
+# Rolling hills (Bob-omb Battlefield-inspired). Heights are read straight from
+# the heightfield, so standing on the ground needs no raycast.
+terrain_field = terrain.Heightfield.generate(LEVEL_SEED, size=200, samples=257)
+
+class TerrainWalker(FirstPersonController):
+    def update(self):
+        super().update()
+        floor = terrain_field.height_at(self.x, self.z)
+        if self.y <= floor:
+            self.y = floor
+            self.land()
+
 # Player with SM64-like movement
-player = FirstPersonController(
+player = TerrainWalker(
     collider='box',
     jump_height=2.5,
     gravity=0.7,
@@ -21,18 +51,10 @@ player.cursor.visible = False
 player.gun = None
 player.can_fly = False  # For Wing Cap
 player.jump_count = 0   # For triple jump
+triggers.track(player)
 
-# Ground plane (Bob-omb Battlefield-inspired)
-ground = Entity(
-    model='quad',
-    color=color.hex('8c5a2b'),
-    scale=200,
-    rotation_x=90,
-    collider='box',
-    texture='white_cube',
-    shader=lit_with_shadows_shader
-)
-ground.texture_scale = (ground.scale_x / 10, ground.scale_z / 10)
+# Ground: geomipmapped chunks that drop detail with distance from the camera
+ground = terrain.Terrain(terrain_field, chunk_cells=32, lod_distance=30, shader=lit_with_shadows_shader)
 
 # Themed areas
 water_area = Entity(
@@ -51,6 +73,16 @@ snow_area = Entity(
     scale=(50, 1, 50)
 )
 
+# Swimming and snow are membership in these volumes, not per-frame height checks.
+def set_gravity(value):
+    return lambda subject, volume: setattr(subject, 'gravity', value)
+
+def set_speed(value):
+    return lambda subject, volume: setattr(subject, 'speed', value)
+
+water = triggers.box((50, -5, 50), (25, 1, 25), on_enter=set_gravity(0.1), on_exit=set_gravity(0.7))
+snow = triggers.box((-50, 5, -50), (25, 1.5, 25), on_enter=set_speed(8), on_exit=set_speed(12))  # Slippery going
+
 # Power-Ups (Wing Cap)
 class WingCap(Entity):
     def __init__(self, position):
@@ -65,8 +97,8 @@ class WingCap(Entity):
     def update(self):
         if self.intersects(player).hit:
             player.can_fly = True
-            invoke(lambda: setattr(player, 'can_fly', False), delay=10)  # 10-second duration
-            self.disable()
+            timers.schedule(10, setattr, player, 'can_fly', False)  # 10-second duration
+            lifecycle.retire(self)
 
 wing_cap = WingCap(position=(10, 5, 10))
 
@@ -78,13 +110,14 @@ star_entities = []
 class Star(Entity):
     def __init__(self, position=(0, 1, 0)):
         super().__init__(
-            model='sphere',
-            color=color.yellow,
+            model=lods.model('star'),
+            color=color.white,
             scale=0.8,
             collider='sphere',
             position=position,
             shader=lit_with_shadows_shader
         )
+        lods.add(self)
         self.id = f"STAR_{random.randint(1000, 9999)}"
         self.collected = False
         self.rotation_speed = random.uniform(80, 120)
@@ -93,7 +126,8 @@ class Star(Entity):
         self.rotation_y += self.rotation_speed * time.dt
         if not self.collected and self.intersects(player).hit:
             self.collected = True
-            self.disable()
+            lods.remove(self)
+            lifecycle.retire(self)
             global stars_collected
             stars_collected += 1
             update_star_ui()
@@ -104,36 +138,45 @@ star_text = Text(text=f'Stars: 0/{TOTAL_STARS}', origin=(0, -18), color=color.go
 def update_star_ui():
     star_text.text = f'Stars: {stars_collected}/{TOTAL_STARS}'
     if stars_collected >= TOTAL_STARS:
-        Text("All stars collected! Well done!", origin=(0,0), scale=3, color=color.cyan, background=True, lifetime=10)
+        lifecycle.expire(Text("All stars collected! Well done!", origin=(0,0), scale=3, color=color.cyan, background=True), 10)
 
 # Platforms
+# Laid out by placement.py so no two platforms overlap or slide into each other.
 num_platforms = 70
 platform_list = []
 
-for i in range(num_platforms // 2):  # Whomp's Fortress style
+def platform_motion(rng):
+    if rng.random() < 0.2:
+        return rng.choice([(rng.uniform(-5, 5), 0, 0), (0, rng.uniform(-3, 3), 0)]) + (rng.uniform(3, 6),)
+    return None
+
+platform_zones = [
+    placement.Zone('whomp', (-80, -80, 80, 80), num_platforms // 2, (1, 30), (5, 15), (1, 3), (5, 15),
+                   min_gap=1.0, motion=platform_motion, max_motion=5),  # Whomp's Fortress style
+    placement.Zone('battlefield', (-80, -80, 80, 80), num_platforms // 2, (1, 25), (3, 10), (0.5, 2), (3, 10),
+                   min_gap=2.0),  # Bob-omb Battlefield style
+]
+platform_boxes, shortfall = placement.place_platforms(platform_zones, LEVEL_SEED)
+placement.warn_shortfall(shortfall, LEVEL_SEED)
+obstacle_boxes = []
+for x, y, z, sx, sy, sz, zone, motion in platform_boxes:
+    # Heights are measured from the hillside below; lift by the highest point under
+    # the footprint so no corner is buried in a slope.
+    y += max(terrain_field.height_at(x + cx * sx / 2, z + cz * sz / 2)
+             for cx, cz in ((0, 0), (-1, -1), (-1, 1), (1, -1), (1, 1)))
+    obstacle_boxes.append((x, y, z, sx, sy, sz, zone, motion))
     platform = Entity(
         model='cube',
-        color=color.gray,
+        color=color.gray if zone == 'whomp' else color.green,
         collider='box',
-        position=(random.uniform(-80, 80), random.uniform(1, 30), random.uniform(-80, 80)),
-        scale=(random.uniform(5, 15), random.uniform(1, 3), random.uniform(5, 15)),
-        shader=lit_with_shadows_shader
-    )
-    platform_list.append(platform)
-    if random.random() < 0.2:
-        direction = random.choice([Vec3(random.uniform(-5, 5), 0, 0), Vec3(0, random.uniform(-3, 3), 0)])
-        platform.animate_position(platform.position + direction, duration=random.uniform(3, 6), loop=True, curve=curve.in_out_sine)
-
-for i in range(num_platforms // 2):  # Bob-omb Battlefield style
-    platform = Entity(
-        model='cube',
-        color=color.green,
-        collider='box',
-        position=(random.uniform(-80, 80), random.uniform(1, 25), random.uniform(-80, 80)),
-        scale=(random.uniform(3, 10), random.uniform(0.5, 2), random.uniform(3, 10)),
+        position=(x, y, z),
+        scale=(sx, sy, sz),
         shader=lit_with_shadows_shader
     )
     platform_list.append(platform)
+    if motion:
+        dx, dy, dz, duration = motion
+        platform.animate_position(platform.position + Vec3(dx, dy, dz), duration=duration, loop=True, curve=curve.in_out_sine)
 
 # Coins
 num_coins = 150
@@ -148,73 +191,72 @@ for _ in range(num_coins):
     else:
         coin_pos = (random.uniform(-78, 78), random.uniform(2, 32), random.uniform(-78, 78))
     coin = Entity(
-        model='sphere',
-        color=color.gold,
+        model=lods.model('coin'),
+        color=color.white,
         scale=0.5,
         collider='sphere',
         position=coin_pos,
         shader=lit_with_shadows_shader
     )
+    lods.add(coin)
     coin.rotation_speed = random.uniform(50, 150)
     coin.update = lambda: setattr(coin, 'rotation_y', coin.rotation_y + coin.rotation_speed * time.dt)
 
 # Enemies
+# Movement, stomps and fuse flashes are computed by the AI stage (see update()),
+# not in per-entity update methods.
+goomba_list = []
+bobomb_list = []
+koopa_list = []
+
 class Goomba(Entity):
     def __init__(self, position=(0, 1, 0)):
         super().__init__(
-            model='cube',
-            color=color.brown,
+            model=lods.model('goomba'),
+            color=color.white,
             collider='box',
             position=position,
             scale=(1, 1, 1),
             shader=lit_with_shadows_shader
         )
+        lods.add(self, moving=True)
         self.speed = random.uniform(1, 3)
         self.direction = random.choice([Vec3(1, 0, 0), Vec3(-1, 0, 0), Vec3(0, 0, 1), Vec3(0, 0, -1)])
-        self.move_timer = random.uniform(2, 5)
+        self.move_timer = timers.schedule(random.uniform(2, 5), self.change_direction)
         self.health = 1
+        goomba_list.append(self)
 
-    def update(self):
-        if self.health <= 0:
-            return
-        self.move_timer -= time.dt
-        if self.move_timer <= 0:
-            self.direction = random.choice([Vec3(1, 0, 0), Vec3(-1, 0, 0), Vec3(0, 0, 1), Vec3(0, 0, -1)])
-            self.move_timer = random.uniform(2, 5)
-        self.position += self.direction * self.speed * time.dt
-        if self.x > 90 or self.x < -90 or self.z > 90 or self.z < -90:
-            self.direction = -self.direction
-        if self.intersects(player).hit:
-            if player.y > self.world_y + self.scale_y * 0.7 and player.velocity.y < -0.1:
-                self.disable()
-                self.health = 0
-            else:
-                player.position = (random.uniform(-5, 5), 10, random.uniform(-5, 5))
+    def change_direction(self):
+        self.direction = random.choice([Vec3(1, 0, 0), Vec3(-1, 0, 0), Vec3(0, 0, 1), Vec3(0, 0, -1)])
+        timers.reschedule(self.move_timer, random.uniform(2, 5))
+
+    def defeat(self):
+        self.health = 0
+        timers.cancel(self.move_timer)
+        lods.remove(self)
+        lifecycle.retire(self)  # Dropped from goomba_list before the next AI snapshot
 
 class Bobomb(Entity):
     def __init__(self, position=(0, 1, 0)):
         super().__init__(
-            model='sphere',
+            model=lods.model('bobomb'),
             color=color.black,
             collider='sphere',
             position=position,
             scale=0.7,
             shader=lit_with_shadows_shader
         )
+        lods.add(self, moving=True)
         self.fuse_lit = False
-        self.fuse_time = 3
+        self.fuse = None
         self.explosion_radius = 5
+        self.sensor = triggers.attach(self, 4, on_enter=self.light_fuse)
+        bobomb_list.append(self)
 
-    def update(self):
-        if self.disabled:
-            return
-        if self.fuse_lit:
-            self.fuse_time -= time.dt
-            self.color = color.lerp(color.black, color.rgb(255, random.randint(0, 50), 0), 1 - (self.fuse_time / 3))
-            if self.fuse_time <= 0:
-                self.explode()
-        elif distance(self.world_position, player.world_position) < 4:
+    def light_fuse(self, subject, volume):
+        if not self.fuse_lit:
             self.fuse_lit = True
+            self.fuse = timers.schedule(3, self.explode)
 
     def explode(self):
         if self.disabled:
@@ -223,31 +265,29 @@ class Bobomb(Entity):
             model='sphere',
             color=color.rgba(255, 100, 0, 200),
             scale=self.explosion_radius,
-            lifetime=0.5,
             shader=lit_with_shadows_shader
         )
+        lifecycle.expire(explosion_effect, 0.5)
         explosion_effect.animate_scale(self.explosion_radius * 1.5, duration=0.5, curve=curve.out_expo)
         explosion_effect.fade_out(duration=0.5)
         if distance(self.world_position, player.world_position) < self.explosion_radius:
             player.position = (random.uniform(-5, 5), 10, random.uniform(-5, 5))
-        self.disable()
+        triggers.remove(self.sensor)
+        lods.remove(self)
+        lifecycle.retire(self)  # Dropped from bobomb_list before the next AI snapshot
 
 class Koopa(Entity):
     def __init__(self, position):
         super().__init__(
-            model='cube',
-            color=color.green,
+            model=lods.model('koopa'),
+            color=color.white,
             position=position,
             collider='box',
             scale=(1, 1, 1)
         )
+        lods.add(self, moving=True)
         self.speed = 2
-
-    def update(self):
-        direction = (player.position - self.position).normalized()
-        self.position += direction * self.speed * time.dt
-        if self.intersects(player).hit:
-            player.position = (0, 10, 0)
+        koopa_list.append(self)
 
 # NPC
 class NPC(Entity):
@@ -260,10 +300,10 @@ class NPC(Entity):
             scale=1
         )
         self.message = "Find all the stars!"
+        triggers.attach(self, 2, on_enter=self.talk)
 
-    def update(self):
-        if distance(self, player) < 2:
-            print(self.message)
+    def talk(self, subject, volume):
+        print(self.message)
 
 # Spawn entities
 for pos in [(p.x + random.uniform(-p.scale_x / 2, p.scale_x / 2), p.y + p.scale_y / 2 + 1.5, p.z + random.uniform(-p.scale_z / 2, p.scale_z / 2)) for p in random.sample(platform_list, min(TOTAL_STARS, len(platform_list)))]:
@@ -278,11 +318,98 @@ for _ in range(5):  # Bob-ombs
     Bobomb(position=(p.x, p.y + p.scale_y / 2 + 0.36, p.z))
 
 for _ in range(3):  # Koopas
-    p = random.choice(platform_list)
-    Koopa(position=(p.x, p.y + p.scale_y / 2 + 0.5, p.z))
+    x, z = random.uniform(-80, 80), random.uniform(-80, 80)
+    Koopa(position=(x, terrain_field.height_at(x, z) + 0.5, z))
 
 npc = NPC(position=(20, 5, 20))
 
+# Koopas follow one shared flow field over the hills instead of walking straight
+# through platforms and into the water. It is only searched again when the
+# player changes cell, and only ever touched from think().
+flow = flowfield.FlowField(
+    flowfield.walkable_grid(terrain_field, cell_size=2, boxes=obstacle_boxes, avoid=[(50, -5, 50, 50, 2, 50)]),
+    origin=-terrain_field.size / 2, cell_size=2)
+
+# --- Enemy AI ---
+# Each frame commits the intents computed from the previous frame's snapshot,
+# then snapshots the world for the worker, which thinks while Panda3D draws.
+# SM64_AI_SERIAL=1 runs the same kernels inline; outcomes are identical.
+FUSE_TIME = 3
+GOOMBA_STEP = 0.5  # How far above the ground a Goomba can be and still be walking on it
+player_last_y = player.y
+
+def positions(entities):
+    return np.array([tuple(e.position) for e in entities], np.float64).reshape(-1, 3)
+
+def take_ai_snapshot():
+    global player_last_y
+    falling = player.y < player_last_y
+    player_last_y = player.y
+    return {
+        'tick': ai.ticks,
+        'dt': time.dt,
+        'player': tuple(player.position),
+        'player_falling': falling,
+        'goomba_position': positions(goomba_list),
+        'goomba_direction': np.array([tuple(g.direction) for g in goomba_list], np.float64).reshape(-1, 3),
+        'goomba_speed': np.array([g.speed for g in goomba_list], np.float64),
+        'koopa_position': positions(koopa_list),
+        'koopa_speed': np.array([k.speed for k in koopa_list], np.float64),
+        'fuse_remaining': np.array([timers.remaining(b.fuse) if b.fuse_lit else -1.0 for b in bobomb_list]),
+    }
+
+def think(s):
+    goomba_position, goomba_direction = ai_stage.walk(
+        s['goomba_position'], s['goomba_direction'], s['goomba_speed'], s['dt'], 90)
+    # Goombas on the ground follow it up and down hills; ones up on a platform stay there until the ground rises past them.
+    ground_y = terrain_field.heights_at(goomba_position[:, 0], goomba_position[:, 2]) + 0.5
+    on_ground = goomba_position[:, 1] <= ground_y + GOOMBA_STEP
+    goomba_position[:, 1] = np.where(on_ground, ground_y, np.maximum(goomba_position[:, 1], ground_y))
+    touched = ai_stage.touching(goomba_position, 0.5, s['player'])
+    stomped = ai_stage.stomping(goomba_position, 0.5, s['player'], s['player_falling'])
+    flow.update(s['player'][0], s['player'][2])
+    directions, following = flow.sample(s['koopa_position'][:, 0], s['koopa_position'][:, 2])
+    koopa_position = np.where(
+        following[:, None],
+        ai_stage.follow(s['koopa_position'], directions, s['koopa_speed'], s['dt']),
+        ai_stage.chase(s['koopa_position'], s['player'], s['koopa_speed'], s['dt']))  # Same cell as the player, or cut off
+    koopa_position[:, 1] = terrain_field.heights_at(koopa_position[:, 0], koopa_position[:, 2]) + 0.5  # Koopas walk the hills
+    return {
+        'goomba_position': goomba_position,
+        'goomba_direction': goomba_direction,
+        'goomba_direction_seen': s['goomba_direction'],
+        'goomba_stomped': stomped,
+        'goomba_hurts': touched & ~stomped,
+        'koopa_position': koopa_position,
+        'koopa_hurts': ai_stage.touching(koopa_position, 0.5, s['player']),
+        'fuse_heat': ai_stage.fuse_heat(s['fuse_remaining'], FUSE_TIME, LEVEL_SEED, s['tick']) * 255,
+    }
+
+def commit_ai(intents):
+    hurt = False
+    for g, position, direction, seen, stomped, hurts in zip(
+            goomba_list, intents['goomba_position'], intents['goomba_direction'], intents['goomba_direction_seen'],
+            intents['goomba_stomped'], intents['goomba_hurts']):
+        if g.health <= 0:
+            continue
+        g.position = Vec3(*position)
+        if np.allclose(tuple(g.direction), seen):
+            g.direction = Vec3(*direction)  # Unless the wander timer turned it since the snapshot
+        if stomped:
+            g.defeat()
+        hurt = hurt or hurts
+    if hurt:
+        player.position = (random.uniform(-5, 5), 10, random.uniform(-5, 5))
+    for k, position, hurts in zip(koopa_list, intents['koopa_position'], intents['koopa_hurts']):
+        k.position = Vec3(*position)
+        if hurts:
+            player.position = (0, 10, 0)
+    for b, heat in zip(bobomb_list, intents['fuse_heat']):
+        if b.enabled and b.fuse_lit:
+            b.color = color.rgb(*heat)
+
+ai = ai_stage.AIStage(think, threaded=not os.environ.get('SM64_AI_SERIAL'))
+
 # Camera system
 camera.parent = player
 camera.position = (0, 5, -10)
@@ -290,10 +417,18 @@ camera.rotation_x = 20
 
 # Player update for swimming and flying
 def update():
-    if player.y < water_area.y + water_area.scale_y / 2:
-        player.gravity = 0.1  # Swimming
-    else:
-        player.gravity = 0.7
+    timers.advance(time.dt)
+    intents = ai.collect()
+    if intents:
+        commit_ai(intents)
+    # Intents line up with the lists by index, so only prune between a commit and the next snapshot.
+    goomba_list[:] = [g for g in goomba_list if g.health > 0]
+    bobomb_list[:] = [b for b in bobomb_list if b.enabled]
+    lifecycle.step(time.dt)
+    ai.submit(take_ai_snapshot())
+    ground.update(camera.world_position)
+    lods.update(camera.world_position, camera.fov, window.size[1])
+    triggers.step()
     if player.can_fly and held_keys['space']:
         player.y += 0.1
     # Long jump